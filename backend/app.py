@@ -1,29 +1,63 @@
-from flask import Flask, request, jsonify, make_response, send_file
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, make_response, send_file
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 from bson.objectid import ObjectId
 from datetime import datetime
+from types import SimpleNamespace
+import time
 import os
+import threading
 import math
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import json
 from io import BytesIO
-from PIL import Image, ImageOps, ImageEnhance, ImageFilter
-from werkzeug.utils import secure_filename
 from pathlib import Path
-
-try:
-    import pytesseract
-    OCR_AVAILABLE = True
-except ImportError:
-    pytesseract = None
-    OCR_AVAILABLE = False
-
-# --- New Imports for File Processing & API Calls ---
-import requests
-import fitz  # PyMuPDF
-import docx # python-docx
+from utils.table_extraction import extract_pdf_tables, merge_tables
+from utils.charts import normalize_charts
+from utils.dashboard_stats import department_breakdown, status_breakdown
+from utils.counters import (
+    COUNTER_PROJECTION, read_counters, reconcile_counters, record_change,
+    filtered_top_tags, record_changes, start_reconciler, top_tags
+)
+from utils.rollups import (
+    distribution, parse_range, processing_efficiency, record_ingest,
+    record_ingests, stage_timer, summarize_range, upload_trends
+)
+from utils.response_cache import ResponseCache
+from utils.http_caching import client_has, compress_response, document_etag, not_modified, tag_response
+from utils.json_provider import EncodedDocumentCache, FastJSONProvider, dumpb
+from utils.worker_resources import WorkerResources
+from utils.indexes import start_index_builder
+from utils.projection import LIST_FIELDS, LIST_PROJECTION, parse_fields, with_fields
+from utils.content_store import (
+    CONTENT_COLLECTION, attach_content, delete_content, iter_content_text,
+    load_content, save_content, split_content
+)
+from utils.text_search import (
+    SEARCH_MODES, SearchResult, index_document, index_fields, parse_query, regex_conditions, search_documents
+)
+from utils.facets import run_search_facets
+from utils.exports import EXPORT_BATCH_SIZE, EXPORT_COLUMNS, EXPORT_FORMATS, batched, export_stream
+from utils.bundles import BUNDLE_MAX_DOCUMENTS, bundle_chunks
+from utils.bulk_upload import (
+    BULK_EXTRACT_WORKERS, BULK_GEMINI_CONCURRENCY, BULK_GEMINI_MIN_SECONDS, BULK_INSERT_BATCH,
+    BULK_UPLOAD_MAX_SECONDS, BULK_UPLOAD_TIME_BUDGET, insert_documents, upload_items
+)
+from utils.blob_store import BLOB_COLLECTION, BLOB_ROOT, BlobStore, make_backend, open_original, start_sweeper
+from utils.page_images import (
+    DEFAULT_PAGE_WIDTH, PAGE_CACHE_MAX_AGE, PAGE_IMAGE_FORMATS, THUMBNAIL_WIDTH, PageImageCache,
+    cached_page, negotiate_format, page_count, page_source_kind, snap_width
+)
+from utils.document_render import DOWNLOAD_FORMATS, content_disposition, render_download
+from config import get_config
+from utils.pagination import (
+    KEYSET_SORT, MAX_PAGE_SIZE, TOTAL_MODES, CountCache, keyset_page, page_total, ranked_page
+)
+
+# PyMuPDF, Pillow, pytesseract, python-docx and google-genai are imported inside the functions
+# that use them, so startup (and every worker recycle) does not pay for them.
 
 # NOTE: For Windows users, install Tesseract-OCR separately from:
 # https://github.com/UB-Mannheim/tesseract/wiki
@@ -31,12 +65,8 @@ import docx # python-docx
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+api = Blueprint('api', __name__)
 
-# MongoDB Connection
-MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
-DB_NAME = os.getenv('DB_NAME', 'kmrl_docintel')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY') # --- IMPORTANT: Add this to your .env file ---
 
 # === GEMINI MODEL SELECTION ===
@@ -44,12 +74,13 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY') # --- IMPORTANT: Add this to your .
 # - 'flash' (default): Fast, cheaper, good for basic extraction
 # - 'pro': Advanced handwriting, charts, diagrams recognition
 GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'flash')  # Default to 'flash'
+# Alternative API endpoint (proxy/gateway); unset uses Google's
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL')
 OCR_LANGUAGES = os.getenv('OCR_LANGUAGES', 'eng+mal')
 OCR_PSM = os.getenv('OCR_PSM', '6')
 OCR_OEM = os.getenv('OCR_OEM', '1')
 OCR_CONFIG = os.getenv('OCR_CONFIG', '').strip()
-UPLOAD_FOLDER = Path(os.getenv('UPLOAD_FOLDER', Path(__file__).parent / 'uploads'))
-UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
+NDJSON_BATCH_SIZE = int(os.getenv('NDJSON_BATCH_SIZE', '200'))
 
 if GEMINI_MODEL.lower() == 'pro':
     GEMINI_API_MODEL = 'gemini-1.5-pro'
@@ -58,15 +89,80 @@ else:
     GEMINI_API_MODEL = 'gemini-1.5-flash'
     print("⚡ Using GEMINI_1.5_FLASH for fast document analysis")
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-documents_collection = db['documents']
 
-# Create indexes
-documents_collection.create_index('title')
-documents_collection.create_index('department')
-documents_collection.create_index('type')
-documents_collection.create_index('tags')
+def build_resources(config):
+    """
+    Mongo client, collections and background tasks for the current process (see
+    utils/worker_resources.py). Nothing here waits on Mongo: the client connects on
+    first use and collections/indexes are set up by a background task.
+    """
+    client = MongoClient(config['MONGO_URI'])
+    db = client[config['DB_NAME']]
+    upload_folder = Path(config['UPLOAD_FOLDER'])
+    upload_folder.mkdir(parents=True, exist_ok=True)
+    worker = SimpleNamespace(
+        client=client,
+        db=db,
+        documents_collection=db['documents'],
+        stats_collection=db['stats'],
+        rollups_collection=db['rollups'],
+        # Extracted text and tables, kept out of the hot documents collection
+        contents_collection=db[CONTENT_COLLECTION],
+        # Original uploads, content-addressed and reference counted; the sweeper reclaims unreferenced blobs
+        blob_store=BlobStore(db[BLOB_COLLECTION], make_backend(db, root=BLOB_ROOT or upload_folder / 'blobs')),
+        # Rendered page images and thumbnails (size-bounded, least recently used evicted)
+        page_cache=PageImageCache(config['PAGE_CACHE_DIR'] or upload_folder / 'page_cache')
+    )
+    start_index_builder(db)
+    # Periodically rebuild the materialized dashboard counters to fix any drift
+    start_reconciler(worker.documents_collection, worker.stats_collection)
+    start_sweeper(worker.blob_store)
+    return worker
+
+
+# Built lazily once per process, so pre-fork workers each get their own client and threads
+resources = WorkerResources(build_resources)
+client = resources.proxy('client')
+db = resources.proxy('db')
+documents_collection = resources.proxy('documents_collection')
+stats_collection = resources.proxy('stats_collection')
+rollups_collection = resources.proxy('rollups_collection')
+contents_collection = resources.proxy('contents_collection')
+blob_store = resources.proxy('blob_store')
+page_cache = resources.proxy('page_cache')
+
+# Cached GET responses; write paths call response_cache.invalidate()
+response_cache = ResponseCache(stats_collection)
+listing_counts = CountCache()
+# Encoded bytes of recently served documents, keyed by _id + version
+document_json = EncodedDocumentCache()
+
+
+def create_app(config_name=None):
+    """
+    Application factory. Settings come from config.py (`APP_ENV` picks the class when
+    `config_name` is not given); Mongo and the other per-process resources are built on
+    first use, after any fork.
+    """
+    app = Flask(__name__)
+    app.config.from_object(get_config(config_name))
+    # orjson-backed encoder with native ObjectId/datetime handling
+    app.json = FastJSONProvider(app)
+    CORS(app)
+    app.register_blueprint(api)
+    # gzip/brotli for JSON bodies above COMPRESS_MIN_BYTES
+    app.after_request(compress_response)
+    resources.configure(app.config)
+    return app
+
+
+def get_dashboard_counts():
+    """Materialized dashboard counters, built from the documents collection on first use."""
+    counts = read_counters(stats_collection)
+    if counts is None:
+        reconcile_counters(documents_collection, stats_collection)
+        counts = read_counters(stats_collection)
+    return counts
 
 
 def serialize_document(doc):
@@ -74,11 +170,18 @@ def serialize_document(doc):
     if not doc:
         return None
     doc['_id'] = str(doc['_id'])
-    if doc.get('file_path'):
+    if doc.get('file_blob') or doc.get('file_path'):
         doc['file_url'] = f"/api/documents/{doc['_id']}/file"
+    if doc.get('page_count'):
+        doc['thumbnail_url'] = f"/api/documents/{doc['_id']}/pages/1?width={THUMBNAIL_WIDTH}"
     return doc
 
 
+def encode_documents(docs):
+    """Serialized documents for a response, reusing cached encodings of unchanged documents."""
+    return [document_json.encode(doc, serialize_document) for doc in docs]
+
+
 # -------------------------
 # FILE EXTRACTION FUNCTION
 # -------------------------
@@ -92,6 +195,7 @@ def extract_text_from_file(file_storage):
         file_storage.seek(0)
         def preprocess_image_for_ocr(image):
             """Enhance handwritten scans for better OCR results."""
+            from PIL import ImageEnhance, ImageFilter, ImageOps
             if image.mode not in ('L', 'LA'):
                 image = image.convert('L')
             image = ImageOps.autocontrast(image)
@@ -99,7 +203,9 @@ def extract_text_from_file(file_storage):
             image = image.filter(ImageFilter.MedianFilter(size=3))
             return image
         def run_ocr(image):
-            if not OCR_AVAILABLE:
+            try:
+                import pytesseract
+            except ImportError:
                 raise ImportError("pytesseract not installed")
             config_parts = [f"--psm {OCR_PSM}", f"--oem {OCR_OEM}"]
             if OCR_CONFIG:
@@ -114,6 +220,7 @@ def extract_text_from_file(file_storage):
         
         # PDF files
         if filename.endswith('.pdf'):
+            import fitz  # PyMuPDF
             pdf_document = fitz.open(stream=file_storage.read(), filetype="pdf")
             
             # First, try to extract text directly (for text-based PDFs)
@@ -128,6 +235,7 @@ def extract_text_from_file(file_storage):
             if not text.strip():
                 try:
                     print(f"[OCR] No text found in PDF {filename}, attempting OCR on images...")
+                    from PIL import Image
                     
                     for page_num in range(len(pdf_document)):
                         page = pdf_document.load_page(page_num)
@@ -156,6 +264,7 @@ def extract_text_from_file(file_storage):
         
         # DOCX files (modern Word format)
         elif filename.endswith('.docx'):
+            import docx  # python-docx
             doc = docx.Document(file_storage)
             
             for para in doc.paragraphs:
@@ -173,6 +282,7 @@ def extract_text_from_file(file_storage):
         elif filename.endswith('.doc'):
             # For .doc files, we try to extract using docx if possible, otherwise return placeholder
             try:
+                import docx  # python-docx
                 doc = docx.Document(file_storage)
                 for para in doc.paragraphs:
                     text += para.text + "\n"
@@ -217,6 +327,7 @@ def extract_text_from_file(file_storage):
         elif filename.endswith('.jpg') or filename.endswith('.jpeg') or filename.endswith('.png'):
             try:
                 file_storage.seek(0)
+                from PIL import Image
                 image = Image.open(file_storage)
                 text = run_ocr(image)
                 
@@ -420,8 +531,6 @@ def extract_text_from_file(file_storage):
 
 import os
 import json
-from google import genai
-from google.genai import types # Used for GenerateContentConfig
 
 # IMPORTANT: Ensure GEMINI_API_KEY is available as an environment variable
 # The genai.Client() will automatically look for it.
@@ -430,47 +539,75 @@ from google.genai import types # Used for GenerateContentConfig
 # client = genai.Client()
 # For demonstration purposes, we'll keep the key checking logic:
 
-def analyze_document_with_gemini(text_content, source_bytes=None, filename=None, mime_type=None, model_type='pro'):
+def gemini_mock_result():
+    """Analysis used when no API key is configured."""
+    return {
+        "title": "Mock Title (GEMINI_API_KEY not set)",
+        "summary": "This is mock data. Please set your GEMINI_API_KEY in .env to enable AI analysis.",
+        "tags": ["error", "mock-data"],
+        "department": "Unknown",
+        "type": "Unknown",
+        "language": "English",
+        "status": "review",
+        "tables_data": [],
+        "figures_data": [],
+        "charts": []
+    }
+
+
+def gemini_client_error_result():
+    return {
+        "title": "Client Initialization Error",
+        "summary": "Could not initialize the Gemini client. Check API key format.",
+        "tags": ["error", "client-fail"],
+        "status": "urgent",
+        "tables_data": [], "figures_data": [], "charts": []
+    }
+
+
+def gemini_error_result(error):
+    return {
+        "title": "Error During Analysis (SDK)",
+        "summary": f"An error occurred while analyzing the document using the SDK: {str(error)}",
+        "tags": ["error"],
+        "department": "Unknown",
+        "type": "Unknown",
+        "language": "English",
+        "status": "review",
+        "tables_data": [],
+        "figures_data": [],
+        "charts": []
+    }
+
+
+def gemini_client(timeout=None):
     """
-    Uses the Google Gen AI SDK to generate structured document metadata.
-    
+    SDK client; the SDK looks up GEMINI_API_KEY, GEMINI_BASE_URL points it at a proxy or stub.
+    `timeout` (seconds) bounds each request.
+    """
+    from google import genai
+    from google.genai import types
+    options = {}
+    if GEMINI_BASE_URL:
+        options['base_url'] = GEMINI_BASE_URL
+    if timeout:
+        options['timeout'] = int(timeout * 1000)  # milliseconds
+    if options:
+        return genai.Client(http_options=types.HttpOptions(**options))
+    return genai.Client()
+
+
+def gemini_request(text_content, source_bytes=None, mime_type=None, model_type='pro', table_pages=None):
+    """
+    Keyword arguments for `models.generate_content`, shared by the sync and async (ASGI) paths.
+
     :param text_content: The document text to analyze.
     :param model_type: 'pro' or 'flash'.
-    :"""
-    
-    # 1. API KEY CHECK (Using os.getenv for environment variable)
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_API_KEY:
-        print("GEMINI_API_KEY not found. Returning mock data.")
-        # --- (Your Mock Data logic remains the same) ---
-        return { 
-            "title": "Mock Title (GEMINI_API_KEY not set)",
-            # ... rest of mock data ... 
-            "summary": "This is mock data. Please set your GEMINI_API_KEY in .env to enable AI analysis.",
-            "tags": ["error", "mock-data"],
-            "department": "Unknown",
-            "type": "Unknown",
-            "language": "English",
-            "status": "review",
-            "tables_data": [],
-            "figures_data": [],
-            "charts": []
-        }
+    :param table_pages: None to let Gemini extract tables from every page, otherwise the
+        list of 1-indexed pages it should extract tables from (empty list = no tables).
+    """
+    from google.genai import types # Used for GenerateContentConfig
 
-    # Initialize Client - SDK handles API key lookup and URL construction
-    try:
-        client = genai.Client()
-    except Exception as e:
-        # Handle client initialization error (e.g., if key format is wrong)
-        print(f"Error initializing Gemini client: {e}")
-        return {
-            "title": "Client Initialization Error",
-            "summary": "Could not initialize the Gemini client. Check API key format.",
-            "tags": ["error", "client-fail"],
-            "status": "urgent",
-            "tables_data": [], "figures_data": [], "charts": []
-        }
-        
     # 2. TRUNCATION AND MODEL SELECTION
     # Using the more powerful and current model alias: gemini-2.5-pro
     # For Flash: gemini-2.5-flash
@@ -562,6 +699,14 @@ def analyze_document_with_gemini(text_content, source_bytes=None, filename=None,
             "Return empty arrays if none found."
         )
 
+    # Tables on text-layer pages are extracted locally; only ask for the rest
+    if table_pages is not None:
+        if table_pages:
+            pages_str = ", ".join(str(p) for p in table_pages)
+            system_prompt += f" Only extract tables_data from these pages: {pages_str}; tables on other pages are already extracted."
+        else:
+            system_prompt += " Tables have already been extracted; return an empty tables_data array."
+
     # 5. Build content parts (original file + OCR text)
     content_parts = []
 
@@ -598,166 +743,55 @@ def analyze_document_with_gemini(text_content, source_bytes=None, filename=None,
         response_schema=response_schema
     )
 
-    # 7. MAKE THE API CALL
-    try:
-        response = client.models.generate_content(
-            model=MODEL_ID,
-            contents=[user_content],
-            config=config,
-        )
-        
-        # The response.text is guaranteed to be a valid JSON string due to the config
-        processed_data = json.loads(response.text)
-
-        print("--- GEMINI ANALYSIS RESULT (SDK) ---")
-        print(json.dumps(processed_data, indent=2))
-        print("------------------------------------")
-        
-        # Add language default
-        processed_data['language'] = "English" 
-        
-        return processed_data
-        
-    except Exception as e:
-        print(f"Error calling Gemini API (SDK): {str(e)}")
-        # --- (Your Fallback logic remains the same) ---
-        return {
-            "title": "Error During Analysis (SDK)",
-            "summary": f"An error occurred while analyzing the document using the SDK: {str(e)}",
-            "tags": ["error"],
-            "department": "Unknown",
-            "type": "Unknown",
-            "language": "English",
-            "status": "review",
-            "tables_data": [],
-            "figures_data": [],
-            "charts": []
-        }
-
-# Remember to install the required libraries:
-# pip install google-genai
-# -------------------------
-# CHART NORMALIZATION HELPERS
-# -------------------------
-
-def _parse_numeric_value(value):
-    """Convert various numeric string formats into floats."""
-    if value is None:
-        return None
-
-    if isinstance(value, (int, float)):
-        return float(value)
-
-    value_str = str(value).strip()
-    if not value_str:
-        return None
-
-    # Remove common non-numeric prefixes/suffixes (currency, percentage, units)
-    value_str = value_str.replace(',', '')
-    if value_str.endswith('%'):
-        value_str = value_str[:-1]
-    # Keep digits, decimal points, and minus signs
-    cleaned = ''.join(ch for ch in value_str if ch.isdigit() or ch in '.-')
-
-    if cleaned in {'', '-', '.', '-.', '.-'}:
-        return None
-
-    try:
-        return float(cleaned)
-    except ValueError:
-        return None
-
-
-def _normalize_chart_points(chart):
-    """Ensure chart data only contains numeric values so the UI can render accurate visuals."""
-    normalized_points = []
-    for idx, point in enumerate(chart.get('data_points', [])):
-        label = str(point.get('label') or f"Item {idx + 1}").strip()
-        numeric_value = _parse_numeric_value(point.get('value'))
-        if numeric_value is None:
-            continue
-        normalized_points.append({
-            "label": label,
-            "value": numeric_value
-        })
-    return normalized_points
-
-
-def _derive_charts_from_tables(tables):
-    """
-    Build deterministic chart data from extracted tables when AI-provided charts are missing or unreliable.
-    Each numeric column (after the first label column) becomes a bar chart.
-    """
-    derived_charts = []
-    tables = tables or []
-
-    for table_index, table in enumerate(tables):
-        rows = table.get('data') or []
-        if len(rows) < 2:
-            continue
-
-        headers = rows[0]
-        body_rows = rows[1:]
-        if not headers or len(headers) < 2:
-            continue
-
-        caption = table.get('caption') or f"Table {table_index + 1}"
-        label_header = headers[0] or "Category"
+    return {'model': MODEL_ID, 'contents': [user_content], 'config': config}
 
-        for col_idx in range(1, len(headers)):
-            column_header = headers[col_idx] or f"Column {col_idx + 1}"
-            data_points = []
 
-            for row_idx, row in enumerate(body_rows):
-                if not row:
-                    continue
+def gemini_result(response):
+    """Structured metadata from a generate_content response."""
+    # The response.text is guaranteed to be a valid JSON string due to the config
+    processed_data = json.loads(response.text)
 
-                label = str(row[0]).strip() if len(row) > 0 and row[0] is not None else f"{label_header} {row_idx + 1}"
-                raw_value = row[col_idx] if len(row) > col_idx else None
-                numeric_value = _parse_numeric_value(raw_value)
+    print("--- GEMINI ANALYSIS RESULT (SDK) ---")
+    print(json.dumps(processed_data, indent=2))
+    print("------------------------------------")
 
-                if label and numeric_value is not None:
-                    data_points.append({
-                        "label": label,
-                        "value": numeric_value
-                    })
+    # Add language default
+    processed_data['language'] = "English"
 
-            if len(data_points) >= 2:
-                derived_charts.append({
-                    "title": f"{caption} - {column_header}",
-                    "description": f"Auto-generated from '{caption}' using '{column_header}' values.",
-                    "chart_type": "bar",
-                    "data_points": data_points
-                })
+    return processed_data
 
-    return derived_charts
 
-
-def normalize_charts(processed_data):
+def analyze_document_with_gemini(text_content, source_bytes=None, filename=None, mime_type=None, model_type='pro', table_pages=None,
+                                 timeout=None):
     """
-    Validate Gemini chart output and fall back to deterministic charts derived from tables if needed.
-    Returns a list (possibly empty) that only contains numeric-friendly data so the frontend renders correct charts.
+    Uses the Google Gen AI SDK to generate structured document metadata.
+    See gemini_request for the parameters; `timeout` (seconds) bounds the API call.
     """
-    charts = processed_data.get('charts') or []
-    valid_charts = []
-
-    for chart in charts:
-        normalized_points = _normalize_chart_points(chart)
-        if len(normalized_points) < 2:
-            continue
+    # 1. API KEY CHECK (Using os.getenv for environment variable)
+    if not os.getenv("GEMINI_API_KEY"):
+        print("GEMINI_API_KEY not found. Returning mock data.")
+        return gemini_mock_result()
 
-        valid_charts.append({
-            "title": chart.get('title') or "Document Chart",
-            "description": chart.get('description', ''),
-            "chart_type": chart.get('chart_type', 'bar'),
-            "data_points": normalized_points
-        })
+    # Initialize Client - SDK handles API key lookup and URL construction
+    try:
+        client = gemini_client(timeout)
+    except Exception as e:
+        # Handle client initialization error (e.g., if key format is wrong)
+        print(f"Error initializing Gemini client: {e}")
+        return gemini_client_error_result()
 
-    if valid_charts:
-        return valid_charts
+    request_kwargs = gemini_request(text_content, source_bytes, mime_type, model_type, table_pages)
 
-    return _derive_charts_from_tables(processed_data.get('tables_data'))
+    # 7. MAKE THE API CALL
+    try:
+        response = client.models.generate_content(**request_kwargs)
+        return gemini_result(response)
+    except Exception as e:
+        print(f"Error calling Gemini API (SDK): {str(e)}")
+        return gemini_error_result(e)
 
+# Remember to install the required libraries:
+# pip install google-genai
 # -------------------------
 # SEMANTIC SEARCH (IMPROVED WITH NLP)
 # -------------------------
@@ -824,8 +858,12 @@ def cosine_similarity(vec1, vec2):
         return 0.0
     return numerator / math.sqrt(sum1 * sum2)
 
-def semantic_search(query, collection, top_k=10):
-    """Improved semantic search with NLP enhancements"""
+def semantic_scoring_projection(projection):
+    return with_fields(projection, 'title', 'summary', 'department', 'type', 'tags')
+
+
+def rank_semantic(query, docs, top_k=10):
+    """The `top_k` best matches among `docs`, with `similarity`/`_score` set (pure CPU work)."""
     query_words = preprocess_text(query)
     expanded_query_words = expand_query_with_synonyms(query_words)
     query_vec = text_to_tfidf_vector(" ".join(expanded_query_words))
@@ -834,7 +872,7 @@ def semantic_search(query, collection, top_k=10):
     print(f"[SEARCH] Processed: {query_words}")
     
     results = []
-    for doc in collection.find({}):
+    for doc in docs:
         full_text = (
             (doc.get("title") or "") + " " +
             (doc.get("summary") or "") + " " +
@@ -865,7 +903,10 @@ def semantic_search(query, collection, top_k=10):
             results.append(doc)
 
     results.sort(key=lambda x: x["similarity"], reverse=True)
+    return results[:top_k]
+
 
+def serialize_semantic_results(results):
     serialized_results = []
     for r in results:
         serialized = serialize_document(r)
@@ -873,32 +914,216 @@ def semantic_search(query, collection, top_k=10):
             serialized['similarity'] = r.get('similarity')
             serialized['_score'] = r.get('_score')
             serialized_results.append(serialized)
+    return serialized_results
+
+
+def semantic_search(query, collection, top_k=10, projection=LIST_PROJECTION):
+    """Improved semantic search with NLP enhancements"""
+    results = rank_semantic(query, collection.find({}, semantic_scoring_projection(projection)), top_k)
+    results = attach_content(contents_collection, results, projection)
+    return serialize_semantic_results(results)
+
+
+def search_condition(search_query, mode='index', by_relevance=False):
+    """
+    Filter for the search box and the ranked matches behind it.
+    mode 'index' uses the token index; 'regex' is an escaped substring match (no ranking),
+    also used when the input has no indexable tokens (e.g. a single character).
+    Matches are capped at SEARCH_MAX_RESULTS (`truncated` says when more were dropped):
+    the best scoring ones when `by_relevance`, otherwise the newest.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"search_mode must be one of: {', '.join(SEARCH_MODES)}")
+    if mode == 'regex' or not parse_query(search_query):
+        conditions, truncated = regex_conditions(contents_collection, search_query)
+        return {'$or': conditions}, SearchResult(truncated=truncated, scored=False)
+    result = search_documents(contents_collection, documents_collection, search_query, newest=not by_relevance)
+    return {'_id': {'$in': result.ids}}, result
+
+
+def truncation_headers(search):
+    """Response headers for streamed results: X-Search-Truncated when search matches were capped."""
+    return {'X-Search-Truncated': 'true'} if search is not None and search.truncated else {}
+
+
+def add_scores(documents, search):
+    if search is not None and search.scored:
+        scores = search.scores
+        for doc in documents:
+            doc['_score'] = scores.get(doc['_id'])
+    return documents
+
+
+def paginated_listing(query_filter, search=None):
+    """
+    One page of documents (newest first) for the listing endpoints.
+
+    Default is keyset pagination: pass the returned `next` token as `cursor`.
+    `total=exact|estimate|none` controls counting (default estimate).
+    Passing `page` selects the legacy skip/limit mode with an exact total.
+    Rows carry the list fields unless `fields=` asks for others.
+    With a search, `sort=relevance` orders by score (the cursor is then an offset);
+    `truncated` is true when matches beyond SEARCH_MAX_RESULTS were dropped.
+    """
+    limit = int(request.args.get('limit', 10))
+    projection = parse_fields(request.args.get('fields'))
+
+    if 'page' in request.args:
+        page = int(request.args.get('page', 1))
+        total = documents_collection.count_documents(query_filter)
+        skip = (page - 1) * limit
+        documents = list(documents_collection.find(query_filter, projection)
+                                   .sort(KEYSET_SORT)
+                                   .skip(skip)
+                                   .limit(limit))
+        attach_content(contents_collection, documents, projection)
+        add_scores(documents, search)
+        return {
+            'documents': encode_documents(documents),
+            'pagination': {
+                'total': total,
+                'page': page,
+                'limit': limit,
+                'pages': (total + limit - 1) // limit
+            }
+        }
 
-    return serialized_results[:top_k]
+    total_mode = request.args.get('total', 'estimate')
+    if total_mode not in TOTAL_MODES:
+        raise ValueError(f"total must be one of: {', '.join(TOTAL_MODES)}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if search is not None and search.scored and request.args.get('sort') == 'relevance':
+        documents, next_cursor, total = ranked_page(
+            documents_collection, query_filter, search.ids, request.args.get('cursor'), limit, projection
+        )
+        is_estimate = False
+    else:
+        documents, next_cursor = keyset_page(
+            documents_collection, query_filter, request.args.get('cursor'), limit, projection
+        )
+        total, is_estimate = page_total(
+            documents_collection, query_filter, total_mode,
+            counts_loader=get_dashboard_counts,
+            count_cache=listing_counts,
+            generation=response_cache.generation.current()
+        )
+    attach_content(contents_collection, documents, projection)
+    add_scores(documents, search)
+    return {
+        'documents': encode_documents(documents),
+        'pagination': {
+            'limit': limit,
+            'next': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total,
+            'total_is_estimate': is_estimate,
+            'truncated': search is not None and search.truncated
+        }
+    }
+
+
+# -------------------------
+# DASHBOARD WIDGETS
+# -------------------------
+
+DASHBOARD_WIDGETS = [
+    'stats', 'departments', 'tags', 'document_types',
+    'status_distribution', 'language_distribution', 'recent_documents'
+]
+COUNT_WIDGETS = {'stats', 'departments', 'document_types', 'status_distribution', 'language_distribution'}
+dashboard_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='dashboard')
+
+
+def recent_processing_summary():
+    """Processing time and auto-processed rate over the last 30 days of ingest rollups."""
+    return summarize_range(rollups_collection, *parse_range({'days': 30}))
+
+
+def dashboard_stats_widget(counts, processing):
+    avg_seconds = processing['avg_processing_seconds']
+    return {
+        'total_documents': counts['total'],
+        'urgent_items': counts['status'].get('urgent', 0),
+        'documents_today': counts['today'],
+        'approved_documents': counts['status'].get('approved', 0),
+        'review_documents': counts['status'].get('review', 0),
+        'starred_documents': counts['starred'],
+        'avg_processing_time': round(avg_seconds, 1) if avg_seconds is not None else 0,
+        'processing_efficiency': processing['auto_processed_rate'] or 0
+    }
+
+
+def document_types_widget(counts):
+    doc_types = sorted(counts['type'].items(), key=lambda item: item[1], reverse=True)[:10]
+    return [{'type': doc_type, 'count': count} for doc_type, count in doc_types]
+
+
+def language_distribution_widget(counts):
+    languages = sorted(counts['language'].items(), key=lambda item: item[1], reverse=True)
+    return [{'language': language, 'count': count} for language, count in languages]
+
+
+def recent_documents_widget(projection=LIST_PROJECTION):
+    recent_docs = list(documents_collection.find({}, projection).sort('date', -1).limit(5))
+    attach_content(contents_collection, recent_docs, projection)
+    return encode_documents(recent_docs)
+
+
+def build_dashboard_summary(fields):
+    """
+    Compute the requested dashboard widgets in one go.
+    Independent reads run concurrently and every count-based widget shares one counters read.
+    """
+    futures = {}
+    if fields & COUNT_WIDGETS:
+        futures['counts'] = dashboard_executor.submit(get_dashboard_counts)
+    if 'stats' in fields:
+        futures['processing'] = dashboard_executor.submit(recent_processing_summary)
+    if 'tags' in fields:
+        futures['tags'] = dashboard_executor.submit(top_tags, stats_collection, 10)
+    if 'recent_documents' in fields:
+        futures['recent_documents'] = dashboard_executor.submit(recent_documents_widget)
+    results = {name: future.result() for name, future in futures.items()}
+
+    counts = results.get('counts')
+    summary = {}
+    if 'stats' in fields:
+        summary['stats'] = dashboard_stats_widget(counts, results['processing'])
+    if 'departments' in fields:
+        summary['departments'] = department_breakdown(counts)
+    if 'tags' in fields:
+        summary['tags'] = results['tags']
+    if 'document_types' in fields:
+        summary['document_types'] = document_types_widget(counts)
+    if 'status_distribution' in fields:
+        summary['status_distribution'] = status_breakdown(counts)
+    if 'language_distribution' in fields:
+        summary['language_distribution'] = language_distribution_widget(counts)
+    if 'recent_documents' in fields:
+        summary['recent_documents'] = results['recent_documents']
+    return summary
 
 
 # -------------------------
 #       ROUTES
 # -------------------------
 
-@app.route('/api/documents', methods=['GET'])
+@api.route('/api/documents', methods=['GET'])
+@response_cache.cached()
 def get_documents():
     try:
         search_query = request.args.get('search', '')
         department = request.args.get('department', '')
         doc_type = request.args.get('type', '')
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 10))
         
         query_filter = {}
+        search = None
 
         if search_query:
-            query_filter['$or'] = [
-                {'title': {'$regex': search_query, '$options': 'i'}},
-                {'summary': {'$regex': search_query, '$options': 'i'}},
-                {'tags': {'$regex': search_query, '$options': 'i'}},
-                {'content': {'$regex': search_query, '$options': 'i'}}
-            ]
+            condition, search = search_condition(search_query, request.args.get('search_mode', 'index'),
+                                                 by_relevance=request.args.get('sort') == 'relevance')
+            query_filter.update(condition)
         
         if department and department != 'all':
             query_filter['department'] = department
@@ -907,32 +1132,135 @@ def get_documents():
             formatted_type = doc_type.replace('-', ' ').title()
             query_filter['type'] = formatted_type
         
-        total = documents_collection.count_documents(query_filter)
-        
-        skip = (page - 1) * limit
-        documents = list(documents_collection.find(query_filter)
-                                   .sort('date', -1)
-                                   .skip(skip)
-                                   .limit(limit))
-        documents = [serialize_document(doc) for doc in documents]
-        
-        return jsonify({
-            'documents': documents,
-            'pagination': {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'pages': (total + limit - 1) // limit
-            }
-        })
+        return jsonify(paginated_listing(query_filter, search))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_documents: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
 # --- [UPDATED] UPLOAD ROUTE - Status is now AI-assigned ---
-@app.route('/api/documents/upload', methods=['POST'])
+def prepare_upload(file, timings):
+    """
+    Local half of an upload, everything before the Gemini call: text extraction, blob
+    storage, thumbnails and table detection (CPU and disk bound; the ASGI app runs it in
+    an executor). Raises ValueError when the file has no usable text. The caller owns
+    the returned `file_blob` reference until the document is inserted.
+    """
+    # 1. Extract text from the file
+    print(f"Processing file: {file.filename}")
+    file.stream.seek(0)
+    with stage_timer(timings, 'extraction'):
+        text_content = extract_text_from_file(file)
+
+    if text_content is None:
+        raise ValueError('Unsupported file type or error reading file')
+
+    if not text_content.strip():
+        raise ValueError('File appears to be empty')
+
+    print(f"Extracted {len(text_content)} characters.")
+
+    file.stream.seek(0)
+    original_bytes = file.read()
+
+    # Save original file for future viewing (identical uploads share one blob)
+    file.stream.seek(0)
+    with stage_timer(timings, 'storage'):
+        file_blob, file_size = blob_store.put(file.stream)
+
+    # First-page thumbnails, so lists and viewers never need the original
+    page_kind = page_source_kind(file.mimetype, file.filename)
+    page_total_count = None
+    if page_kind:
+        try:
+            with stage_timer(timings, 'thumbnail'):
+                page_total_count = page_count(original_bytes, page_kind)
+                for image_format in PAGE_IMAGE_FORMATS:
+                    cached_page(page_cache, file_blob, lambda: original_bytes, page_kind, 1, THUMBNAIL_WIDTH, image_format)
+        except Exception as e:
+            print(f"[PAGES] Thumbnail rendering failed for {file.filename}: {str(e)}")
+
+    # Detect tables locally on text-layer PDFs; Gemini only handles scanned/ambiguous pages
+    table_scan = None
+    if file.filename.lower().endswith('.pdf'):
+        try:
+            with stage_timer(timings, 'tables'):
+                table_scan = extract_pdf_tables(original_bytes)
+            print(f"[TABLES] Found {len(table_scan['tables'])} tables locally in {table_scan['seconds']}s, "
+                  f"{len(table_scan['ai_pages'])} pages left for Gemini.")
+        except Exception as e:
+            print(f"[TABLES] Local table extraction failed for {file.filename}: {str(e)}")
+
+    return {
+        'file_name': file.filename,
+        'file_mime': file.mimetype,
+        'text_content': text_content,
+        'original_bytes': original_bytes,
+        'file_blob': file_blob,
+        'file_size': file_size,
+        'page_count': page_total_count,
+        'table_scan': table_scan
+    }
+
+
+def analysis_arguments(prepared):
+    """Arguments for analyze_document_with_gemini (and its async twin) for a prepared upload."""
+    table_scan = prepared['table_scan']
+    return {
+        'text_content': prepared['text_content'],
+        'source_bytes': prepared['original_bytes'],
+        'filename': prepared['file_name'],
+        'mime_type': prepared['file_mime'],
+        'table_pages': table_scan['ai_pages'] if table_scan else None
+    }
+
+
+def build_uploaded_document(prepared, processed_data, timings, upload_started):
+    """Merge a prepared upload and its Gemini analysis into the document to insert."""
+    table_scan = prepared['table_scan']
+    processed_data['tables_data'] = merge_tables(table_scan, processed_data.get('tables_data'))
+    if table_scan:
+        processed_data['table_extraction'] = {
+            'engine': table_scan['engine'],
+            'seconds': table_scan['seconds'],
+            'pages': table_scan['pages'],
+            'ai_pages': table_scan['ai_pages']
+        }
+
+    # 3a. Ensure chart data is reliable before saving
+    with stage_timer(timings, 'charts'):
+        processed_data['charts'] = normalize_charts(processed_data)
+
+    # 3. Add remaining data (status is already in processed_data)
+    processed_data['content'] = prepared['text_content'] # Store the full text
+    processed_data['date'] = datetime.now()
+    # processed_data['status'] = 'review' # <-- REMOVED: Status is now AI-assigned
+    processed_data['source'] = 'uploaded'
+    processed_data['starred'] = False
+    processed_data['version'] = 1
+    processed_data['file_name'] = prepared['file_name']
+    processed_data['file_mime'] = prepared['file_mime']
+    processed_data['file_blob'] = prepared['file_blob']
+    processed_data['file_size'] = prepared['file_size']
+    if prepared['page_count']:
+        processed_data['page_count'] = prepared['page_count']
+
+    # Fallback analyses (no API key / API error) are tagged 'error'
+    auto_processed = 'error' not in (processed_data.get('tags') or [])
+    processed_data['processing'] = {
+        'stages': {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        'total_seconds': round(time.perf_counter() - upload_started, 4),
+        'auto_processed': auto_processed
+    }
+    processed_data['_id'] = ObjectId()
+    return processed_data
+
+
+@api.route('/api/documents/upload', methods=['POST'])
 def upload_document():
+    prepared = None
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -941,79 +1269,230 @@ def upload_document():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        # 1. Extract text from the file
-        print(f"Processing file: {file.filename}")
-        file.stream.seek(0)
-        text_content = extract_text_from_file(file)
-        
-        if text_content is None:
-            return jsonify({'error': 'Unsupported file type or error reading file'}), 400
-        
-        if not text_content.strip():
-            return jsonify({'error': 'File appears to be empty'}), 400
-            
-        print(f"Extracted {len(text_content)} characters.")
+        # Per-stage wall times, rolled up hourly/daily for the analytics endpoints
+        upload_started = time.perf_counter()
+        timings = {}
+        prepared = prepare_upload(file, timings)
 
         # 2. Analyze text with Gemini (includes status now)
-        file.stream.seek(0)
-        original_bytes = file.read()
-
-        # Save original file for future viewing
-        original_filename = secure_filename(file.filename) or f"document_{datetime.now().strftime('%Y%m%d_%H%M%S')}.bin"
-        unique_suffix = datetime.now().strftime('%Y%m%d%H%M%S%f')
-        stored_filename = f"{unique_suffix}_{original_filename}"
-        stored_path = UPLOAD_FOLDER / stored_filename
-        with open(stored_path, 'wb') as stored_file:
-            stored_file.write(original_bytes)
-
         print("Analyzing document with Gemini AI...")
-        processed_data = analyze_document_with_gemini(
-            text_content,
-            source_bytes=original_bytes,
-            filename=file.filename,
-            mime_type=file.mimetype
-        )
+        with stage_timer(timings, 'analysis'):
+            processed_data = analyze_document_with_gemini(**analysis_arguments(prepared))
         print("Analysis complete.")
-
-        # 3a. Ensure chart data is reliable before saving
-        processed_data['charts'] = normalize_charts(processed_data)
-
-        # 3. Add remaining data (status is already in processed_data)
-        processed_data['content'] = text_content # Store the full text
-        processed_data['date'] = datetime.now()
-        # processed_data['status'] = 'review' # <-- REMOVED: Status is now AI-assigned
-        processed_data['source'] = 'uploaded'
-        processed_data['starred'] = False
-        processed_data['file_name'] = file.filename
-        processed_data['file_mime'] = file.mimetype
-        processed_data['file_path'] = str(stored_path)
-        
-        # 4. Insert into database
-        result = documents_collection.insert_one(processed_data)
-        processed_data['_id'] = str(result.inserted_id)
+        processed_data = build_uploaded_document(prepared, processed_data, timings, upload_started)
+
+        # 4. Insert into database (content first, so a document never points at missing content)
+        content_fields = split_content(processed_data)
+        with stage_timer(timings, 'database'):
+            save_content(
+                contents_collection, processed_data['_id'], content_fields,
+                extra=index_fields(processed_data, content_fields.get('content'))
+            )
+            result = documents_collection.insert_one(processed_data)
+        prepared = None  # the document now holds the blob reference
+        timings['total'] = time.perf_counter() - upload_started
+        record_change(stats_collection, None, processed_data)
+        record_ingest(rollups_collection, processed_data, timings, processed_data['processing']['auto_processed'])
+        response_cache.invalidate()
+        processed_data.update(content_fields)
         processed_data = serialize_document(processed_data)
         
         print(f"Successfully added document {result.inserted_id} to database.")
         return jsonify(processed_data), 201
-        
+
+    except ValueError as e:
+        if prepared:
+            blob_store.release(prepared['file_blob'])
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
+        if prepared:
+            blob_store.release(prepared['file_blob'])
         print(f"Error in upload_document: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/<doc_id>', methods=['DELETE'])
+# Shared by all bulk uploads in the process: one thread per file in flight, with extraction
+# and Gemini calls bounded separately so slow analyses do not hold up extraction
+bulk_upload_executor = ThreadPoolExecutor(max_workers=BULK_EXTRACT_WORKERS + BULK_GEMINI_CONCURRENCY,
+                                          thread_name_prefix='bulk-upload')
+bulk_extract_slots = threading.BoundedSemaphore(BULK_EXTRACT_WORKERS)
+bulk_gemini_slots = threading.BoundedSemaphore(BULK_GEMINI_CONCURRENCY)
+
+
+def process_bulk_item(item, start_by, finish_by):
+    """
+    Extraction and analysis of one bulk upload file; returns the document to insert and its timings,
+    or None when the request's time budget ran out (`start_by`) before the file was started.
+    The Gemini call gets the time left until `finish_by`; with too little left the file keeps
+    the non-AI result.
+    """
+    upload_started = time.perf_counter()
+    timings = {}
+    with bulk_extract_slots:
+        if time.monotonic() > start_by:
+            return None
+        prepared = prepare_upload(item.open(), timings)
+    try:
+        with bulk_gemini_slots, stage_timer(timings, 'analysis'):
+            remaining = finish_by - time.monotonic()
+            if remaining < BULK_GEMINI_MIN_SECONDS:
+                processed_data = gemini_error_result(TimeoutError('bulk upload time limit reached, analysis skipped'))
+            else:
+                processed_data = analyze_document_with_gemini(**analysis_arguments(prepared), timeout=remaining)
+        return build_uploaded_document(prepared, processed_data, timings, upload_started), timings
+    except Exception:
+        blob_store.release(prepared['file_blob'])
+        raise
+
+
+def bulk_failure(file_name, error, status='failed'):
+    return {'file_name': file_name, 'status': status, 'error': error}
+
+
+def discard_bulk_item(future):
+    """Done callback for a file the request stopped waiting for: drop its blob reference."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    processed = future.result()
+    if processed is not None:
+        blob_store.release(processed[0]['file_blob'])
+
+
+def insert_bulk_batch(batch, results):
+    """Insert finished (position, document, content_fields, timings) entries and fill in their results."""
+    started = time.perf_counter()
+    try:
+        errors = insert_documents(documents_collection, contents_collection,
+                                  [(doc, content_fields) for _, doc, content_fields, _ in batch])
+    except Exception as e:
+        print(f"Error in bulk upload insert: {str(e)}")
+        errors = {offset: str(e) for offset in range(len(batch))}
+    elapsed = time.perf_counter() - started
+
+    inserted = []
+    for offset, (position, doc, _, timings) in enumerate(batch):
+        if offset in errors:
+            blob_store.release(doc['file_blob'])
+            results[position] = bulk_failure(doc['file_name'], errors[offset])
+            continue
+        timings['database'] = elapsed
+        timings['total'] = doc['processing']['total_seconds'] + elapsed
+        inserted.append((doc, timings, doc['processing']['auto_processed']))
+        listed = {field: doc[field] for field in LIST_FIELDS if field in doc}
+        listed['_id'] = doc['_id']
+        results[position] = {'file_name': doc['file_name'], 'status': 'created',
+                             'document': serialize_document(listed)}
+    if inserted:
+        record_changes(stats_collection, [(None, doc) for doc, _, _ in inserted])
+        record_ingests(rollups_collection, inserted)
+    return len(inserted)
+
+
+def run_bulk_upload(items):
+    """
+    Process items concurrently and insert them in batches as they finish; per-item results in order.
+    Files not started within BULK_UPLOAD_TIME_BUDGET are skipped, and files still in flight after
+    BULK_UPLOAD_MAX_SECONDS are abandoned (also skipped), so the request ends before the worker timeout.
+    """
+    results = [None] * len(items)
+    futures = {}
+    started = time.monotonic()
+    start_by, finish_by = started + BULK_UPLOAD_TIME_BUDGET, started + BULK_UPLOAD_MAX_SECONDS
+    for position, item in enumerate(items):
+        if item.error:
+            results[position] = bulk_failure(item.name, item.error)
+        else:
+            futures[bulk_upload_executor.submit(process_bulk_item, item, start_by, finish_by)] = position
+
+    batch = []
+    inserted = 0
+    try:
+        for future in as_completed(futures, timeout=max(finish_by - time.monotonic(), 0)):
+            position = futures[future]
+            try:
+                processed = future.result()
+            except ValueError as e:
+                results[position] = bulk_failure(items[position].name, str(e))
+                continue
+            except Exception as e:
+                print(f"Error in bulk upload of {items[position].name}: {str(e)}")
+                results[position] = bulk_failure(items[position].name, str(e))
+                continue
+            if processed is None:
+                results[position] = bulk_failure(items[position].name, 'Not processed in time, upload it again',
+                                                 'skipped')
+                continue
+            doc, timings = processed
+            batch.append((position, doc, split_content(doc), timings))
+            if len(batch) >= BULK_INSERT_BATCH:
+                inserted += insert_bulk_batch(batch, results)
+                batch = []
+    except TimeoutError:
+        waiting = {position for position, _, _, _ in batch}
+        pending = [(future, position) for future, position in futures.items()
+                   if results[position] is None and position not in waiting]
+        print(f"Bulk upload time limit reached, abandoning {len(pending)} files in flight.")
+        for future, position in pending:
+            future.add_done_callback(discard_bulk_item)
+            results[position] = bulk_failure(items[position].name,
+                                             'Still processing at the time limit, upload it again', 'skipped')
+    if batch:
+        inserted += insert_bulk_batch(batch, results)
+    if inserted:
+        response_cache.invalidate()
+    return results
+
+
+@api.route('/api/documents/upload/bulk', methods=['POST'])
+def bulk_upload_documents():
+    """
+    Upload many files at once: any number of multipart file parts and/or zip archives.
+    Each file goes through the single upload pipeline; results are per file, in request
+    order. 201 when all were created, 207 when some failed, 400 when none were created.
+    Files not started within BULK_UPLOAD_TIME_BUDGET come back as `skipped`, to be sent again.
+    """
+    try:
+        files = [file for key in request.files for file in request.files.getlist(key)]
+        items = upload_items(files, current_app.config['MAX_FILE_SIZE'])
+        if not items:
+            return jsonify({'error': 'No files provided'}), 400
+
+        print(f"Bulk upload of {len(items)} files...")
+        results = run_bulk_upload(items)
+        created = sum(1 for result in results if result['status'] == 'created')
+        skipped = sum(1 for result in results if result['status'] == 'skipped')
+        failed = len(results) - created - skipped
+        print(f"Bulk upload finished: {created} created, {failed} failed, {skipped} skipped.")
+
+        status_code = 201 if created == len(results) else 207 if created else 400
+        return jsonify({'results': results, 'created': created, 'failed': failed, 'skipped': skipped}), status_code
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in bulk_upload_documents: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/documents/<doc_id>', methods=['DELETE'])
 def delete_document(doc_id):
     try:
-        result = documents_collection.delete_one({'_id': ObjectId(doc_id)})
-        if result.deleted_count == 0:
+        deleted = documents_collection.find_one_and_delete(
+            {'_id': ObjectId(doc_id)},
+            projection={**COUNTER_PROJECTION, 'file_blob': 1}
+        )
+        if not deleted:
             return jsonify({'error': 'Document not found'}), 404
+        delete_content(contents_collection, deleted['_id'])
+        blob_store.release(deleted.get('file_blob'))
+        record_change(stats_collection, deleted, None)
+        response_cache.invalidate()
         return jsonify({'message': 'Document deleted successfully'}), 200
     except Exception as e:
         print(f"Error in delete_document: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/search/semantic', methods=['POST'])
+@api.route('/api/search/semantic', methods=['POST'])
 def search_semantic_route():
     try:
         data = request.get_json()
@@ -1022,28 +1501,35 @@ def search_semantic_route():
         if not query:
             return jsonify({'error': 'Query is required'}), 400
 
-        results = semantic_search(query, documents_collection)
+        results = semantic_search(query, documents_collection, projection=parse_fields(data.get('fields')))
         
         return jsonify({'results': results})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in semantic search: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/<doc_id>', methods=['GET'])
+@api.route('/api/documents/<doc_id>', methods=['GET'])
 def get_document(doc_id):
     try:
         doc = documents_collection.find_one({'_id': ObjectId(doc_id)})
         if not doc:
             return jsonify({'error': 'Document not found'}), 404
+        # Revalidate before loading the (large) content
+        etag = document_etag(doc)
+        if client_has(etag):
+            return not_modified(etag)
+        attach_content(contents_collection, [doc])
         
-        return jsonify(serialize_document(doc))
+        return tag_response(jsonify(document_json.encode(doc, serialize_document)), etag)
     except Exception as e:
         print(f"Error in get_document: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/<doc_id>', methods=['PUT'])
+@api.route('/api/documents/<doc_id>', methods=['PUT'])
 def update_document(doc_id):
     try:
         data = request.get_json()
@@ -1059,124 +1545,176 @@ def update_document(doc_id):
         if not update_data: 
             return jsonify({'error': 'No update fields provided'}), 400
 
-        result = documents_collection.update_one(
+        before = documents_collection.find_one_and_update(
             {'_id': ObjectId(doc_id)},
-            {'$set': update_data}
+            {'$set': update_data, '$inc': {'version': 1}},
+            projection=COUNTER_PROJECTION,
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if before is None:
             return jsonify({'error': 'Document not found'}), 404
         
+        record_change(stats_collection, before, {**before, **update_data})
+        if 'tags' in update_data:
+            # Tags are part of the search index
+            index_document(
+                contents_collection,
+                documents_collection.find_one({'_id': before['_id']},
+                                              {'title': 1, 'summary': 1, 'tags': 1, 'content': 1})
+            )
+        response_cache.invalidate()
+        
         return jsonify({'message': 'Document updated successfully'}), 200
     except Exception as e:
         print(f"Error in update_document: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/<doc_id>/file', methods=['GET'])
+@api.route('/api/documents/<doc_id>/file', methods=['GET'])
 def download_original_file(doc_id):
     """Stream the originally uploaded file for inline viewing."""
     try:
         doc = documents_collection.find_one(
             {'_id': ObjectId(doc_id)},
-            {'file_path': 1, 'file_name': 1, 'file_mime': 1}
+            {'file_blob': 1, 'file_path': 1, 'file_name': 1, 'file_mime': 1}
         )
-        if not doc or not doc.get('file_path'):
+        if not doc or not (doc.get('file_blob') or doc.get('file_path')):
             return jsonify({'error': 'File not found'}), 404
         
-        file_path = Path(doc['file_path'])
-        if not file_path.exists():
+        # Local blobs and legacy uploads go through send_file's path handling (sendfile, ranges)
+        if doc.get('file_blob'):
+            file_source = blob_store.local_path(doc['file_blob'])
+        else:
+            file_source = Path(doc['file_path'])
+        if file_source is None:
+            try:
+                file_source = blob_store.open(doc['file_blob'])
+            except FileNotFoundError:
+                return jsonify({'error': 'File missing on server'}), 404
+        elif not file_source.exists():
             return jsonify({'error': 'File missing on server'}), 404
         
         return send_file(
-            file_path,
+            file_source,
             mimetype=doc.get('file_mime') or 'application/octet-stream',
             as_attachment=False,
-            download_name=doc.get('file_name') or file_path.name
+            download_name=doc.get('file_name') or f"{doc_id}.bin"
         )
     except Exception as e:
         print(f"Error in download_original_file: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/stats', methods=['GET'])
+@api.route('/api/documents/<doc_id>/pages/<int:page_number>', methods=['GET'])
+def get_page_image(doc_id, page_number):
+    """
+    One page of a PDF (or an uploaded image) as WebP/JPEG. `width` is rounded
+    up to a supported size; `format=webp|jpeg` overrides Accept negotiation.
+    """
+    try:
+        doc = documents_collection.find_one(
+            {'_id': ObjectId(doc_id)},
+            {'file_blob': 1, 'file_path': 1, 'file_name': 1, 'file_mime': 1}
+        )
+        if not doc or not (doc.get('file_blob') or doc.get('file_path')):
+            return jsonify({'error': 'File not found'}), 404
+        kind = page_source_kind(doc.get('file_mime'), doc.get('file_name'))
+        if not kind:
+            return jsonify({'error': 'Page images are only available for PDFs and JPEG, PNG, GIF, BMP, TIFF or WebP'}), 415
+        
+        width = snap_width(int(request.args.get('width', DEFAULT_PAGE_WIDTH)))
+        image_format = negotiate_format(request.args.get('format'), request.headers.get('Accept'))
+        
+        def load_source():
+            # Local blobs and legacy uploads are opened by path; other backends are read into memory
+            path = blob_store.local_path(doc['file_blob']) if doc.get('file_blob') else Path(doc['file_path'])
+            if path is not None:
+                if not path.exists():
+                    raise FileNotFoundError('File missing on server')
+                return str(path)
+            source, _ = open_original(blob_store, doc)
+            with source:
+                return source.read()
+        
+        source_key = doc.get('file_blob') or f"doc-{doc['_id']}"
+        image_path = cached_page(page_cache, source_key, load_source, kind, page_number, width, image_format)
+        
+        response = send_file(
+            image_path,
+            mimetype=PAGE_IMAGE_FORMATS[image_format][0],
+            etag=f"{source_key[:24]}-{image_path.name}",
+            max_age=PAGE_CACHE_MAX_AGE
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        if not request.args.get('format'):
+            response.vary.add('Accept')
+        return response
+    except IndexError as e:
+        return jsonify({'error': str(e)}), 404
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_page_image: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/stats', methods=['GET'])
+@response_cache.cached()
 def get_stats():
     try:
-        total_docs = documents_collection.count_documents({})
-        urgent_docs = documents_collection.count_documents({'status': 'urgent'})
-        today_docs = documents_collection.count_documents({
-            'date': {'$gte': datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)}
-        })
+        counts = get_dashboard_counts()
         
         return jsonify({
-            'total_documents': total_docs,
-            'urgent_items': urgent_docs,
-            'documents_today': today_docs
+            'total_documents': counts['total'],
+            'urgent_items': counts['status'].get('urgent', 0),
+            'documents_today': counts['today']
         })
     except Exception as e:
         print(f"Error in get_stats: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/dashboard/stats', methods=['GET'])
-def get_dashboard_stats():
-    """Get comprehensive dashboard statistics"""
+@api.route('/api/dashboard/summary', methods=['GET'])
+@response_cache.cached()
+def get_dashboard_summary():
+    """Every dashboard widget in one response (?fields=stats,tags,... selects a subset)"""
     try:
-        total_docs = documents_collection.count_documents({})
-        urgent_docs = documents_collection.count_documents({'status': 'urgent'})
-        today_docs = documents_collection.count_documents({
-            'date': {'$gte': datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)}
-        })
-        approved_docs = documents_collection.count_documents({'status': 'approved'})
-        review_docs = documents_collection.count_documents({'status': 'review'})
-        starred_docs = documents_collection.count_documents({'starred': True})
+        requested = {field.strip() for field in request.args.get('fields', '').split(',') if field.strip()}
+        unknown = requested - set(DASHBOARD_WIDGETS)
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
         
-        # Calculate average processing time (mock for now)
-        avg_processing_time = 2.3
+        summary = build_dashboard_summary(requested or set(DASHBOARD_WIDGETS))
         
-        return jsonify({
-            'total_documents': total_docs,
-            'urgent_items': urgent_docs,
-            'documents_today': today_docs,
-            'approved_documents': approved_docs,
-            'review_documents': review_docs,
-            'starred_documents': starred_docs,
-            'avg_processing_time': avg_processing_time,
-            'processing_efficiency': 94.2
-        })
+        # The response cache adds the weak ETag and answers matching If-None-Match with 304
+        return jsonify(summary)
+    except Exception as e:
+        print(f"Error in get_dashboard_summary: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/dashboard/stats', methods=['GET'])
+@response_cache.cached()
+def get_dashboard_stats():
+    """Get comprehensive dashboard statistics"""
+    try:
+        return jsonify(dashboard_stats_widget(get_dashboard_counts(), recent_processing_summary()))
     except Exception as e:
         print(f"Error in get_dashboard_stats: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/dashboard/departments', methods=['GET'])
+@api.route('/api/dashboard/departments', methods=['GET'])
+@response_cache.cached()
 def get_department_stats():
     """Get document count and urgent items per department"""
     try:
-        departments_list = [
-            "Operations", "Engineering", "Safety", "Procurement",
-            "Human Resources", "Finance", "Environment"
-        ]
-        
-        dept_stats = []
-        for dept in departments_list:
-            total = documents_collection.count_documents({'department': dept})
-            urgent = documents_collection.count_documents({
-                'department': dept,
-                'status': 'urgent'
-            })
-            approved = documents_collection.count_documents({
-                'department': dept,
-                'status': 'approved'
-            })
-            
-            dept_stats.append({
-                'name': dept,
-                'total_docs': total,
-                'urgent_items': urgent,
-                'approved_items': approved,
-                'pending_items': total - urgent - approved
-            })
+        counts = get_dashboard_counts()
+        dept_stats = department_breakdown(counts)
         
         return jsonify({'departments': dept_stats})
     except Exception as e:
@@ -1184,45 +1722,51 @@ def get_department_stats():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/dashboard/tags', methods=['GET'])
+@api.route('/api/dashboard/tags', methods=['GET'])
+@response_cache.cached()
 def get_tags_stats():
-    """Get most common tags with frequencies"""
+    """Get most common tags with frequencies (optional department, status, date_from, date_to, limit)"""
     try:
-        all_tags = []
-        for doc in documents_collection.find({}, {'tags': 1}):
-            if doc.get('tags'):
-                all_tags.extend(doc['tags'])
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        department = request.args.get('department', '')
+        status = request.args.get('status', '')
+        date_from = request.args.get('date_from', '')
+        date_to = request.args.get('date_to', '')
         
-        tag_counts = Counter(all_tags)
-        top_tags = tag_counts.most_common(10)
+        query_filter = {}
+        if department and department != 'all':
+            query_filter['department'] = department
+        if status:
+            query_filter['status'] = status
+        if date_from or date_to:
+            date_range = {}
+            if date_from:
+                date_range['$gte'] = datetime.strptime(date_from, '%Y-%m-%d')
+            if date_to:
+                date_range['$lte'] = datetime.strptime(date_to, '%Y-%m-%d')
+            query_filter['date'] = date_range
         
-        tags_data = [
-            {'tag': tag, 'count': count}
-            for tag, count in top_tags
-        ]
+        if query_filter:
+            tags_data = filtered_top_tags(documents_collection, query_filter, limit)
+        else:
+            # Unfiltered: read the maintained tag counters
+            get_dashboard_counts()  # materializes counters on first use
+            tags_data = top_tags(stats_collection, limit)
         
         return jsonify({'tags': tags_data})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_tags_stats: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/dashboard/document-types', methods=['GET'])
+@api.route('/api/dashboard/document-types', methods=['GET'])
+@response_cache.cached()
 def get_document_types_stats():
     """Get document count by type"""
     try:
-        pipeline = [
-            {'$group': {'_id': '$type', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}},
-            {'$limit': 10}
-        ]
-        
-        doc_types = list(documents_collection.aggregate(pipeline))
-        
-        types_data = [
-            {'type': item['_id'] or 'Unknown', 'count': item['count']}
-            for item in doc_types
-        ]
+        types_data = document_types_widget(get_dashboard_counts())
         
         return jsonify({'document_types': types_data})
     except Exception as e:
@@ -1230,25 +1774,13 @@ def get_document_types_stats():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/dashboard/status-distribution', methods=['GET'])
+@api.route('/api/dashboard/status-distribution', methods=['GET'])
+@response_cache.cached()
 def get_status_distribution():
     """Get document distribution by status"""
     try:
-        statuses = ['urgent', 'review', 'approved']
-        
-        status_data = []
-        for status in statuses:
-            count = documents_collection.count_documents({'status': status})
-            status_data.append({
-                'status': status,
-                'count': count,
-                'percentage': 0
-            })
-        
-        total = sum(item['count'] for item in status_data)
-        if total > 0:
-            for item in status_data:
-                item['percentage'] = round((item['count'] / total) * 100, 1)
+        counts = get_dashboard_counts()
+        status_data = status_breakdown(counts)
         
         return jsonify({'status_distribution': status_data})
     except Exception as e:
@@ -1256,38 +1788,27 @@ def get_status_distribution():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/dashboard/recent-documents', methods=['GET'])
+@api.route('/api/dashboard/recent-documents', methods=['GET'])
+@response_cache.cached()
 def get_recent_documents():
     """Get 5 most recent documents"""
     try:
-        recent_docs = list(
-            documents_collection.find({})
-            .sort('date', -1)
-            .limit(5)
-        )
-        recent_docs = [serialize_document(doc) for doc in recent_docs]
+        recent_docs = recent_documents_widget(parse_fields(request.args.get('fields')))
         
         return jsonify({'recent_documents': recent_docs})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_recent_documents: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/dashboard/language-distribution', methods=['GET'])
+@api.route('/api/dashboard/language-distribution', methods=['GET'])
+@response_cache.cached()
 def get_language_distribution():
     """Get document distribution by language"""
     try:
-        pipeline = [
-            {'$group': {'_id': '$language', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}}
-        ]
-        
-        languages = list(documents_collection.aggregate(pipeline))
-        
-        language_data = [
-            {'language': item['_id'] or 'Unknown', 'count': item['count']}
-            for item in languages
-        ]
+        language_data = language_distribution_widget(get_dashboard_counts())
         
         return jsonify({'language_distribution': language_data})
     except Exception as e:
@@ -1295,127 +1816,215 @@ def get_language_distribution():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/<doc_id>/download', methods=['GET'])
+@api.route('/api/documents/stats/dashboard', methods=['GET'])
+@response_cache.cached()
+def get_analytics_dashboard():
+    """Summary numbers for the analytics page (document types and languages)"""
+    try:
+        counts = get_dashboard_counts()
+        doc_types = sorted(counts['type'].items(), key=lambda item: item[1], reverse=True)[:10]
+        languages = sorted(counts['language'].items(), key=lambda item: item[1], reverse=True)
+        
+        return jsonify({
+            'total_documents': counts['total'],
+            'documentTypes': {
+                'labels': [doc_type for doc_type, _ in doc_types],
+                'values': [count for _, count in doc_types]
+            },
+            'languagesDetected': len(languages),
+            'primaryLanguages': "/".join(language for language, _ in languages[:2]) or None
+        })
+    except Exception as e:
+        print(f"Error in get_analytics_dashboard: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/documents/stats/upload-trends', methods=['GET'])
+@response_cache.cached()
+def get_upload_trends():
+    """Uploads per hour/day/month from the ingest rollups (?granularity=&days= or ?from=&to=)"""
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in ('hour', 'day', 'month'):
+            return jsonify({'error': 'granularity must be hour, day or month'}), 400
+        
+        start, end = parse_range(request.args, default_days=365 if granularity == 'month' else 30)
+        return jsonify(upload_trends(rollups_collection, granularity, start, end))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_upload_trends: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/documents/stats/department-distribution', methods=['GET'])
+@response_cache.cached()
+def get_department_distribution():
+    """Documents per department; over a date range when ?days= or ?from=/&to= is given"""
+    try:
+        if any(request.args.get(arg) for arg in ('days', 'from', 'to')):
+            start, end = parse_range(request.args)
+            return jsonify(distribution(rollups_collection, 'department', start, end))
+        
+        # No range: current corpus from the materialized counters
+        counts = get_dashboard_counts()
+        departments = sorted(counts['department'].items(), key=lambda item: item[1], reverse=True)
+        return jsonify({
+            'labels': [dept for dept, _ in departments],
+            'values': [count for _, count in departments]
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_department_distribution: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/documents/stats/processing-efficiency', methods=['GET'])
+@response_cache.cached()
+def get_processing_efficiency():
+    """Processing-time trend, per-stage latency and auto-processed rate (?days= or ?from=&to=)"""
+    try:
+        start, end = parse_range(request.args)
+        return jsonify(processing_efficiency(rollups_collection, start, end))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_processing_efficiency: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/documents/<doc_id>/download', methods=['GET'])
 def download_document(doc_id):
-    """Download a document as a text file with metadata."""
+    """Download a document with its metadata as a text report (`format=md|json` for variants)."""
     try:
+        download_format = request.args.get('format', 'txt').lower()
+        if download_format not in DOWNLOAD_FORMATS:
+            return jsonify({'error': f"Unsupported download format: {download_format}"}), 400
+        
         doc = documents_collection.find_one({'_id': ObjectId(doc_id)})
         if not doc:
             return jsonify({'error': 'Document not found'}), 404
         
-        # Create a formatted text file content
-        content = []
-        content.append(f"{'='*80}")
-        content.append(f"DOCUMENT: {doc.get('title', 'Untitled')}")
-        content.append(f"{'='*80}\n")
-        
-        # Add metadata
-        content.append("METADATA:")
-        content.append(f"  Department: {doc.get('department', 'N/A')}")
-        content.append(f"  Type: {doc.get('type', 'N/A')}")
-        content.append(f"  Date: {doc.get('date', 'N/A')}")
-        content.append(f"  Status: {doc.get('status', 'N/A')}")
-        content.append(f"  Source: {doc.get('source', 'N/A')}")
-        content.append(f"  Language: {doc.get('language', 'N/A')}")
-        content.append(f"  ID: {str(doc['_id'])}\n")
-        
-        # Add tags
-        if doc.get('tags'):
-            content.append(f"Tags: {', '.join(doc.get('tags', []))}\n")
-        
-        # Add summary
-        if doc.get('summary'):
-            content.append("SUMMARY:")
-            content.append(f"{doc.get('summary', '')}\n")
-        
-        # Add tables
-        if doc.get('tables_data') and len(doc.get('tables_data', [])) > 0:
-            content.append("\nTABLES:")
-            content.append("-" * 80)
-            for idx, table_obj in enumerate(doc.get('tables_data', []), 1):
-                caption = table_obj.get('caption', f'Table {idx}')
-                content.append(f"\n{caption}:")
-                
-                if table_obj.get('data') and len(table_obj.get('data', [])) > 0:
-                    table_data = table_obj.get('data', [])
-                    # Add header
-                    header = table_data[0]
-                    content.append(" | ".join(str(h) for h in header))
-                    content.append("-" * 80)
-                    # Add rows
-                    for row in table_data[1:]:
-                        content.append(" | ".join(str(cell) for cell in row))
-                content.append("")
-        
-        # Add full content
-        if doc.get('content'):
-            content.append("\nFULL CONTENT:")
-            content.append("-" * 80)
-            content.append(doc.get('content', ''))
-        
-        content.append(f"\n{'='*80}")
-        content.append("End of Document")
-        content.append(f"{'='*80}")
-        
-        file_content = "\n".join(content)
-        
-        # Create BytesIO object
-        file_obj = BytesIO(file_content.encode('utf-8'))
-        
-        # Create sanitized filename
+        # Documents not yet migrated still carry their content inline
+        if 'tables_data' in doc:
+            tables = doc.pop('tables_data')
+        else:
+            tables = load_content(contents_collection, doc['_id'], ['tables_data']).get('tables_data')
+        if 'content' in doc:
+            chunks = [doc.pop('content')]
+        else:
+            chunks = iter_content_text(contents_collection, doc['_id'])
+        doc.pop('figures_data', None)
+        
+        mimetype, extension = DOWNLOAD_FORMATS[download_format]
         safe_title = doc.get('title', 'document').replace(" ", "_").replace("/", "_")
-        filename = f"{safe_title}_{str(doc['_id'])[:8]}.txt"
+        filename = f"{safe_title}_{str(doc['_id'])[:8]}.{extension}"
         
-        return send_file(
-            file_obj,
-            mimetype='text/plain',
-            as_attachment=True,
-            download_name=filename
+        return Response(
+            render_download(doc, tables, chunks, download_format),
+            mimetype=mimetype,
+            headers={'Content-Disposition': content_disposition(filename)}
         )
     except Exception as e:
         print(f"Error in download_document: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/export/csv', methods=['GET'])
-def export_documents_csv():
-    """Export all documents as CSV"""
+@api.route('/api/documents/export/<export_format>', methods=['GET', 'POST'])
+def export_documents(export_format):
+    """
+    Stream matching documents as CSV or JSONL (gzip with `gzip=1`).
+    Filters are the advanced search ones, as query args or a JSON body.
+    """
     try:
-        import csv
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f"Unsupported export format: {export_format}"}), 400
         
-        documents = list(documents_collection.find({}))
+        data = request.get_json(silent=True) or request.args.to_dict()
+        if isinstance(data.get('tags'), str):
+            data['tags'] = [tag for tag in data['tags'].split(',') if tag]
+        query_filter, search = advanced_search_filter(data)
         
-        if not documents:
-            return jsonify({'error': 'No documents to export'}), 404
+        columns = list(parse_fields(data.get('fields'))) if data.get('fields') else EXPORT_COLUMNS
+        projection = {column: 1 for column in columns}
+        compress = str(data.get('gzip', '')).lower() in ('1', 'true', 'yes')
         
-        output = BytesIO()
-        writer = csv.DictWriter(output, fieldnames=['title', 'department', 'type', 'status', 'date', 'language'])
-        writer.writeheader()
+        if documents_collection.find_one(query_filter, {'_id': 1}) is None:
+            return jsonify({'error': 'No documents to export'}), 404
         
-        for doc in documents:
-            writer.writerow({
-                'title': doc.get('title', ''),
-                'department': doc.get('department', ''),
-                'type': doc.get('type', ''),
-                'status': doc.get('status', ''),
-                'date': doc.get('date', ''),
-                'language': doc.get('language', '')
-            })
+        cursor = (documents_collection.find(query_filter, projection)
+                  .sort(KEYSET_SORT)
+                  .batch_size(EXPORT_BATCH_SIZE))
+        rows = batched(cursor, prepare=lambda batch: attach_content(contents_collection, batch, columns))
         
-        output.seek(0)
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        filename = f"documents_export.{extension}"
+        if compress:
+            mimetype, filename = 'application/gzip', filename + '.gz'
         
-        return send_file(
-            output,
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name='documents_export.csv'
+        return Response(
+            export_stream(rows, export_format, columns, compress),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"', **truncation_headers(search)}
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in export_documents: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/documents/bundle', methods=['GET', 'POST'])
+def download_bundle():
+    """
+    Stream a ZIP of the original files for `ids` (list or comma-separated)
+    or for the documents matching the advanced search filters.
+    """
+    try:
+        data = request.get_json(silent=True) or request.args.to_dict()
+        ids = data.get('ids') or []
+        if isinstance(ids, str):
+            ids = [doc_id for doc_id in ids.split(',') if doc_id]
+        if isinstance(data.get('tags'), str):
+            data['tags'] = [tag for tag in data['tags'].split(',') if tag]
+        
+        requested_ids = None
+        search = None
+        if ids:
+            if not all(ObjectId.is_valid(doc_id) for doc_id in ids):
+                return jsonify({'error': 'Invalid document id in ids'}), 400
+            requested_ids = list(dict.fromkeys(ObjectId(doc_id) for doc_id in ids))
+            query_filter = {'_id': {'$in': requested_ids}}
+        else:
+            query_filter, search = advanced_search_filter(data)
+            if not query_filter:
+                return jsonify({'error': 'ids or at least one filter is required'}), 400
+        
+        matched = documents_collection.count_documents(query_filter, limit=BUNDLE_MAX_DOCUMENTS + 1)
+        if not matched:
+            return jsonify({'error': 'No documents to bundle'}), 404
+        if matched > BUNDLE_MAX_DOCUMENTS:
+            return jsonify({'error': f'Bundles are limited to {BUNDLE_MAX_DOCUMENTS} documents'}), 400
+        
+        projection = {'file_blob': 1, 'file_size': 1, 'file_path': 1, 'file_name': 1, 'title': 1, 'date': 1}
+        cursor = (documents_collection.find(query_filter, projection)
+                  .sort(KEYSET_SORT)
+                  .batch_size(100))
+        
+        return Response(
+            bundle_chunks(cursor, lambda doc: open_original(blob_store, doc), requested_ids),
+            mimetype='application/zip',
+            headers={'Content-Disposition': 'attachment; filename="documents_bundle.zip"', **truncation_headers(search)}
         )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error in export_documents_csv: {str(e)}")
+        print(f"Error in download_bundle: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/bulk-update-status', methods=['PUT'])
+@api.route('/api/documents/bulk-update-status', methods=['PUT'])
 def bulk_update_status():
     """Bulk update document status"""
     try:
@@ -1427,12 +2036,20 @@ def bulk_update_status():
             return jsonify({'error': 'doc_ids and status are required'}), 400
         
         object_ids = [ObjectId(doc_id) for doc_id in doc_ids]
+        changing = list(documents_collection.find(
+            {'_id': {'$in': object_ids}, 'status': {'$ne': new_status}},
+            COUNTER_PROJECTION
+        ))
         
         result = documents_collection.update_many(
-            {'_id': {'$in': object_ids}},
-            {'$set': {'status': new_status}}
+            {'_id': {'$in': object_ids}, 'status': {'$ne': new_status}},
+            {'$set': {'status': new_status}, '$inc': {'version': 1}}
         )
         
+        record_changes(stats_collection, [(doc, {**doc, 'status': new_status}) for doc in changing])
+        if result.modified_count:
+            response_cache.invalidate()
+        
         return jsonify({
             'message': f'Updated {result.modified_count} documents',
             'modified_count': result.modified_count
@@ -1442,76 +2059,137 @@ def bulk_update_status():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/search-advanced', methods=['POST'])
+def advanced_search_filter(data, by_relevance=False):
+    """
+    Mongo filter (and ranked search matches) for an advanced search request body.
+    Search matches are capped at SEARCH_MAX_RESULTS: the best scoring when `by_relevance`, else the newest.
+    """
+    search_query = data.get('search', '')
+    department = data.get('department', '')
+    doc_type = data.get('type', '')
+    status = data.get('status', '')
+    date_from = data.get('date_from', '')
+    date_to = data.get('date_to', '')
+    tags = data.get('tags', [])
+    
+    query_filter = {}
+    search = None
+    
+    if search_query:
+        condition, search = search_condition(search_query, data.get('search_mode', 'index'), by_relevance)
+        query_filter.update(condition)
+    
+    if department:
+        query_filter['department'] = department
+    
+    if doc_type:
+        query_filter['type'] = doc_type.replace('-', ' ').title()
+    
+    if status:
+        query_filter['status'] = status
+    
+    if date_from or date_to:
+        date_range = {}
+        if date_from:
+            date_range['$gte'] = datetime.strptime(date_from, '%Y-%m-%d')
+        if date_to:
+            date_range['$lte'] = datetime.strptime(date_to, '%Y-%m-%d')
+        if date_range:
+            query_filter['date'] = date_range
+    
+    if tags and len(tags) > 0:
+        query_filter['tags'] = {'$in': tags}
+    
+    return query_filter, search
+
+
+def stream_ndjson(query_filter, projection, search=None):
+    """Yield matches newest first as NDJSON, reading the cursor in bounded batches."""
+    cursor = (documents_collection.find(query_filter, projection)
+              .sort(KEYSET_SORT)
+              .batch_size(NDJSON_BATCH_SIZE))
+
+    def prepare(batch):
+        attach_content(contents_collection, batch, projection)
+        return add_scores(batch, search)
+
+    for doc in batched(cursor, NDJSON_BATCH_SIZE, prepare):
+        yield dumpb(serialize_document(doc)) + b'\n'
+
+
+@api.route('/api/documents/search-advanced', methods=['POST'])
 def advanced_search():
-    """Advanced search with multiple filters"""
+    """
+    Advanced search with multiple filters.
+    Returns a page of results (`limit`, `cursor`) with facet counts over all matches;
+    `format: 'ndjson'` streams every match instead.
+    """
     try:
-        data = request.get_json()
-        search_query = data.get('search', '')
-        department = data.get('department', '')
-        doc_type = data.get('type', '')
-        status = data.get('status', '')
-        date_from = data.get('date_from', '')
-        date_to = data.get('date_to', '')
-        tags = data.get('tags', [])
-        
-        query_filter = {}
-        
-        if search_query:
-            query_filter['$or'] = [
-                {'title': {'$regex': search_query, '$options': 'i'}},
-                {'summary': {'$regex': search_query, '$options': 'i'}},
-                {'tags': {'$regex': search_query, '$options': 'i'}},
-                {'content': {'$regex': search_query, '$options': 'i'}}
-            ]
-        
-        if department:
-            query_filter['department'] = department
-        
-        if doc_type:
-            query_filter['type'] = doc_type.replace('-', ' ').title()
+        data = request.get_json() or {}
+        projection = parse_fields(data.get('fields'))
+        stream = data.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson'
+        query_filter, search = advanced_search_filter(data, by_relevance=not stream and data.get('sort') == 'relevance')
+        
+        if stream:
+            return Response(
+                stream_ndjson(query_filter, projection, search),
+                mimetype='application/x-ndjson',
+                headers=truncation_headers(search)
+            )
         
-        if status:
-            query_filter['status'] = status
+        limit = max(1, min(int(data.get('limit', 20)), MAX_PAGE_SIZE))
+        cursor = data.get('cursor')
+        by_relevance = search is not None and search.scored and data.get('sort') == 'relevance'
         
-        if date_from or date_to:
-            date_range = {}
-            if date_from:
-                date_range['$gte'] = datetime.strptime(date_from, '%Y-%m-%d')
-            if date_to:
-                date_range['$lte'] = datetime.strptime(date_to, '%Y-%m-%d')
-            if date_range:
-                query_filter['date'] = date_range
-        
-        if tags and len(tags) > 0:
-            query_filter['tags'] = {'$in': tags}
+        # One aggregation for the page and the facet counts (relevance pages come from the ranked ids)
+        documents, next_cursor, total, facets = run_search_facets(
+            documents_collection, query_filter, cursor, limit, projection,
+            include_results=not by_relevance
+        )
+        if by_relevance:
+            documents, next_cursor, _ = ranked_page(
+                documents_collection, query_filter, search.ids, cursor, limit, projection
+            )
         
-        documents = list(documents_collection.find(query_filter).sort('date', -1))
-        documents = [serialize_document(doc) for doc in documents]
+        attach_content(contents_collection, documents, projection)
+        add_scores(documents, search)
+        documents = encode_documents(documents)
         
         return jsonify({
             'results': documents,
-            'count': len(documents)
+            'count': total,
+            'facets': facets,
+            'pagination': {
+                'limit': limit,
+                'next': next_cursor,
+                'has_more': next_cursor is not None,
+                'truncated': search is not None and search.truncated
+            }
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in advanced_search: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/<doc_id>/star', methods=['POST'])
+@api.route('/api/documents/<doc_id>/star', methods=['POST'])
 def star_document(doc_id):
     """Star/unstar a document"""
     try:
-        doc = documents_collection.find_one({'_id': ObjectId(doc_id)})
+        doc = documents_collection.find_one({'_id': ObjectId(doc_id)}, COUNTER_PROJECTION)
         if not doc:
             return jsonify({'error': 'Document not found'}), 404
         
         new_starred_state = not doc.get('starred', False)
         
-        documents_collection.update_one(
-            {'_id': ObjectId(doc_id)},
-            {'$set': {'starred': new_starred_state}}
+        result = documents_collection.update_one(
+            {'_id': ObjectId(doc_id), 'starred': doc.get('starred')},
+            {'$set': {'starred': new_starred_state}, '$inc': {'version': 1}}
         )
+        if result.modified_count:
+            record_change(stats_collection, doc, {**doc, 'starred': new_starred_state})
+            response_cache.invalidate()
         
         return jsonify({
             'message': f'Document {"starred" if new_starred_state else "unstarred"} successfully',
@@ -1522,7 +2200,21 @@ def star_document(doc_id):
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Response cache hit ratio and per-outcome latency, page image cache size"""
+    try:
+        return jsonify({
+            **response_cache.stats(),
+            'page_images': page_cache.stats(),
+            'document_json': document_json.stats()
+        })
+    except Exception as e:
+        print(f"Error in get_cache_stats: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     try:
@@ -1533,64 +2225,50 @@ def health_check():
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
 
 
-@app.route('/api/documents/starred', methods=['GET'])
+@api.route('/api/documents/starred', methods=['GET'])
+@response_cache.cached()
 def get_starred_documents():
     """Get all starred documents"""
     try:
+        projection = parse_fields(request.args.get('fields'))
         starred_docs = list(
-            documents_collection.find({'starred': True})
+            documents_collection.find({'starred': True}, projection)
             .sort('date', -1)
         )
-        starred_docs = [serialize_document(doc) for doc in starred_docs]
+        attach_content(contents_collection, starred_docs, projection)
+        starred_docs = encode_documents(starred_docs)
         
         return jsonify({
             'documents': starred_docs,
             'count': len(starred_docs)
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_starred_documents: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/documents/filter-by-department/<department>', methods=['GET'])
+@api.route('/api/documents/filter-by-department/<department>', methods=['GET'])
+@response_cache.cached()
 def get_documents_by_department(department):
     """Get all documents from a specific department"""
     try:
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 10))
-        
-        total = documents_collection.count_documents({'department': department})
-        
-        skip = (page - 1) * limit
-        documents = list(
-            documents_collection.find({'department': department})
-            .sort('date', -1)
-            .skip(skip)
-            .limit(limit)
-        )
-        documents = [serialize_document(doc) for doc in documents]
-        
-        return jsonify({
-            'documents': documents,
-            'pagination': {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'pages': (total + limit - 1) // limit
-            }
-        })
+        return jsonify(paginated_listing({'department': department}))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_documents_by_department: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
     return jsonify({'error': 'Endpoint not found'}), 404
 
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
     return jsonify({'error': 'Internal server error'}), 500
@@ -1600,4 +2278,5 @@ if __name__ == '__main__':
     if not GEMINI_API_KEY:
         print("🚨 Warning: GEMINI_API_KEY environment variable is not set.")
         print("AI features will be disabled, and mock data will be used.")
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app = create_app()
+    app.run(debug=app.config['DEBUG'], port=5000)
\ No newline at end of file
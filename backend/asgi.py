@@ -0,0 +1,12 @@
+"""
+ASGI entry point for the async serving mode (async_app.py).
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+Uses ProductionConfig unless APP_ENV says otherwise.
+"""
+import os
+
+from async_app import create_asgi_app
+
+app = create_asgi_app(os.getenv('APP_ENV', 'production'))
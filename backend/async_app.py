@@ -0,0 +1,287 @@
+"""
+ASGI serving mode: the Gemini- and Mongo-bound endpoints as coroutines.
+
+    uvicorn asgi:app --workers 4
+
+A sync worker thread sits idle for the seconds an upload waits on Gemini or
+a slow query waits on Mongo. Here those waits are awaited instead, so one
+process keeps many requests in flight:
+
+  POST /api/documents/upload    extraction, blob storage and thumbnails run in
+                                an executor; Gemini through the SDK's aio client
+                                (at most GEMINI_CONCURRENCY calls per process)
+  POST /api/search/semantic     AsyncMongoClient read; scoring in the executor
+  GET  /api/documents/<doc_id>  AsyncMongoClient
+  GET  /api/health              AsyncMongoClient
+
+The views reuse app.py's pipeline pieces (prepare_upload,
+build_uploaded_document, rank_semantic, serialize_document, ...), so
+responses have the same shape and bytes. Every other route is served by the
+regular Flask app through asgiref's WsgiToAsgi. AsyncDispatcher routes by
+the Flask URL map, so a path only goes to a coroutine when Flask would have
+handled it with the same view. Executor code (blob store, page cache) uses
+app.py's per-process sync resources.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import SimpleNamespace
+
+from asgiref.wsgi import WsgiToAsgi
+from bson.objectid import ObjectId
+from flask_cors.core import get_cors_headers, get_cors_options
+from pymongo import AsyncMongoClient
+from quart import Blueprint, Quart, Response, current_app, jsonify, request
+from quart.wrappers.response import DataBody
+from werkzeug.exceptions import HTTPException
+
+from app import (
+    analysis_arguments, blob_store, build_uploaded_document, create_app, document_json, gemini_client,
+    gemini_client_error_result, gemini_error_result, gemini_mock_result, gemini_request, gemini_result,
+    prepare_upload, rank_semantic, response_cache, semantic_scoring_projection, serialize_document,
+    serialize_semantic_results
+)
+from config import get_config
+from utils.content_store import CONTENT_COLLECTION, attach_content_async, content_row, split_content
+from utils.counters import change_operations
+from utils.http_caching import apply_compression, compressible, document_etag, not_modified, tag_response
+from utils.json_provider import FastJSONProvider
+from utils.projection import parse_fields
+from utils.rollups import ingest_operations, stage_timer
+from utils.text_search import index_fields
+
+ASYNC_CPU_WORKERS = int(os.getenv('ASYNC_CPU_WORKERS', str(os.cpu_count() or 4)))
+GEMINI_CONCURRENCY = int(os.getenv('GEMINI_CONCURRENCY', '16'))
+
+api = Blueprint('api', __name__)
+# PyMuPDF, OCR and table detection; sized to the cores, not to the number of open requests
+cpu_executor = ThreadPoolExecutor(max_workers=ASYNC_CPU_WORKERS, thread_name_prefix='async-cpu')
+# Async client and limits, created per process when the server starts (before_serving)
+state = SimpleNamespace(client=None, documents=None, contents=None, stats=None, rollups=None,
+                        gemini=None, gemini_slots=None)
+
+
+async def run_cpu(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, partial(func, *args))
+
+
+async def analyze_document_with_gemini_async(text_content, source_bytes=None, filename=None, mime_type=None,
+                                             model_type='pro', table_pages=None):
+    """analyze_document_with_gemini on the SDK's aio client."""
+    if not os.getenv("GEMINI_API_KEY"):
+        print("GEMINI_API_KEY not found. Returning mock data.")
+        return gemini_mock_result()
+
+    try:
+        if state.gemini is None:
+            state.gemini = gemini_client()
+    except Exception as e:
+        print(f"Error initializing Gemini client: {e}")
+        return gemini_client_error_result()
+
+    request_kwargs = gemini_request(text_content, source_bytes, mime_type, model_type, table_pages)
+    try:
+        async with state.gemini_slots:
+            response = await state.gemini.aio.models.generate_content(**request_kwargs)
+        return gemini_result(response)
+    except Exception as e:
+        print(f"Error calling Gemini API (SDK): {str(e)}")
+        return gemini_error_result(e)
+
+
+async def record_upload(doc, timings):
+    """Counters, rollups and cache invalidation for an inserted upload (failures are only logged)."""
+    try:
+        operations = change_operations([(None, doc)])
+        if operations:
+            await state.stats.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"[STATS] Counter update failed, will be fixed on next reconcile: {str(e)}")
+    try:
+        await state.rollups.bulk_write(
+            ingest_operations(doc, timings, doc['processing']['auto_processed']), ordered=False
+        )
+    except Exception as e:
+        print(f"[ROLLUPS] Failed to record ingest rollup: {str(e)}")
+    await asyncio.to_thread(response_cache.invalidate)
+
+
+@api.route('/api/documents/upload', methods=['POST'])
+async def upload_document():
+    prepared = None
+    try:
+        files = await request.files
+        if 'file' not in files:
+            return jsonify({'error': 'No file provided'}), 400
+
+        file = files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+
+        upload_started = time.perf_counter()
+        timings = {}
+        prepared = await run_cpu(prepare_upload, file, timings)
+
+        with stage_timer(timings, 'analysis'):
+            processed_data = await analyze_document_with_gemini_async(**analysis_arguments(prepared))
+        processed_data = build_uploaded_document(prepared, processed_data, timings, upload_started)
+
+        # Content first, so a document never points at missing content
+        content_fields = split_content(processed_data)
+        with stage_timer(timings, 'database'):
+            row = content_row(processed_data['_id'], content_fields,
+                              extra=index_fields(processed_data, content_fields.get('content')))
+            await state.contents.replace_one({'_id': row['_id']}, row, upsert=True)
+            await state.documents.insert_one(processed_data)
+        prepared = None  # the document now holds the blob reference
+        timings['total'] = time.perf_counter() - upload_started
+        await record_upload(processed_data, timings)
+
+        processed_data.update(content_fields)
+        print(f"Successfully added document {processed_data['_id']} to database.")
+        return jsonify(serialize_document(processed_data)), 201
+
+    except ValueError as e:
+        if prepared:
+            await asyncio.to_thread(blob_store.release, prepared['file_blob'])
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        if prepared:
+            await asyncio.to_thread(blob_store.release, prepared['file_blob'])
+        print(f"Error in upload_document: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/search/semantic', methods=['POST'])
+async def search_semantic_route():
+    try:
+        data = await request.get_json()
+        query = data.get('query', '')
+
+        if not query:
+            return jsonify({'error': 'Query is required'}), 400
+
+        projection = parse_fields(data.get('fields'))
+        candidates = await state.documents.find({}, semantic_scoring_projection(projection)).to_list()
+        results = await run_cpu(rank_semantic, query, candidates)
+        await attach_content_async(state.contents, results, projection)
+
+        return jsonify({'results': serialize_semantic_results(results)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in semantic search: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/documents/<doc_id>', methods=['GET'])
+async def get_document(doc_id):
+    try:
+        doc = await state.documents.find_one({'_id': ObjectId(doc_id)})
+        if not doc:
+            return jsonify({'error': 'Document not found'}), 404
+        # Revalidate before loading the (large) content
+        etag = document_etag(doc)
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag, response_class=Response)
+        await attach_content_async(state.contents, [doc])
+
+        return tag_response(jsonify(document_json.encode(doc, serialize_document)), etag)
+    except Exception as e:
+        print(f"Error in get_document: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/api/health', methods=['GET'])
+async def health_check():
+    """Health check endpoint"""
+    try:
+        await state.documents.count_documents({})
+        return jsonify({'status': 'healthy', 'database': 'connected'})
+    except Exception as e:
+        return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
+
+
+@api.app_errorhandler(404)
+async def not_found(error):
+    return jsonify({'error': 'Endpoint not found'}), 404
+
+
+@api.app_errorhandler(500)
+async def internal_error(error):
+    return jsonify({'error': 'Internal server error'}), 500
+
+
+async def connect():
+    config = current_app.config
+    state.client = AsyncMongoClient(config['MONGO_URI'])
+    db = state.client[config['DB_NAME']]
+    state.documents = db['documents']
+    state.contents = db[CONTENT_COLLECTION]
+    state.stats = db['stats']
+    state.rollups = db['rollups']
+    state.gemini_slots = asyncio.Semaphore(GEMINI_CONCURRENCY)
+
+
+async def disconnect():
+    if state.client is not None:
+        await state.client.close()
+
+
+async def finish_response(response):
+    """CORS headers (computed by flask_cors from the Flask app's settings) and compression for the async views."""
+    for name, value in get_cors_headers(current_app.extensions['cors'], request.headers, request.method).items():
+        if name == 'Vary':
+            response.vary.add(value)
+        else:
+            response.headers[name] = value
+    if compressible(response) and isinstance(response.response, DataBody):
+        apply_compression(response, await response.get_data(), request.accept_encodings)
+    return response
+
+
+class AsyncDispatcher:
+    """
+    ASGI app: requests for the ported endpoints go to the Quart app, all others (and
+    CORS preflights, which flask_cors answers) to the Flask app.
+    """
+
+    def __init__(self, async_app, wsgi_app):
+        self.async_app = async_app
+        self.wsgi_app = WsgiToAsgi(wsgi_app)
+        self.url_map = wsgi_app.url_map
+        self.async_endpoints = {endpoint for endpoint in async_app.view_functions
+                                if endpoint in wsgi_app.view_functions and endpoint != 'static'}
+
+    def handles(self, scope):
+        if scope['method'] == 'OPTIONS':
+            return False
+        try:
+            endpoint, _ = self.url_map.bind('localhost').match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return False
+        return endpoint in self.async_endpoints
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and not self.handles(scope):
+            await self.wsgi_app(scope, receive, send)
+        else:
+            # Async views, lifespan (connect/disconnect) and anything else ASGI-only
+            await self.async_app(scope, receive, send)
+
+
+def create_asgi_app(config_name=None):
+    """ASGI counterpart of app.create_app (same config selection)."""
+    wsgi_app = create_app(config_name)
+    async_app = Quart(__name__)
+    async_app.config.from_object(get_config(config_name))
+    async_app.json = FastJSONProvider(async_app)
+    async_app.register_blueprint(api)
+    # Same CORS options as the Flask app's CORS(app), so both serving modes answer alike
+    async_app.extensions['cors'] = get_cors_options(wsgi_app)
+    async_app.before_serving(connect)
+    async_app.after_serving(disconnect)
+    async_app.after_request(finish_response)
+    return AsyncDispatcher(async_app, wsgi_app)
@@ -0,0 +1,160 @@
+"""
+Benchmark the sync (gunicorn) and async (uvicorn + async_app) serving modes
+under a simulated Gemini latency.
+
+Starts a stub Gemini endpoint that answers every generateContent call with a
+fixed analysis after `--gemini-latency` seconds, points both servers at it
+(GEMINI_BASE_URL), and drives each with `--concurrency` clients:
+
+  upload   POST /api/documents/upload with a small text file (one Gemini call each)
+  search   POST /api/search/semantic (Mongo read + scoring)
+
+Both servers get the same number of processes (`--workers`); the sync server
+uses gunicorn's gthread workers with GUNICORN_THREADS threads each. Uploaded
+benchmark documents are left in the database.
+
+Usage (from backend/, needs mongod, gunicorn and uvicorn):
+    python -m benchmarks.bench_async --workers 2 --concurrency 64 --gemini-latency 3 --duration 30
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ANALYSIS = {
+    "title": "Benchmark document", "summary": "Synthetic analysis returned by the Gemini stub.",
+    "tags": ["benchmark"], "department": "Operations", "type": "Report", "status": "review",
+    "tables_data": [], "figures_data": [], "charts": []
+}
+UPLOAD_TEXT = ("Track circuit inspection at Aluva depot. Brake wear within limits; "
+               "signal relay replaced on platform 2.\n") * 40
+
+
+def start_gemini_stub(port, latency):
+    body = json.dumps({
+        'candidates': [{'content': {'role': 'model', 'parts': [{'text': json.dumps(ANALYSIS)}]},
+                        'finishReason': 'STOP'}]
+    }).encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_server(mode, workers, port, gemini_url):
+    env = dict(os.environ, GEMINI_API_KEY=os.getenv('GEMINI_API_KEY', 'benchmark'), GEMINI_BASE_URL=gemini_url,
+               RESPONSE_CACHE_TTL='0')
+    if mode == 'sync':
+        env.update(WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}")
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(workers), '--log-level', 'warning']
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + '/api/health', timeout=1).ok:
+                return server, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"{mode} server did not become healthy")
+
+
+def upload(session, base_url, n):
+    files = {'file': (f"bench-{n}.txt", UPLOAD_TEXT.encode('utf-8'), 'text/plain')}
+    return session.post(base_url + '/api/documents/upload', files=files, timeout=120).status_code == 201
+
+
+def search(session, base_url, n):
+    return session.post(base_url + '/api/search/semantic', json={'query': 'brake inspection depot'},
+                        timeout=120).ok
+
+
+def load(call, base_url, concurrency, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        n = offset
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = call(session, base_url, n)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            n += concurrency
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += not ok
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['sync', 'async'], choices=['sync', 'async'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--gemini-latency', type=float, default=3.0)
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--gemini-port', type=int, default=5057)
+    args = parser.parse_args()
+
+    stub = start_gemini_stub(args.gemini_port, args.gemini_latency)
+    gemini_url = f"http://127.0.0.1:{args.gemini_port}/"
+    print(f"gemini latency {args.gemini_latency}s, {args.workers} processes, {args.concurrency} clients")
+    print(f"{'mode':<6} {'endpoint':<7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'requests':>9} {'errors':>7}")
+    try:
+        for mode in args.modes:
+            server, base_url = start_server(mode, args.workers, args.port, gemini_url)
+            try:
+                for label, call in (('upload', upload), ('search', search)):
+                    latencies, errors = load(call, base_url, args.concurrency, args.duration)
+                    latencies.sort()
+                    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+                    median = statistics.median(latencies) if latencies else 0
+                    print(f"{mode:<6} {label:<7} {len(latencies) / args.duration:>8.1f} {median * 1000:>9.1f} "
+                          f"{p95 * 1000:>9.1f} {len(latencies):>9} {errors:>7}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark ingesting a batch of files: one request per file vs the bulk endpoint.
+
+Starts the stub Gemini endpoint from bench_async (fixed `--gemini-latency`)
+and the gunicorn server, then uploads `--files` small text files three ways:
+
+  serial   POST /api/documents/upload once per file, one after another
+           (what the department offices do today)
+  bulk     one POST /api/documents/upload/bulk with every file as a multipart part
+  zip      one POST /api/documents/upload/bulk with the files in a zip archive
+
+Reports wall time, files/second and how many files were created. Bulk
+concurrency comes from the server's BULK_EXTRACT_WORKERS and
+BULK_GEMINI_CONCURRENCY. Uploaded benchmark documents are left in the database.
+
+Usage (from backend/, needs mongod and gunicorn):
+    python -m benchmarks.bench_bulk_upload --files 200 --gemini-latency 2
+"""
+import argparse
+import io
+import time
+import zipfile
+
+import requests
+
+from benchmarks.bench_async import UPLOAD_TEXT, start_gemini_stub, start_server
+
+
+def make_files(count):
+    return [(f"bulk-{n}.txt", f"Batch file {n}. {UPLOAD_TEXT}".encode('utf-8')) for n in range(count)]
+
+
+def serial(base_url, files):
+    session = requests.Session()
+    created = 0
+    for name, data in files:
+        response = session.post(base_url + '/api/documents/upload', files={'file': (name, data, 'text/plain')},
+                                timeout=600)
+        created += response.status_code == 201
+    return created
+
+
+def bulk(base_url, files):
+    parts = [('files', (name, data, 'text/plain')) for name, data in files]
+    response = requests.post(base_url + '/api/documents/upload/bulk', files=parts, timeout=3600)
+    return response.json().get('created', 0)
+
+
+def bulk_zip(base_url, files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+    response = requests.post(base_url + '/api/documents/upload/bulk',
+                             files={'files': ('batch.zip', buffer.getvalue(), 'application/zip')}, timeout=3600)
+    return response.json().get('created', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--modes', nargs='+', default=['serial', 'bulk', 'zip'], choices=['serial', 'bulk', 'zip'])
+    parser.add_argument('--gemini-latency', type=float, default=2.0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--port', type=int, default=5058)
+    parser.add_argument('--gemini-port', type=int, default=5059)
+    args = parser.parse_args()
+
+    files = make_files(args.files)
+    stub = start_gemini_stub(args.gemini_port, args.gemini_latency)
+    print(f"{args.files} files, gemini latency {args.gemini_latency}s, {args.workers} server processes")
+    print(f"{'mode':<7} {'seconds':>9} {'files/s':>8} {'created':>8}")
+    try:
+        server, base_url = start_server('sync', args.workers, args.port, f"http://127.0.0.1:{args.gemini_port}/")
+        try:
+            for mode in args.modes:
+                run = {'serial': serial, 'bulk': bulk, 'zip': bulk_zip}[mode]
+                started = time.perf_counter()
+                created = run(base_url, files)
+                elapsed = time.perf_counter() - started
+                print(f"{mode:<7} {elapsed:>9.1f} {args.files / elapsed:>8.1f} {created:>8}")
+        finally:
+            server.terminate()
+            server.wait()
+    finally:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
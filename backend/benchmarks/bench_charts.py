@@ -0,0 +1,136 @@
+"""
+Benchmark chart normalization on large financial tables.
+
+Compares the previous per-character parser / one-chart-per-column derivation
+with utils.charts (batched column parsing, single type inference, capped and
+downsampled charts). Before timing, checks that both parsers read unit cells
+(km, kg, km/h) as plain numbers and only lakh/crore/k/mn/bn as multipliers;
+exits non-zero on a mismatch.
+
+Usage (from backend/):
+    python -m benchmarks.bench_charts --rows 20000 --cols 12
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from utils.charts import normalize_charts, parse_numeric_column, parse_numeric_value
+
+# (cell, expected value): units that only look like a multiplier suffix stay plain numbers
+UNIT_CASES = [
+    ('12 km', 12.0), ('120 km/h', 120.0), ('80 Km/H', 80.0), ('5 kg', 5.0), ('3 crew', 3.0), ('4 bnk', 4.0),
+    ('12 lakh', 1.2e6), ('1.5 Cr.', 1.5e7), ('(2 crore)', -2e7), ('5k', 5e3), ('3 Mn', 3e6), ('7 bn', 7e9),
+]
+
+
+def legacy_parse_numeric_value(value):
+    """The original character-by-character parser, kept here for comparison."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value_str = str(value).strip()
+    if not value_str:
+        return None
+    value_str = value_str.replace(',', '')
+    if value_str.endswith('%'):
+        value_str = value_str[:-1]
+    cleaned = ''.join(ch for ch in value_str if ch.isdigit() or ch in '.-')
+    if cleaned in {'', '-', '.', '-.', '.-'}:
+        return None
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def legacy_derive_charts(tables):
+    """The original derivation: one bar chart per column with every row as a point."""
+    charts = []
+    for table_index, table in enumerate(tables):
+        rows = table.get('data') or []
+        headers, body_rows = rows[0], rows[1:]
+        caption = table.get('caption') or f"Table {table_index + 1}"
+        for col_idx in range(1, len(headers)):
+            points = []
+            for row_idx, row in enumerate(body_rows):
+                label = str(row[0]).strip()
+                value = legacy_parse_numeric_value(row[col_idx] if len(row) > col_idx else None)
+                if label and value is not None:
+                    points.append({"label": label, "value": value})
+            if len(points) >= 2:
+                charts.append({"title": f"{caption} - {headers[col_idx]}", "chart_type": "bar", "data_points": points})
+    return charts
+
+
+def _format_cell(rng, col_idx):
+    amount = rng.uniform(-5e6, 5e7)
+    style = col_idx % 5
+    if style == 0:
+        return f"₹{amount:,.2f}"
+    if style == 1:
+        return f"{rng.uniform(-20, 120):.1f}%"
+    if style == 2:
+        return f"{amount / 1e5:.2f} lakh"
+    if style == 3:
+        return f"({abs(amount):,.0f})" if amount < 0 else f"{amount:,.0f}"
+    return f"{amount / 1e7:.3f} Cr"
+
+
+def build_table(rows, cols, seed=7):
+    rng = random.Random(seed)
+    header = ["Month"] + [f"Metric {c}" for c in range(1, cols)]
+    body = []
+    for r in range(rows):
+        label = f"{['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'][r % 12]} {2000 + r // 12}"
+        body.append([label] + [_format_cell(rng, c) for c in range(1, cols)])
+    return {"caption": "Synthetic ledger", "data": [header] + body, "page_number": 1}
+
+
+def check_units():
+    """Cells from UNIT_CASES that either parser reads wrongly, as (cell, expected, cell parser, column parser)."""
+    cells = [cell for cell, _ in UNIT_CASES]
+    column = parse_numeric_column(cells)
+    return [(cell, expected, parse_numeric_value(cell), parsed)
+            for (cell, expected), parsed in zip(UNIT_CASES, column)
+            if parse_numeric_value(cell) != expected or parsed != expected]
+
+
+def run(label, func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    payload = len(json.dumps(result).encode('utf-8'))
+    points = sum(len(chart['data_points']) for chart in result)
+    print(f"{label:<10} {best * 1000:10.1f} ms  {len(result):4d} charts  {points:9d} points  {payload / 1024:10.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--cols', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    mismatches = check_units()
+    for cell, expected, single, column in mismatches:
+        print(f"FAIL: {cell!r} expected {expected}, cell parser {single}, column parser {column}")
+    if mismatches:
+        sys.exit(1)
+    print(f"Unit cells: {len(UNIT_CASES)} parsed as expected")
+
+    table = build_table(args.rows, args.cols)
+    processed = {"charts": [], "tables_data": [table]}
+    print(f"Table: {args.rows} rows x {args.cols} columns")
+    run("legacy", lambda: legacy_derive_charts([table]), args.repeat)
+    run("current", lambda: normalize_charts(processed), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
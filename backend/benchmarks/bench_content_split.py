@@ -0,0 +1,132 @@
+"""
+Benchmark the documents working set with content inline vs in the content collection.
+
+Seeds two scratch databases (never the application database) with the same
+synthetic documents: one keeps `content`/`tables_data` on each document (the
+previous layout), the other stores them in `document_contents` through
+utils.content_store. Reports collection sizes from collStats and median
+latency of the queries the dashboard and list views run, plus the detail load
+that now needs a second lookup.
+
+Usage (from backend/, needs a running mongod):
+    python -m benchmarks.bench_content_split --docs 20000 --content-kb 64
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from utils.content_store import (
+    CONTENT_COLLECTION, attach_content, ensure_content_collection, resolve_codec,
+    save_content, split_content
+)
+from utils.dashboard_stats import DASHBOARD_INDEX, DASHBOARD_INDEX_NAME, DEPARTMENTS, STATUSES
+from utils.projection import LIST_PROJECTION
+
+WORDS = ['brake', 'signal', 'platform', 'inspection', 'invoice', 'safety', 'track', 'depot',
+         'maintenance', 'audit', 'traction', 'ventilation', 'escalator', 'ticketing']
+
+
+def synthetic_document(rng, now, content_kb):
+    words = [rng.choice(WORDS) for _ in range(content_kb * 1024 // 8)]
+    table = [['Item', 'Qty', 'Amount']] + [[f"Row {r}", str(rng.randint(1, 99)), f"{rng.uniform(1, 1e5):,.2f}"]
+                                          for r in range(40)]
+    return {
+        'title': f"{rng.choice(WORDS).title()} report",
+        'summary': ' '.join(rng.choice(WORDS) for _ in range(40)),
+        'tags': rng.sample(WORDS, 3),
+        'department': rng.choice(DEPARTMENTS),
+        'type': 'Report',
+        'status': rng.choice(STATUSES),
+        'language': 'English',
+        'starred': rng.random() < 0.1,
+        'date': now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+        'content': ' '.join(words),
+        'tables_data': [{'caption': 'Ledger', 'data': table, 'page_number': 1}],
+        'figures_data': []
+    }
+
+
+def seed(db, docs, content_kb, split):
+    rng = random.Random(docs)
+    now = datetime.now()
+    db.drop_collection('documents')
+    db.drop_collection(CONTENT_COLLECTION)
+    documents = db['documents']
+    contents = ensure_content_collection(db) if split else None
+    for _ in range(docs):
+        doc = synthetic_document(rng, now, content_kb)
+        if split:
+            fields = split_content(doc)
+            doc_id = documents.insert_one(doc).inserted_id
+            save_content(contents, doc_id, fields)
+        else:
+            documents.insert_one(doc)
+    documents.create_index([('date', -1), ('_id', -1)])
+    documents.create_index(DASHBOARD_INDEX, name=DASHBOARD_INDEX_NAME)
+    return documents, contents
+
+
+def collection_sizes(db, name):
+    stats = db.command('collStats', name)
+    return stats.get('size', 0), stats.get('storageSize', 0), stats.get('avgObjSize', 0)
+
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def queries(documents, contents):
+    sample_id = documents.find_one({}, {'_id': 1})['_id']
+
+    def detail():
+        doc = documents.find_one({'_id': sample_id})
+        if contents is not None:
+            attach_content(contents, [doc])
+        return doc
+
+    return [
+        ('list page', lambda: list(documents.find({}, LIST_PROJECTION).sort([('date', -1), ('_id', -1)]).limit(20))),
+        ('metadata scan', lambda: documents.count_documents({'summary': {'$regex': 'escalator audit'}})),
+        ('group by type', lambda: list(documents.aggregate([{'$group': {'_id': '$type', 'n': {'$sum': 1}}}]))),
+        ('detail', detail),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--docs', type=int, default=20000)
+    parser.add_argument('--content-kb', type=int, default=64, help='approximate extracted text per document')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    print(f"{args.docs} documents, ~{args.content_kb} KiB text each, codec {resolve_codec()}")
+    for label, split in (('inline', False), ('split', True)):
+        db = client[f"kmrl_docintel_bench_{label}"]
+        documents, contents = seed(db, args.docs, args.content_kb, split)
+
+        size, storage, avg = collection_sizes(db, 'documents')
+        print(f"\n[{label}] documents: data {size / 2**20:.1f} MiB, storage {storage / 2**20:.1f} MiB, "
+              f"avg {avg / 1024:.1f} KiB/doc")
+        if contents is not None:
+            size, storage, avg = collection_sizes(db, CONTENT_COLLECTION)
+            print(f"[{label}] {CONTENT_COLLECTION}: data {size / 2**20:.1f} MiB, storage {storage / 2**20:.1f} MiB")
+        for name, func in queries(documents, contents):
+            print(f"[{label}] {name:<14} {median_ms(func, args.repeat):8.1f} ms")
+
+        client.drop_database(db.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark dashboard statistics: per-number count_documents calls vs one $facet pipeline.
+
+Seeds a scratch database (never the application database) with synthetic
+documents, then measures round trips and latency for the counts behind
+/api/stats, /api/dashboard/stats, /api/dashboard/departments and
+/api/dashboard/status-distribution.
+
+Usage (from backend/, needs a running mongod):
+    python -m benchmarks.bench_dashboard_stats --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient, monitoring
+
+from utils.dashboard_stats import (
+    DASHBOARD_INDEX, DASHBOARD_INDEX_NAME, DEPARTMENTS, STATUSES,
+    compute_dashboard_counts, start_of_today
+)
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server (one per round trip for these calls)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name in ('aggregate', 'count', 'getMore'):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def legacy_counts(collection):
+    """The previous implementation of the four endpoints: 3 + 6 + 21 + 3 count_documents calls."""
+    today = {'date': {'$gte': start_of_today()}}
+    # /api/stats
+    collection.count_documents({})
+    collection.count_documents({'status': 'urgent'})
+    collection.count_documents(today)
+    # /api/dashboard/stats
+    collection.count_documents({})
+    collection.count_documents(today)
+    collection.count_documents({'starred': True})
+    for status in STATUSES:
+        collection.count_documents({'status': status})
+    # /api/dashboard/departments
+    for dept in DEPARTMENTS:
+        collection.count_documents({'department': dept})
+        collection.count_documents({'department': dept, 'status': 'urgent'})
+        collection.count_documents({'department': dept, 'status': 'approved'})
+    # /api/dashboard/status-distribution
+    for status in STATUSES:
+        collection.count_documents({'status': status})
+
+
+def facet_counts(collection):
+    """The same four endpoints, each answered by one $facet aggregation."""
+    for _ in range(4):
+        compute_dashboard_counts(collection)
+
+
+def seed(collection, size, content_bytes):
+    rng = random.Random(size)
+    now = datetime.now()
+    filler = 'x' * content_bytes
+    collection.drop()
+    batch = []
+    for i in range(size):
+        batch.append({
+            'title': f"Document {i}",
+            'department': rng.choice(DEPARTMENTS),
+            'status': rng.choice(STATUSES),
+            'starred': rng.random() < 0.1,
+            'date': now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+            'content': filler
+        })
+        if len(batch) == 5000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+    collection.create_index(DASHBOARD_INDEX, name=DASHBOARD_INDEX_NAME)
+    collection.create_index([('status', 1), ('date', -1)])
+    collection.create_index([('starred', 1), ('date', -1)])
+    collection.create_index([('date', -1)])
+
+
+def measure(func, counter, repeat):
+    timings = []
+    trips = 0
+    for _ in range(repeat):
+        counter.count = 0
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+        trips = counter.count
+    return trips, statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default='kmrl_docintel_bench')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--content-bytes', type=int, default=2048, help='size of the filler content field')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = MongoClient(args.uri, event_listeners=[counter])
+    collection = client[args.db]['documents']
+
+    print(f"{'docs':>10} {'path':<8} {'round trips':>12} {'median ms':>10}")
+    for size in args.sizes:
+        seed(collection, size, args.content_bytes)
+        for label, func in (('legacy', lambda: legacy_counts(collection)),
+                            ('facet', lambda: facet_counts(collection))):
+            trips, median_ms = measure(func, counter, args.repeat)
+            print(f"{size:>10} {label:<8} {trips:>12} {median_ms:>10.1f}")
+
+    client.drop_database(args.db)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark end-to-end dashboard load: seven widget requests vs one summary request.
+
+Talks to a running backend over HTTP, the way the React dashboard does. Three paths
+are compared:
+
+  widgets   the seven /api/dashboard/* requests the dashboard used to send in parallel
+  summary   one /api/dashboard/summary request
+  poll-304  the summary revalidated with If-None-Match (the 30 s refresh when nothing changed)
+
+Usage (from backend/, with the server running):
+    python -m benchmarks.bench_dashboard_summary --base-url http://localhost:5000 --repeat 20
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+WIDGET_ENDPOINTS = [
+    '/api/dashboard/stats',
+    '/api/dashboard/departments',
+    '/api/dashboard/tags',
+    '/api/dashboard/document-types',
+    '/api/dashboard/status-distribution',
+    '/api/dashboard/language-distribution',
+    '/api/dashboard/recent-documents',
+]
+SUMMARY_ENDPOINT = '/api/dashboard/summary'
+
+
+def load_widgets(session, pool, base_url):
+    responses = list(pool.map(lambda path: session.get(base_url + path), WIDGET_ENDPOINTS))
+    return len(responses), sum(len(response.content) for response in responses)
+
+
+def load_summary(session, base_url):
+    response = session.get(base_url + SUMMARY_ENDPOINT)
+    return 1, len(response.content)
+
+
+def poll_summary(session, base_url, etag):
+    response = session.get(base_url + SUMMARY_ENDPOINT, headers={'If-None-Match': etag})
+    if response.status_code != 304:
+        print(f"  warning: expected 304, got {response.status_code} (data changed during the run?)")
+    return 1, len(response.content)
+
+
+def measure(label, func, repeat):
+    timings = []
+    requests_sent, body_bytes = 0, 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        requests_sent, body_bytes = func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<10} {requests_sent:>9} {statistics.median(timings) * 1000:>11.1f} "
+          f"{p95 * 1000:>9.1f} {body_bytes / 1024:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    base_url = args.base_url.rstrip('/')
+
+    # Same connection pooling a browser would use (six connections per host)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=6, pool_maxsize=6)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    warmup = session.get(base_url + SUMMARY_ENDPOINT)
+    warmup.raise_for_status()
+    etag = warmup.headers.get('ETag')
+
+    print(f"{'path':<10} {'requests':>9} {'median ms':>11} {'p95 ms':>9} {'body KiB':>10}")
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        measure('widgets', lambda: load_widgets(session, pool, base_url), args.repeat)
+    measure('summary', lambda: load_summary(session, base_url), args.repeat)
+    if etag:
+        measure('poll-304', lambda: poll_summary(session, base_url, etag), args.repeat)
+    else:
+        print("poll-304   skipped: summary response carried no ETag")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark export throughput and peak memory: buffered vs streamed rendering.
+
+Renders synthetic documents (no database needed) the way the export endpoint
+does and reports rows/second and peak traced memory:
+
+  buffered    the previous approach: materialize every row, write the whole CSV
+              into an in-memory buffer, then encode it
+  csv         utils.exports.csv_chunks over a row iterator
+  jsonl       utils.exports.jsonl_chunks
+  csv+gzip    csv_chunks through gzip_chunks
+
+Usage (from backend/):
+    python -m benchmarks.bench_exports --rows 100000 500000
+"""
+import argparse
+import csv
+import io
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+
+from utils.exports import EXPORT_COLUMNS, csv_chunks, gzip_chunks, jsonl_chunks
+
+DEPARTMENTS = ["Operations", "Engineering", "Safety", "Procurement", "Finance"]
+
+
+def synthetic_rows(count):
+    now = datetime.now()
+    for i in range(count):
+        yield {
+            '_id': ObjectId(),
+            'title': f"Maintenance report {i} for depot {i % 7}",
+            'department': DEPARTMENTS[i % len(DEPARTMENTS)],
+            'type': 'Report',
+            'status': ('urgent', 'review', 'approved')[i % 3],
+            'date': now - timedelta(minutes=i),
+            'language': 'English'
+        }
+
+
+def buffered_export(count):
+    documents = list(synthetic_rows(count))
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for doc in documents:
+        writer.writerow({column: doc.get(column, '') for column in EXPORT_COLUMNS})
+    return [output.getvalue().encode('utf-8')]
+
+
+def drain(chunks):
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+    return total
+
+
+def run(label, make_chunks, count):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = drain(make_chunks(count))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{count:>9} {label:<10} {count / elapsed:>12,.0f} {size / 2**20:>10.1f} {peak / 2**20:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 500000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'path':<10} {'rows/sec':>12} {'out MiB':>10} {'peak MiB':>10}")
+    for count in args.rows:
+        run('buffered', buffered_export, count)
+        run('csv', lambda n: csv_chunks(synthetic_rows(n), EXPORT_COLUMNS), count)
+        run('jsonl', lambda n: jsonl_chunks(synthetic_rows(n), EXPORT_COLUMNS), count)
+        run('csv+gzip', lambda n: gzip_chunks(csv_chunks(synthetic_rows(n), EXPORT_COLUMNS)), count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark dashboard polling: bytes on the wire and latency per revalidation strategy.
+
+Talks to a running backend over HTTP and polls the endpoints a dashboard tab
+refreshes, the way a browser would with each strategy:
+
+  identity   full body, no compression (the old behaviour)
+  gzip       full body, Accept-Encoding: gzip
+  br         full body, Accept-Encoding: br (server needs the brotli package)
+  304        If-None-Match with the last ETag, nothing changed in between
+
+Bytes are the encoded body as received (before any decompression).
+
+Usage (from backend/, with the server running):
+    python -m benchmarks.bench_http_polling --base-url http://localhost:5000 --repeat 50
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+ENDPOINTS = [
+    '/api/dashboard/summary',
+    '/api/documents?limit=50',
+    '/api/documents/stats/dashboard',
+]
+STRATEGIES = [
+    ('identity', {'Accept-Encoding': 'identity'}),
+    ('gzip', {'Accept-Encoding': 'gzip'}),
+    ('br', {'Accept-Encoding': 'br'}),
+]
+
+
+def fetch(session, url, headers):
+    started = time.perf_counter()
+    response = session.get(url, headers=headers, stream=True)
+    wire_bytes = len(response.raw.read(decode_content=False))
+    elapsed = time.perf_counter() - started
+    return response, wire_bytes, elapsed
+
+
+def measure(session, url, headers, repeat):
+    timings, wire_bytes, response = [], 0, None
+    for _ in range(repeat):
+        response, wire_bytes, elapsed = fetch(session, url, headers)
+        timings.append(elapsed)
+    return response, wire_bytes, statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--interval', type=float, default=30, help='polling interval used for the per-hour totals')
+    args = parser.parse_args()
+    base_url = args.base_url.rstrip('/')
+    polls_per_hour = 3600 / args.interval
+
+    session = requests.Session()
+    print(f"{'endpoint':<32} {'strategy':<9} {'status':>6} {'bytes':>9} {'median ms':>10} {'KiB/hour':>10}")
+    for path in ENDPOINTS:
+        url = base_url + path
+        etag = None
+        for label, headers in STRATEGIES:
+            response, wire_bytes, median_ms = measure(session, url, headers, args.repeat)
+            if label == 'br' and response.headers.get('Content-Encoding') != 'br':
+                print(f"{path:<32} {label:<9} skipped: server does not offer brotli")
+                continue
+            etag = response.headers.get('ETag') or etag
+            print(f"{path:<32} {label:<9} {response.status_code:>6} {wire_bytes:>9} {median_ms:>10.2f} "
+                  f"{wire_bytes * polls_per_hour / 1024:>10.1f}")
+
+        if not etag:
+            print(f"{path:<32} {'304':<9} skipped: response carried no ETag")
+            continue
+        response, wire_bytes, median_ms = measure(session, url, {'Accept-Encoding': 'gzip', 'If-None-Match': etag},
+                                                  args.repeat)
+        if response.status_code != 304:
+            print(f"  warning: expected 304, got {response.status_code} (data changed during the run?)")
+        print(f"{path:<32} {'304':<9} {response.status_code:>6} {wire_bytes:>9} {median_ms:>10.2f} "
+              f"{wire_bytes * polls_per_hour / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Startup budget check: how long `import app` takes in a fresh interpreter.
+
+Runs `python -X importtime -c "import app"` `--repeat` times, reports the
+median total and the slowest top-level imports (cumulative), and exits
+non-zero when the median is over `--budget-ms` or when one of the heavy
+libraries that must stay lazy (PyMuPDF, Pillow, pytesseract, python-docx,
+google-genai, requests, boto3) is imported at startup. Cheap enough to run
+in CI or before a deploy.
+
+Usage (from backend/, no database needed):
+    python -m benchmarks.bench_import_time --repeat 5 --budget-ms 750
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+LAZY_MODULES = ('fitz', 'PIL', 'pytesseract', 'docx', 'google.genai', 'requests', 'boto3')
+
+
+def import_times(module):
+    """Cumulative import time (microseconds) per module, and the modules `module` imports directly."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    cumulative, children, pending = {}, [], []
+    # Lines are in completion order, children (indented two more spaces) before their parent
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        cumulative[name] = int(cumulative_us)
+        if depth == 1:
+            pending.append(name)
+        elif depth == 0:
+            if name == module:
+                children = pending
+            pending = []
+    return cumulative, children
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=750)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    totals, samples = [], defaultdict(list)
+    eager = set()
+    for _ in range(args.repeat):
+        cumulative, children = import_times(args.module)
+        totals.append(cumulative[args.module] / 1000)
+        for name in children:
+            samples[name].append(cumulative[name] / 1000)
+        eager.update(name for name in LAZY_MODULES if name in cumulative)
+
+    median = statistics.median(totals)
+    print(f"import {args.module}: median {median:.0f} ms over {args.repeat} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}, budget {args.budget_ms:.0f})")
+    print(f"{'module':<32} {'ms':>8}")
+    slowest = sorted(samples.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, values in slowest[:args.top]:
+        print(f"{name:<32} {statistics.median(values):>8.1f}")
+
+    failed = False
+    if eager:
+        print(f"FAIL: imported at startup, should be lazy: {', '.join(sorted(eager))}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: median import time {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark JSON encoding of listing and detail responses.
+
+Encodes synthetic documents (no database needed) the way the listing and
+detail endpoints do and reports the median time per response:
+
+  default     Flask's DefaultJSONProvider (stdlib json), the previous path
+  fast        utils.json_provider.FastJSONProvider (orjson when installed)
+  cached      FastJSONProvider with EncodedDocumentCache, every document a hit
+
+Usage (from backend/):
+    python -m benchmarks.bench_json_encoding --docs 50 --repeat 200
+"""
+import argparse
+import copy
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils.json_provider import EncodedDocumentCache, FastJSONProvider, orjson
+from utils.projection import LIST_FIELDS
+
+DEPARTMENTS = ["Operations", "Engineering", "Safety", "Procurement", "Finance"]
+
+
+def synthetic_document(i, detail):
+    now = datetime.now()
+    doc = {
+        '_id': ObjectId(),
+        'title': f"Maintenance report {i} for depot {i % 7}",
+        'summary': "Quarterly inspection of rolling stock and track circuits. " * 4,
+        'tags': ['maintenance', 'rolling-stock', DEPARTMENTS[i % len(DEPARTMENTS)].lower()],
+        'department': DEPARTMENTS[i % len(DEPARTMENTS)],
+        'type': 'Report',
+        'status': ('urgent', 'review', 'approved')[i % 3],
+        'language': 'English',
+        'date': now - timedelta(minutes=i),
+        'starred': i % 5 == 0,
+        'source': 'upload',
+        'file_name': f"report-{i}.pdf",
+        'file_mime': 'application/pdf',
+        'file_blob': f"{i:064x}",
+        'file_size': 250000 + i,
+        'page_count': 12,
+        'version': 1,
+    }
+    if detail:
+        doc['tables_data'] = [
+            {'headers': ['Asset', 'Fault', 'Hours', 'Cost'],
+             'rows': [[f"TR-{row}", 'Brake wear', row * 1.5, row * 120.25] for row in range(60)]}
+            for _ in range(4)
+        ]
+        doc['charts'] = [{'type': 'bar', 'labels': [f"W{week}" for week in range(52)],
+                          'values': [week * 3.5 for week in range(52)], 'generated_at': now}]
+        doc['processing'] = {'started_at': now, 'stages': {'extract': 1.2, 'analyze': 4.8}}
+    return doc
+
+
+def serialize(doc):
+    """Same shape as app.serialize_document, on a copy so documents can be re-encoded."""
+    doc = dict(doc)
+    doc['_id'] = str(doc['_id'])
+    doc['file_url'] = f"/api/documents/{doc['_id']}/file"
+    doc['thumbnail_url'] = f"/api/documents/{doc['_id']}/pages/1?width=320"
+    return doc
+
+
+def timed(encode, repeat):
+    timings, size = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(encode())
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=50, help='documents per listing response')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    cache = EncodedDocumentCache()
+
+    listing = [{field: doc.get(field) for field in ['_id'] + LIST_FIELDS}
+               for doc in (synthetic_document(i, False) for i in range(args.docs))]
+    detail = synthetic_document(0, True)
+    cases = [
+        (f"listing x{args.docs}", lambda: {'documents': [serialize(doc) for doc in listing], 'count': len(listing)},
+         lambda: {'documents': [cache.encode(doc, serialize) for doc in listing], 'count': len(listing)}),
+        ('detail', lambda: serialize(copy.deepcopy(detail)), lambda: cache.encode(detail, serialize)),
+    ]
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'stdlib json'}")
+    print(f"{'response':<14} {'path':<8} {'median ms':>10} {'bytes':>9} {'speedup':>8}")
+    with app.app_context():
+        for label, build, build_cached in cases:
+            baseline, size = timed(lambda: default.response(build()).get_data(), args.repeat)
+            print(f"{label:<14} {'default':<8} {baseline:>10.3f} {size:>9} {1:>7.1f}x")
+            median_ms, size = timed(lambda: fast.response(build()).get_data(), args.repeat)
+            print(f"{label:<14} {'fast':<8} {median_ms:>10.3f} {size:>9} {baseline / median_ms:>7.1f}x")
+            build_cached()
+            median_ms, size = timed(lambda: fast.response(build_cached()).get_data(), args.repeat)
+            print(f"{label:<14} {'cached':<8} {median_ms:>10.3f} {size:>9} {baseline / median_ms:>7.1f}x")
+    print(f"document cache: {cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
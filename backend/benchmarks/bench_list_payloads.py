@@ -0,0 +1,77 @@
+"""
+Benchmark listing payload size and latency: full documents vs the list projection.
+
+Talks to a running backend over HTTP. Each listing endpoint is requested twice:
+once with `fields=` naming every document field (what the endpoints returned
+before) and once with the default list projection.
+
+Usage (from backend/, with the server running and some documents uploaded):
+    python -m benchmarks.bench_list_payloads --base-url http://localhost:5000 --repeat 10
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from utils.projection import DOCUMENT_FIELDS
+
+ALL_FIELDS = ','.join(DOCUMENT_FIELDS)
+
+
+def endpoints(limit):
+    """(label, method, path, query args, json body) for every listing endpoint."""
+    return [
+        ('documents', 'GET', '/api/documents', {'limit': limit}, None),
+        ('starred', 'GET', '/api/documents/starred', {}, None),
+        ('recent', 'GET', '/api/dashboard/recent-documents', {}, None),
+        ('advanced', 'POST', '/api/documents/search-advanced', {}, {}),
+        ('semantic', 'POST', '/api/search/semantic', {}, {'query': 'safety inspection report'}),
+    ]
+
+
+def call(session, base_url, method, path, args, body, full):
+    args = dict(args)
+    body = None if body is None else dict(body)
+    if full:
+        if body is None:
+            args['fields'] = ALL_FIELDS
+        else:
+            body['fields'] = DOCUMENT_FIELDS
+    # Bypass the response cache so each request measures the query and encoding
+    args['_bench'] = time.perf_counter_ns()
+    response = session.request(method, base_url + path, params=args, json=body)
+    response.raise_for_status()
+    return len(response.content)
+
+
+def measure(session, base_url, endpoint, full, repeat):
+    _, method, path, args, body = endpoint
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = call(session, base_url, method, path, args, body, full)
+        timings.append(time.perf_counter() - started)
+    return size, statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--limit', type=int, default=10, help='page size for /api/documents')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    base_url = args.base_url.rstrip('/')
+    session = requests.Session()
+
+    print(f"{'endpoint':<10} {'full KiB':>10} {'list KiB':>10} {'full ms':>9} {'list ms':>9}")
+    for endpoint in endpoints(args.limit):
+        full_size, full_ms = measure(session, base_url, endpoint, True, args.repeat)
+        list_size, list_ms = measure(session, base_url, endpoint, False, args.repeat)
+        print(f"{endpoint[0]:<10} {full_size / 1024:>10.1f} {list_size / 1024:>10.1f} "
+              f"{full_ms:>9.1f} {list_ms:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
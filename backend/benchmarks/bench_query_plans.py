@@ -0,0 +1,257 @@
+"""
+Query plan check: explain() every query shape the routes run and fail on
+collection scans.
+
+Seeds a scratch database (never the application database) with synthetic
+documents, applies utils/indexes.py, then explains each shape below with
+executionStats. Filters are built with the same helpers the routes use
+(advanced_search_filter, keyset_filter, tag_count_pipeline, ...). For each
+shape it prints the winning plan's stages and index, keys and documents
+examined, and time.
+
+It exits non-zero when a shape uses COLLSCAN. The few queries that read the
+whole collection by design (semantic search scoring, the health check count,
+the regex fallback) are listed as `scan ok`. A blocking in-memory SORT is
+reported but does not fail the run.
+
+Usage (from backend/, needs a running mongod):
+    python -m benchmarks.bench_query_plans --docs 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from app import advanced_search_filter, semantic_scoring_projection
+from utils.blob_store import BLOB_COLLECTION
+from utils.content_store import CONTENT_COLLECTION, save_content, split_content
+from utils.counters import tag_count_pipeline
+from utils.dashboard_stats import DASHBOARD_INDEX_NAME, DEPARTMENTS, STATUSES, dashboard_facet_pipeline
+from utils.indexes import ensure_indexes
+from utils.pagination import KEYSET_SORT, encode_cursor, keyset_filter
+from utils.projection import LIST_PROJECTION, parse_fields
+from utils.rollups import bucket_start
+from utils.text_search import SEARCH_MAX_RESULTS, index_fields, literal_pattern
+
+TYPES = ['Report', 'Invoice', 'Circular', 'Drawing', 'Work Order']
+WORDS = ['brake', 'signal', 'platform', 'inspection', 'invoice', 'safety', 'track', 'depot',
+         'maintenance', 'audit', 'traction', 'pantograph', 'interlocking', 'tender', 'incident']
+
+
+def seed(db, docs):
+    rng = random.Random(docs)
+    now = datetime.now()
+    for name in ('documents', 'stats', 'rollups', BLOB_COLLECTION, CONTENT_COLLECTION, 'migrations'):
+        db.drop_collection(name)
+    ensure_indexes(db, force=True)
+    documents, contents = db['documents'], db[CONTENT_COLLECTION]
+    rows = []
+    for n in range(docs):
+        rows.append({
+            'title': f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} report",
+            'summary': ' '.join(rng.choices(WORDS, k=20)),
+            'tags': rng.sample(WORDS, 3),
+            'department': rng.choice(DEPARTMENTS),
+            'type': rng.choice(TYPES),
+            'status': rng.choice(STATUSES),
+            'starred': rng.random() < 0.05,
+            'date': now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+            'file_blob': f"{n:064x}",
+            'version': 1,
+            'content': ' '.join(rng.choices(WORDS, k=200))
+        })
+    for doc in rows:
+        fields = split_content(doc)
+        doc_id = documents.insert_one(doc).inserted_id
+        save_content(contents, doc_id, fields, extra=index_fields(doc, fields.get('content')))
+    db['stats'].insert_many([{'_id': f"tag:{word}", 'kind': 'tag', 'key': word, 'count': rng.randint(1, 500)}
+                             for word in WORDS])
+    db['rollups'].insert_many([{'granularity': 'day', 'bucket': bucket_start(now - timedelta(days=n), 'day')}
+                               for n in range(365)])
+    db[BLOB_COLLECTION].insert_many([{'_id': doc['file_blob'], 'refs': 1, 'updated_at': doc['date']}
+                                     for doc in rows])
+    return rows
+
+
+def find(collection, query_filter, projection=None, sort=None, limit=None):
+    command = {'find': collection, 'filter': query_filter}
+    if projection:
+        command['projection'] = projection
+    if sort:
+        command['sort'] = dict(sort)
+    if limit:
+        command['limit'] = limit
+    return command
+
+
+def count(collection, query_filter):
+    # count_documents runs this pipeline
+    return aggregate(collection, [{'$match': query_filter}, {'$group': {'_id': 1, 'n': {'$sum': 1}}}])
+
+
+def aggregate(collection, pipeline, hint=None):
+    command = {'aggregate': collection, 'pipeline': pipeline, 'cursor': {}}
+    if hint:
+        command['hint'] = hint
+    return command
+
+
+def query_shapes(rows):
+    """(route, command, reason a full scan is acceptable or None)"""
+    newest = sorted(rows, key=lambda doc: (doc['date'], doc['_id']), reverse=True)
+    cursor = encode_cursor(newest[20])
+    department, status, doc_type = DEPARTMENTS[0], STATUSES[0], TYPES[0].lower()
+    date_from = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    listing = dict(projection=LIST_PROJECTION, sort=KEYSET_SORT, limit=11)
+
+    def advanced(**data):
+        return advanced_search_filter(data)[0]
+
+    ids = [doc['_id'] for doc in newest[:50]]
+    return [
+        ('GET /api/documents', find('documents', {}, **listing), None),
+        ('GET /api/documents (next page)', find('documents', keyset_filter({}, cursor), **listing), None),
+        ('GET /api/documents?department=', find('documents', {'department': department}, **listing), None),
+        ('GET /api/documents?department= (next page)',
+         find('documents', keyset_filter({'department': department}, cursor), **listing), None),
+        ('GET /api/documents?type=', find('documents', advanced(type=doc_type), **listing), None),
+        ('GET /api/documents?department=&type=',
+         find('documents', advanced(department=department, type=doc_type), **listing), None),
+        ('GET /api/documents total (exact)', count('documents', {'department': department}), None),
+        ('GET /api/documents?search= (ids page)', find('documents', {'_id': {'$in': ids}}, **listing), None),
+        ('POST /search-advanced status', find('documents', advanced(status=status), **listing), None),
+        ('POST /search-advanced department+status',
+         find('documents', advanced(department=department, status=status), **listing), None),
+        ('POST /search-advanced date range', find('documents', advanced(date_from=date_from), **listing), None),
+        ('POST /search-advanced tags', find('documents', advanced(tags=[WORDS[0], WORDS[1]]), **listing), None),
+        ('GET /api/documents/export status', find('documents', advanced(status=status), sort=KEYSET_SORT), None),
+        ('GET /api/documents/starred', find('documents', {'starred': True}, LIST_PROJECTION, [('date', -1)]), None),
+        ('GET /api/dashboard/recent-documents', find('documents', {}, LIST_PROJECTION, [('date', -1)], 5), None),
+        ('GET /api/documents/<id>', find('documents', {'_id': rows[0]['_id']}), None),
+        ('documents by content hash', find('documents', {'file_blob': rows[0]['file_blob']}, {'_id': 1}), None),
+        ('dashboard counter reconcile', aggregate('documents', dashboard_facet_pipeline(datetime.now()),
+                                                   hint=DASHBOARD_INDEX_NAME), None),
+        ('GET /api/dashboard/tags?department=', aggregate('documents', tag_count_pipeline(
+            {'department': department}, 10)), None),
+        ('GET /api/dashboard/tags?status=', aggregate('documents', tag_count_pipeline({'status': status}, 10)),
+         None),
+        ('GET /api/dashboard/tags', find('stats', {'kind': 'tag', 'count': {'$gt': 0}}, {'key': 1, 'count': 1},
+                                         [('count', -1)], 10), None),
+        ('GET /api/documents/stats/upload-trends', find('rollups', {
+            'granularity': 'day', 'bucket': {'$gte': datetime.now() - timedelta(days=30)}
+        }, sort=[('bucket', 1)]), None),
+        ('search box (token index)', find(CONTENT_COLLECTION, {'$and': [{'terms': WORDS[0]}, {'terms': WORDS[3]}]},
+                                          {'_id': 1}), None),
+        ('search box (token index, newest)', find(CONTENT_COLLECTION, {'terms': WORDS[0]}, {'_id': 1},
+                                                  [('_id', -1)], SEARCH_MAX_RESULTS + 1), None),
+        ('search box (prefix)', find(CONTENT_COLLECTION, {'terms': {'$regex': '^interl'}}, {'_id': 1}), None),
+        ('blob sweeper', find(BLOB_COLLECTION, {'$or': [
+            {'refs': {'$lte': 0}, 'updated_at': {'$lt': datetime.now()}}, {'deleting': True}
+        ]}, {'_id': 1}), None),
+        ('POST /api/search/semantic', find('documents', {}, semantic_scoring_projection(parse_fields(None))),
+         'scores every document'),
+        ('GET /api/health', count('documents', {}), 'counts every document'),
+        ('search box (search_mode=regex)', find(CONTENT_COLLECTION, {
+            'content': {'$regex': literal_pattern('brake pad'), '$options': 'i'}
+        }, {'_id': 1}, [('_id', -1)], SEARCH_MAX_RESULTS + 1), 'unanchored substring match'),
+    ]
+
+
+def winning_plans(explain):
+    """Every winningPlan in an explain document (find, or each $cursor stage of an aggregate)."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == 'winningPlan':
+                yield value.get('queryPlan', value)
+            else:
+                yield from winning_plans(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from winning_plans(value)
+
+
+def plan_stages(plan):
+    """(stage names, index names) of a plan tree, root first."""
+    stages, index_names = [], []
+    pending = [plan]
+    while pending:
+        node = pending.pop(0)
+        stages.append(node.get('stage'))
+        if node.get('indexName'):
+            index_names.append(node['indexName'])
+        if node.get('inputStage'):
+            pending.append(node['inputStage'])
+        pending.extend(node.get('inputStages', []))
+    return stages, index_names
+
+
+def execution_totals(explain):
+    """(keys examined, documents examined) summed over the explain's executionStats."""
+    keys = docs = 0
+    if isinstance(explain, dict):
+        stats = explain.get('executionStats')
+        if isinstance(stats, dict):
+            keys += stats.get('totalKeysExamined', 0)
+            docs += stats.get('totalDocsExamined', 0)
+        for key, value in explain.items():
+            if key != 'executionStats':
+                more_keys, more_docs = execution_totals(value)
+                keys, docs = keys + more_keys, docs + more_docs
+    elif isinstance(explain, list):
+        for value in explain:
+            more_keys, more_docs = execution_totals(value)
+            keys, docs = keys + more_keys, docs + more_docs
+    return keys, docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default='kmrl_docintel_plans')
+    parser.add_argument('--docs', type=int, default=5000)
+    parser.add_argument('--keep', action='store_true', help='keep the scratch database')
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    db = client[args.db]
+    failures = 0
+    try:
+        rows = seed(db, args.docs)
+        print(f"{'query':<46} {'plan':<34} {'index':<36} {'keys':>7} {'docs':>7} {'ms':>7}")
+        for route, command, scan_reason in query_shapes(rows):
+            started = time.perf_counter()
+            explain = db.command('explain', command, verbosity='executionStats')
+            elapsed = (time.perf_counter() - started) * 1000
+            stages, index_names = [], []
+            for plan in winning_plans(explain):
+                plan_stage_names, plan_index_names = plan_stages(plan)
+                stages += plan_stage_names
+                index_names += plan_index_names
+            keys, docs = execution_totals(explain)
+            verdict = ''
+            if 'COLLSCAN' in stages:
+                if scan_reason:
+                    verdict = f"scan ok: {scan_reason}"
+                else:
+                    verdict = 'FAIL: COLLSCAN'
+                    failures += 1
+            elif 'SORT' in stages:
+                verdict = 'warning: in-memory SORT'
+            print(f"{route:<46} {'>'.join(stage for stage in stages if stage):<34.34} "
+                  f"{','.join(dict.fromkeys(index_names)) or '-':<36.36} {keys:>7} {docs:>7} {elapsed:>7.1f} {verdict}")
+    finally:
+        if not args.keep:
+            client.drop_database(args.db)
+
+    if failures:
+        print(f"FAIL: {failures} query shape(s) use a collection scan")
+        sys.exit(1)
+    print('OK: no unexpected collection scans')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark search: the old `$or` of unanchored regexes vs the token index.
+
+Seeds a scratch database (never the application database) with synthetic
+documents and measures median latency and match counts for three paths:
+
+  legacy   $or of case-insensitive regexes on title/summary/tags/content, with
+           the content inline on each document (the previous implementation)
+  regex    the escaped substring fallback (search_mode=regex)
+  index    utils.text_search over the `terms` multikey index (default)
+
+Usage (from backend/, needs a running mongod):
+    python -m benchmarks.bench_text_search --docs 20000 --content-kb 32
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from utils.content_store import CONTENT_COLLECTION, ensure_content_collection, save_content, split_content
+from utils.dashboard_stats import DEPARTMENTS, STATUSES
+from utils.text_search import TERMS_INDEX, index_fields, regex_conditions, search_documents
+
+VOCABULARY = ['brake', 'signal', 'platform', 'inspection', 'invoice', 'safety', 'track', 'depot',
+              'maintenance', 'audit', 'traction', 'ventilation', 'escalator', 'ticketing', 'bogie',
+              'pantograph', 'interlocking', 'procurement', 'tender', 'incident', 'evacuation']
+QUERIES = ['pantograph', 'brake inspection', '"track maintenance"', 'interlock*', 'tender audit incident']
+
+
+def synthetic_document(rng, now, content_kb):
+    # Zipf-like word frequencies so some terms are common and others rare
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    words = rng.choices(VOCABULARY, weights=weights, k=content_kb * 1024 // 9)
+    return {
+        'title': f"{rng.choice(VOCABULARY).title()} {rng.choice(VOCABULARY)} report",
+        'summary': ' '.join(rng.choices(VOCABULARY, weights=weights, k=30)),
+        'tags': rng.sample(VOCABULARY, 3),
+        'department': rng.choice(DEPARTMENTS),
+        'status': rng.choice(STATUSES),
+        'date': now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+        'content': ' '.join(words)
+    }
+
+
+def seed(db, docs, content_kb):
+    rng = random.Random(docs)
+    now = datetime.now()
+    for name in ('legacy', 'documents', CONTENT_COLLECTION):
+        db.drop_collection(name)
+    legacy, documents = db['legacy'], db['documents']
+    contents = ensure_content_collection(db)
+    for _ in range(docs):
+        doc = synthetic_document(rng, now, content_kb)
+        legacy.insert_one(dict(doc))
+        fields = split_content(doc)
+        doc_id = documents.insert_one(doc).inserted_id
+        save_content(contents, doc_id, fields, extra=index_fields(doc, fields.get('content')))
+    contents.create_index(TERMS_INDEX)
+    return legacy, documents, contents
+
+
+def legacy_search(legacy, query):
+    return legacy.count_documents({'$or': [
+        {'title': {'$regex': query, '$options': 'i'}},
+        {'summary': {'$regex': query, '$options': 'i'}},
+        {'tags': {'$regex': query, '$options': 'i'}},
+        {'content': {'$regex': query, '$options': 'i'}}
+    ]})
+
+
+def regex_search(documents, contents, query):
+    conditions, _ = regex_conditions(contents, query.strip('"*'), limit=None)
+    return documents.count_documents({'$or': conditions})
+
+
+def index_search(documents, contents, query):
+    return len(search_documents(contents, documents, query).ranked)
+
+
+def median_ms(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+    parser.add_argument('--db', default='kmrl_docintel_bench')
+    parser.add_argument('--docs', type=int, default=20000)
+    parser.add_argument('--content-kb', type=int, default=32)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    legacy, documents, contents = seed(client[args.db], args.docs, args.content_kb)
+
+    print(f"{args.docs} documents, ~{args.content_kb} KiB text each")
+    print(f"{'query':<24} {'path':<7} {'median ms':>10} {'matches':>8}")
+    for query in QUERIES:
+        # The legacy path used the raw input as a pattern; quotes and '*' were literal/regex syntax
+        paths = [
+            ('legacy', lambda: legacy_search(legacy, query.strip('"*'))),
+            ('regex', lambda: regex_search(documents, contents, query)),
+            ('index', lambda: index_search(documents, contents, query)),
+        ]
+        for label, func in paths:
+            ms, matches = median_ms(func, args.repeat)
+            print(f"{query:<24} {label:<7} {ms:>10.1f} {matches:>8}")
+
+    client.drop_database(args.db)
+
+
+if __name__ == '__main__':
+    main()
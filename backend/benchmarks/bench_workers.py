@@ -0,0 +1,114 @@
+"""
+Load test: throughput and latency of the pre-fork server with 1 vs N workers.
+
+Starts `gunicorn -c gunicorn.conf.py wsgi:app` once per worker count, waits
+for /api/health, then keeps `--concurrency` client threads busy for
+`--duration` seconds on a mix of listing, dashboard, detail and search
+requests. Reports requests/second, median and p95 latency, and errors.
+
+The response cache is disabled in the spawned servers by default
+(RESPONSE_CACHE_TTL=0) so requests reach Mongo and the encoders; pass
+`--keep-cache` to measure cached serving instead.
+
+Usage (from backend/, needs mongod with some documents and gunicorn):
+    python -m benchmarks.bench_workers --workers 1 4 --concurrency 32 --duration 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+REQUESTS = [
+    ('GET', '/api/documents?limit=50', None),
+    ('GET', '/api/dashboard/summary', None),
+    ('GET', '/api/documents/stats/dashboard', None),
+    ('POST', '/api/documents/search-advanced', {'query': 'maintenance report'}),
+    ('POST', '/api/search/semantic', {'query': 'track inspection'}),
+]
+
+
+def start_server(workers, port, keep_cache):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}")
+    if not keep_cache:
+        env['RESPONSE_CACHE_TTL'] = '0'
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + '/api/health', timeout=1).ok:
+                return server, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"Server with {workers} workers did not become healthy")
+
+
+def document_paths(base_url):
+    documents = requests.get(base_url + '/api/documents?limit=20&total=none').json().get('documents', [])
+    return [('GET', f"/api/documents/{doc['_id']}", None) for doc in documents]
+
+
+def load(base_url, mix, concurrency, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        i = offset
+        while time.perf_counter() < stop_at:
+            method, path, body = mix[i % len(mix)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                ok = session.request(method, base_url + path, json=body, timeout=60).ok
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += not ok
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count()])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--keep-cache', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'requests':>9} {'errors':>7}")
+    for workers in args.workers:
+        server, base_url = start_server(workers, args.port, args.keep_cache)
+        try:
+            mix = REQUESTS + document_paths(base_url)
+            load(base_url, mix, args.concurrency, 2)  # warm up
+            latencies, errors = load(base_url, mix, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        print(f"{workers:>7} {len(latencies) / args.duration:>9.1f} {statistics.median(latencies) * 1000:>9.1f} "
+              f"{p95 * 1000:>9.1f} {len(latencies):>9} {errors:>7}")
+
+
+if __name__ == '__main__':
+    main()
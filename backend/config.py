@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +10,9 @@ class Config:
     DB_NAME = os.getenv('DB_NAME', 'kmrl_docintel')
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'xlsx', 'xls', 'jpg', 'png'}
+    UPLOAD_FOLDER = Path(os.getenv('UPLOAD_FOLDER', Path(__file__).parent / 'uploads'))
+    # Defaults to <UPLOAD_FOLDER>/page_cache
+    PAGE_CACHE_DIR = os.getenv('PAGE_CACHE_DIR')
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -25,3 +29,10 @@ config = {
     'production': ProductionConfig,
     'default': DevelopmentConfig
 }
+
+def get_config(name=None):
+    """Config class by name, or by the APP_ENV environment variable ('default' when unset)."""
+    name = name or os.getenv('APP_ENV', 'default')
+    if name not in config:
+        raise ValueError(f"Unknown config '{name}', expected one of: {', '.join(config)}")
+    return config[name]
@@ -0,0 +1,37 @@
+"""
+Pre-fork gunicorn settings (gunicorn -c gunicorn.conf.py wsgi:app).
+
+The app is imported once in the master (`preload_app`) so workers share the
+imported modules copy-on-write, then each worker builds its own Mongo client,
+caches and background threads after the fork (utils/worker_resources.py).
+Uploads are CPU-bound (PyMuPDF, OCR) and also wait on Gemini, so there is
+one process per core, each with a few threads for the I/O waits. Workers are
+recycled after `max_requests` (with jitter, so they do not all restart at
+once) to cap memory growth from PyMuPDF and the in-process caches.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count())))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+# Uploads wait on OCR and Gemini for a long time. Bulk uploads stop starting new files after
+# BULK_UPLOAD_TIME_BUDGET (default half of this) and respond by BULK_UPLOAD_MAX_SECONDS
+# (default this minus 30); both defaults follow GUNICORN_TIMEOUT.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '180'))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+preload_app = True
+accesslog = '-'
+
+
+def post_worker_init(worker):
+    """Connect before accepting requests; a failure is retried on first use instead of killing the worker."""
+    from app import resources
+    try:
+        resources.get()
+    except Exception as e:
+        worker.log.warning(f"Worker resources not ready yet: {str(e)}")
@@ -0,0 +1,390 @@
+"""
+Content-addressed store for original uploads.
+
+Originals are named by the SHA-256 of their bytes, so identical uploads share
+one blob. A `blobs` collection keeps a reference count per blob:
+
+  {_id: '<sha256>', refs, size, backend, created_at, updated_at, deleting?}
+
+Documents store the key as `file_blob` (and `file_size`). Uploads take a
+reference *before* writing the blob and deletes release it; blobs whose count
+reaches zero are reclaimed by `sweep` after BLOB_SWEEP_GRACE_SECONDS. The
+sweeper marks a row `deleting` before removing the blob, and `acquire` never
+matches such a row, so a re-upload of the same bytes waits for the delete to
+finish instead of racing it.
+
+Backends (BLOB_BACKEND):
+
+  local    <BLOB_ROOT>/ab/cd/<sha256>; written to a temp file, fsynced and
+           renamed into place, so a blob is either complete or absent
+  gridfs   a GridFS bucket in the application database
+  s3       an S3-compatible bucket (MinIO etc.), needs boto3
+
+Legacy documents that still point at a flat `file_path` are moved in with
+`python -m utils.blob_store --migrate`; `--reconcile` recomputes reference
+counts from the documents collection and `--sweep` runs one collection pass.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import gridfs
+from pymongo.errors import DuplicateKeyError
+
+BLOB_COLLECTION = 'blobs'
+BLOB_BACKEND = os.getenv('BLOB_BACKEND', 'local').lower()
+BLOB_ROOT = os.getenv('BLOB_ROOT', '')
+BLOB_GRIDFS_BUCKET = os.getenv('BLOB_GRIDFS_BUCKET', 'originals')
+BLOB_S3_BUCKET = os.getenv('BLOB_S3_BUCKET', '')
+BLOB_S3_ENDPOINT = os.getenv('BLOB_S3_ENDPOINT', '')
+BLOB_SWEEP_INTERVAL = int(os.getenv('BLOB_SWEEP_INTERVAL', '3600'))
+BLOB_SWEEP_GRACE_SECONDS = int(os.getenv('BLOB_SWEEP_GRACE_SECONDS', '3600'))
+BLOB_CHUNK_BYTES = 1024 * 1024
+ACQUIRE_RETRIES = 5
+
+
+class LocalBackend:
+    """Sharded directory tree on the local filesystem."""
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.spool_dir = self.root / 'tmp'
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key):
+        return self.root / key[:2] / key[2:4] / key
+
+    def exists(self, key):
+        return self.path(key).is_file()
+
+    def store(self, key, spooled_path):
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # The spool file is on the same filesystem, so this is an atomic rename
+        os.replace(spooled_path, target)
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def size(self, key):
+        return self.path(key).stat().st_size
+
+    def delete(self, key):
+        try:
+            self.path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        """(key, modified) for every stored blob."""
+        for shard in self.root.glob('[0-9a-f][0-9a-f]/[0-9a-f][0-9a-f]'):
+            for entry in shard.iterdir():
+                yield entry.name, datetime.fromtimestamp(entry.stat().st_mtime)
+
+
+class GridFSBackend:
+    """Blobs as GridFS files named by their key."""
+    name = 'gridfs'
+    spool_dir = None
+
+    def __init__(self, db, bucket_name=BLOB_GRIDFS_BUCKET):
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=bucket_name)
+
+    def _find(self, key):
+        return next(iter(self.bucket.find({'filename': key}).limit(1)), None)
+
+    def exists(self, key):
+        return self._find(key) is not None
+
+    def store(self, key, spooled_path):
+        with open(spooled_path, 'rb') as source:
+            self.bucket.upload_from_stream(key, source)
+
+    def open(self, key):
+        return self.bucket.open_download_stream_by_name(key)
+
+    def size(self, key):
+        return self._find(key).length
+
+    def delete(self, key):
+        for grid_file in self.bucket.find({'filename': key}):
+            self.bucket.delete(grid_file._id)
+
+    def keys(self):
+        for grid_file in self.bucket.find({}):
+            yield grid_file.filename, grid_file.upload_date.replace(tzinfo=None)
+
+
+class S3Backend:
+    """Objects in an S3-compatible bucket, keyed like the local shards."""
+    name = 's3'
+    spool_dir = None
+
+    def __init__(self, bucket=BLOB_S3_BUCKET, endpoint_url=BLOB_S3_ENDPOINT):
+        try:
+            import boto3  # only when the S3 backend is selected; it is slow to import
+        except ImportError:
+            raise RuntimeError('BLOB_BACKEND=s3 needs the boto3 package')
+        if not bucket:
+            raise ValueError('BLOB_S3_BUCKET is required for BLOB_BACKEND=s3')
+        self.bucket = bucket
+        self.s3 = boto3.client('s3', endpoint_url=endpoint_url or None)
+
+    @staticmethod
+    def object_key(key):
+        return f"{key[:2]}/{key[2:4]}/{key}"
+
+    def exists(self, key):
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except self.s3.exceptions.ClientError:
+            return False
+
+    def store(self, key, spooled_path):
+        self.s3.upload_file(str(spooled_path), self.bucket, self.object_key(key))
+
+    def open(self, key):
+        try:
+            return self.s3.get_object(Bucket=self.bucket, Key=self.object_key(key))['Body']
+        except self.s3.exceptions.ClientError as e:
+            # NoSuchKey, AccessDenied, ...: unreadable, like a missing file
+            raise FileNotFoundError(f"Blob {key} is missing") from e
+
+    def size(self, key):
+        try:
+            return self.s3.head_object(Bucket=self.bucket, Key=self.object_key(key))['ContentLength']
+        except self.s3.exceptions.ClientError as e:
+            raise FileNotFoundError(f"Blob {key} is missing") from e
+
+    def delete(self, key):
+        self.s3.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def keys(self):
+        for page in self.s3.get_paginator('list_objects_v2').paginate(Bucket=self.bucket):
+            for item in page.get('Contents', []):
+                yield item['Key'].rsplit('/', 1)[-1], item['LastModified'].replace(tzinfo=None)
+
+
+def make_backend(db, name=BLOB_BACKEND, root=BLOB_ROOT):
+    if name == 'local':
+        return LocalBackend(root)
+    if name == 'gridfs':
+        return GridFSBackend(db)
+    if name == 's3':
+        return S3Backend()
+    raise ValueError("BLOB_BACKEND must be one of: local, gridfs, s3")
+
+
+class BlobStore:
+    """Reference-counted, content-addressed blobs on top of a backend."""
+
+    def __init__(self, blobs_collection, backend):
+        self.blobs = blobs_collection
+        self.backend = backend
+
+    def _spool(self, source):
+        """Copy `source` to a temp file while hashing it: (key, size, temp path)."""
+        digest = hashlib.sha256()
+        size = 0
+        handle, temp_path = tempfile.mkstemp(dir=self.backend.spool_dir, prefix='spool-')
+        try:
+            with os.fdopen(handle, 'wb') as spooled:
+                while True:
+                    chunk = source.read(BLOB_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    spooled.write(chunk)
+                    size += len(chunk)
+                spooled.flush()
+                os.fsync(spooled.fileno())
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return digest.hexdigest(), size, temp_path
+
+    def acquire(self, key, size):
+        """Take a reference on `key`, creating its row if needed."""
+        now = datetime.now()
+        for attempt in range(ACQUIRE_RETRIES):
+            try:
+                self.blobs.update_one(
+                    {'_id': key, 'deleting': {'$ne': True}},
+                    {'$inc': {'refs': 1},
+                     '$set': {'updated_at': now},
+                     '$setOnInsert': {'size': size, 'backend': self.backend.name, 'created_at': now}},
+                    upsert=True
+                )
+                return
+            except DuplicateKeyError:
+                # The sweeper is deleting this blob; wait for it to finish
+                time.sleep(0.2 * (attempt + 1))
+        raise RuntimeError(f"Blob {key} is being garbage collected, retry the upload")
+
+    def release(self, key):
+        if key:
+            self.blobs.update_one({'_id': key}, {'$inc': {'refs': -1}, '$set': {'updated_at': datetime.now()}})
+
+    def put(self, source):
+        """Store a binary stream and take a reference on it: (key, size)."""
+        key, size, temp_path = self._spool(source)
+        try:
+            self.acquire(key, size)
+            try:
+                if not self.backend.exists(key):
+                    self.backend.store(key, temp_path)
+            except Exception:
+                self.release(key)
+                raise
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        return key, size
+
+    def open(self, key):
+        """Binary file object for a blob; FileNotFoundError when it is gone."""
+        try:
+            return self.backend.open(key)
+        except (OSError, gridfs.errors.NoFile) as e:
+            raise FileNotFoundError(f"Blob {key} is missing") from e
+
+    def local_path(self, key):
+        """Filesystem path for send_file, or None when the backend is not local."""
+        return self.backend.path(key) if isinstance(self.backend, LocalBackend) else None
+
+    def _remove(self, key):
+        self.backend.delete(key)
+        self.blobs.delete_one({'_id': key, 'deleting': True})
+
+    def sweep(self, grace_seconds=BLOB_SWEEP_GRACE_SECONDS, strays=False):
+        """
+        Delete unreferenced blobs idle for longer than `grace_seconds`. With
+        `strays`, also delete stored blobs that have no row at all.
+        """
+        cutoff = datetime.now() - timedelta(seconds=grace_seconds)
+        reclaimable = {'$or': [{'refs': {'$lte': 0}, 'updated_at': {'$lt': cutoff}}, {'deleting': True}]}
+        removed = 0
+        for row in self.blobs.find(reclaimable, {'_id': 1}):
+            claimed = self.blobs.find_one_and_update(
+                {'_id': row['_id'], **reclaimable},
+                {'$set': {'deleting': True}}
+            )
+            if claimed:
+                self._remove(row['_id'])
+                removed += 1
+
+        if strays:
+            for key, modified in self.backend.keys():
+                if modified >= cutoff:
+                    continue
+                try:
+                    # Claim the key so a concurrent upload waits instead of reusing the blob
+                    self.blobs.insert_one({'_id': key, 'refs': 0, 'deleting': True, 'updated_at': datetime.now()})
+                except DuplicateKeyError:
+                    continue
+                self._remove(key)
+                removed += 1
+        return removed
+
+    def reconcile(self, documents_collection, grace_seconds=BLOB_SWEEP_GRACE_SECONDS):
+        """Recompute reference counts from documents (rows touched within the grace period are left alone)."""
+        cutoff = datetime.now() - timedelta(seconds=grace_seconds)
+        actual = {
+            row['_id']: row['count']
+            for row in documents_collection.aggregate([
+                {'$match': {'file_blob': {'$type': 'string'}}},
+                {'$group': {'_id': '$file_blob', 'count': {'$sum': 1}}}
+            ])
+        }
+        fixed = 0
+        for row in self.blobs.find({'updated_at': {'$lt': cutoff}, 'deleting': {'$ne': True}}, {'refs': 1}):
+            refs = actual.get(row['_id'], 0)
+            if row.get('refs') != refs:
+                self.blobs.update_one({'_id': row['_id'], 'refs': row.get('refs')}, {'$set': {'refs': refs}})
+                fixed += 1
+        return fixed
+
+    def migrate_flat_files(self, documents_collection):
+        """Move legacy `file_path` originals into the store; returns the number migrated."""
+        migrated = 0
+        for doc in documents_collection.find({'file_path': {'$exists': True}, 'file_blob': {'$exists': False}},
+                                             {'file_path': 1}):
+            path = Path(doc['file_path'])
+            if not path.is_file():
+                print(f"[BLOBS] {doc['_id']}: {path} is missing, left as is")
+                continue
+            with open(path, 'rb') as source:
+                key, size = self.put(source)
+            documents_collection.update_one(
+                {'_id': doc['_id']},
+                {'$set': {'file_blob': key, 'file_size': size}, '$unset': {'file_path': ''}, '$inc': {'version': 1}}
+            )
+            path.unlink()
+            migrated += 1
+        return migrated
+
+
+def open_original(blob_store, doc):
+    """(binary file object, size) for a document's original, from the store or a legacy path."""
+    if doc.get('file_blob'):
+        source = blob_store.open(doc['file_blob'])
+        size = doc.get('file_size')
+        return source, blob_store.backend.size(doc['file_blob']) if size is None else size
+    if doc.get('file_path'):
+        source = open(doc['file_path'], 'rb')
+        return source, os.fstat(source.fileno()).st_size
+    raise FileNotFoundError('no original file stored')
+
+
+def start_sweeper(blob_store, interval=None):
+    """Run `sweep` periodically on a daemon thread (interval <= 0 disables it)."""
+    interval = BLOB_SWEEP_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                removed = blob_store.sweep()
+                if removed:
+                    print(f"[BLOBS] Reclaimed {removed} unreferenced blobs")
+            except Exception as e:
+                print(f"[BLOBS] Sweep failed: {str(e)}")
+
+    thread = threading.Thread(target=loop, name='blob-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Maintain the original-file blob store')
+    parser.add_argument('--migrate', action='store_true', help='move flat file_path uploads into the store')
+    parser.add_argument('--reconcile', action='store_true', help='recompute reference counts from documents')
+    parser.add_argument('--sweep', action='store_true', help='delete unreferenced blobs now')
+    parser.add_argument('--strays', action='store_true', help='with --sweep, also delete blobs with no row')
+    args = parser.parse_args()
+
+    db = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))[os.getenv('DB_NAME', 'kmrl_docintel')]
+    root = BLOB_ROOT or Path(os.getenv('UPLOAD_FOLDER', Path(__file__).parent.parent / 'uploads')) / 'blobs'
+    store = BlobStore(db[BLOB_COLLECTION], make_backend(db, root=root))
+    if args.migrate:
+        print(f"Migrated {store.migrate_flat_files(db['documents'])} files")
+    if args.reconcile:
+        print(f"Fixed {store.reconcile(db['documents'])} reference counts")
+    if args.sweep:
+        print(f"Removed {store.sweep(strays=args.strays)} blobs")
+    if not (args.migrate or args.reconcile or args.sweep):
+        parser.print_help()
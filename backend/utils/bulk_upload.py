@@ -0,0 +1,155 @@
+"""
+Bulk uploads: many files in one request, as multipart parts and/or zip archives.
+
+`upload_items` turns the request's files into UploadItems. Zip archives are
+expanded entry by entry. Their sizes are checked against the per-file limit
+and BULK_ARCHIVE_MAX_BYTES from the zip directory before anything is read, and
+zipfile never returns more than an entry's declared size. Entries are only
+decompressed when a worker opens them, so memory holds just the files in
+flight, not the whole batch. Directories, hidden files and macOS resource
+forks are skipped.
+
+`insert_documents` writes a batch of finished documents with two
+insert_many(ordered=False) calls: content rows first, then documents. A row
+that fails fails only its own file; a document whose insert fails has its
+content row removed again.
+"""
+import mimetypes
+import os
+import zipfile
+from functools import partial
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from pymongo.errors import BulkWriteError
+from werkzeug.datastructures import FileStorage
+
+from utils.content_store import content_row
+from utils.text_search import index_fields
+
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', '500'))
+BULK_ARCHIVE_MAX_BYTES = int(os.getenv('BULK_ARCHIVE_MAX_BYTES', str(2 * 1024 ** 3)))
+# Files extracted (PyMuPDF, OCR, thumbnails, tables) at once per process
+BULK_EXTRACT_WORKERS = int(os.getenv('BULK_EXTRACT_WORKERS', str(os.cpu_count() or 4)))
+# Gemini calls in flight at once per process
+BULK_GEMINI_CONCURRENCY = int(os.getenv('BULK_GEMINI_CONCURRENCY', '8'))
+BULK_INSERT_BATCH = int(os.getenv('BULK_INSERT_BATCH', '50'))
+_WORKER_TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', '180'))
+# Seconds a bulk request starts new files for. Half the gunicorn worker timeout, so files
+# already in flight can finish before the worker is killed; the rest are reported as skipped.
+BULK_UPLOAD_TIME_BUDGET = float(os.getenv('BULK_UPLOAD_TIME_BUDGET', str(_WORKER_TIMEOUT // 2)))
+# Seconds after which a bulk request stops waiting for files in flight and responds; Gemini
+# calls get the time left until then as their timeout
+BULK_UPLOAD_MAX_SECONDS = float(os.getenv('BULK_UPLOAD_MAX_SECONDS',
+                                          str(max(_WORKER_TIMEOUT - 30, _WORKER_TIMEOUT * 3 // 4))))
+# With less time left than this a file is stored with the non-AI result instead of calling Gemini
+BULK_GEMINI_MIN_SECONDS = float(os.getenv('BULK_GEMINI_MIN_SECONDS', '5'))
+ARCHIVE_EXTENSIONS = ('.zip',)
+
+
+class UploadItem:
+    """One file of a bulk upload: `open()` returns a FileStorage, or `error` says why it is rejected."""
+
+    def __init__(self, name, opener=None, error=None):
+        self.name = name
+        self.opener = opener
+        self.error = error
+
+    def open(self):
+        return self.opener()
+
+
+def is_archive(filename):
+    return PurePosixPath(filename or '').suffix.lower() in ARCHIVE_EXTENSIONS
+
+
+def _size_error(size, max_file_bytes):
+    if size > max_file_bytes:
+        return f"File is larger than {max_file_bytes // (1024 * 1024)} MB"
+    return None
+
+
+def _stream_size(file):
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def _skipped_entry(info):
+    name = PurePosixPath(info.filename).name
+    return info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/')
+
+
+def _open_entry(archive, info):
+    name = PurePosixPath(info.filename).name
+    with archive.open(info) as entry:
+        data = entry.read()
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return FileStorage(stream=BytesIO(data), filename=name, content_type=content_type)
+
+
+def archive_items(file, max_file_bytes):
+    """Items for the entries of an uploaded zip archive. Raises ValueError for a bad or oversized archive."""
+    try:
+        archive = zipfile.ZipFile(file.stream)
+    except zipfile.BadZipFile:
+        raise ValueError(f"{file.filename} is not a valid zip archive")
+    entries = [info for info in archive.infolist() if not _skipped_entry(info)]
+    if sum(info.file_size for info in entries) > BULK_ARCHIVE_MAX_BYTES:
+        raise ValueError(f"{file.filename} expands to more than {BULK_ARCHIVE_MAX_BYTES // (1024 ** 2)} MB")
+    return [
+        UploadItem(PurePosixPath(info.filename).name, partial(_open_entry, archive, info),
+                   _size_error(info.file_size, max_file_bytes))
+        for info in entries
+    ]
+
+
+def upload_items(files, max_file_bytes):
+    """
+    UploadItems for a bulk request's files, archives expanded, in request order.
+    Raises ValueError when there are more than BULK_UPLOAD_MAX_FILES.
+    """
+    items = []
+    for file in files:
+        if not file or not file.filename:
+            continue
+        if is_archive(file.filename):
+            items.extend(archive_items(file, max_file_bytes))
+        else:
+            items.append(UploadItem(file.filename, lambda file=file: file,
+                                    _size_error(_stream_size(file), max_file_bytes)))
+        if len(items) > BULK_UPLOAD_MAX_FILES:
+            raise ValueError(f"At most {BULK_UPLOAD_MAX_FILES} files per bulk upload")
+    return items
+
+
+def _insert_many(collection, rows):
+    """insert_many(ordered=False); {position: error} for the rows that were rejected."""
+    if not rows:
+        return {}
+    try:
+        collection.insert_many(rows, ordered=False)
+        return {}
+    except BulkWriteError as e:
+        return {error['index']: error.get('errmsg', 'Write failed') for error in e.details.get('writeErrors', [])}
+
+
+def insert_documents(documents_collection, contents_collection, batch):
+    """
+    Insert (document, content_fields) pairs, content first. Returns {position: error}
+    for the pairs that were not inserted; all others are in. Other errors (e.g. the
+    database is unreachable) propagate.
+    """
+    rows = [content_row(doc['_id'], fields, extra=index_fields(doc, fields.get('content')))
+            for doc, fields in batch]
+    errors = _insert_many(contents_collection, rows)
+    ready = [position for position in range(len(batch)) if position not in errors]
+    rejected = _insert_many(documents_collection, [batch[position][0] for position in ready])
+    for offset, message in rejected.items():
+        errors[ready[offset]] = message
+    if rejected:
+        orphaned = [batch[ready[offset]][0]['_id'] for offset in rejected]
+        contents_collection.delete_many({'_id': {'$in': orphaned}})
+    return errors
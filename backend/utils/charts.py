@@ -0,0 +1,322 @@
+"""
+Chart normalization helpers.
+
+Gemini charts and tables are turned into numeric-only chart payloads for the
+frontend. Numeric columns are parsed in one regex pass per column, column
+types are inferred once per table from a sample of cells, and every chart is
+capped at CHART_MAX_POINTS with a
+shape-preserving downsample (LTTB for line-like charts, top-N + "Other" for
+bar/pie charts).
+"""
+import math
+import os
+import re
+
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', '50'))
+CHART_MAX_PER_TABLE = int(os.getenv('CHART_MAX_PER_TABLE', '6'))
+# Share of non-empty cells that must parse for a column to count as numeric
+NUMERIC_COLUMN_RATIO = 0.6
+
+LINE_CHART_TYPES = {'line', 'area', 'scatter'}
+
+_STRIP_TABLE = str.maketrans({
+    ',': None, ' ': None, '\u00a0': None, '_': None,
+    '\u20b9': None, '$': None, '\u20ac': None, '\u00a3': None,
+    '\u2212': '-',  # unicode minus
+})
+_CURRENCY_PREFIX = re.compile(r'^(?:rs\.?|inr|usd|eur|gbp)', re.IGNORECASE)
+# A multiplier suffix must end the word: '12k' and '3 Cr.' scale, '12 km', '5 kg' and '3 crew' do not
+_NUMBER = re.compile(r'(-?)(\d+(?:\.\d+)?|\.\d+)(?:(lakhs?|lacs?|crores?|cr|k|mn|bn)(?![a-z]))?', re.IGNORECASE)
+_MULTIPLIERS = {
+    'lakh': 1e5, 'lakhs': 1e5, 'lac': 1e5, 'lacs': 1e5,
+    'crore': 1e7, 'crores': 1e7, 'cr': 1e7,
+    'k': 1e3, 'mn': 1e6, 'bn': 1e9,
+}
+# Strict single-cell pattern used by the batched column parser; the trailing
+# alternative makes every line produce exactly one match
+_WS = r'[^\S\n]*'
+_CELL = re.compile(
+    rf'^{_WS}(\()?{_WS}(?:(?:rs\.?|inr|usd|eur|gbp){_WS})?[₹$€£]?{_WS}([-+−]?){_WS}'
+    rf'[₹$€£]?{_WS}(\d[\d,]*(?:\.\d+)?|\.\d+){_WS}(%|lakhs?|lacs?|crores?|cr|k|mn|bn)?\.?{_WS}\)?{_WS}$'
+    r'|^.*$',
+    re.IGNORECASE | re.MULTILINE
+)
+_TIME_LABEL = re.compile(
+    r'^(?:(?:19|20)\d{2}(?:-\d{2,4})?'
+    r'|fy\s?\d{2,4}(?:-\d{2,4})?'
+    r'|q[1-4][\s-]*(?:(?:19|20)?\d{2})?'
+    r'|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}'
+    r'|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?[\s-]*(?:(?:19|20)?\d{2})?'
+    r'|week\s?\d+|wk\s?\d+)$',
+    re.IGNORECASE
+)
+
+
+def _parse_text(value_str):
+    """Parse a single string cell; handles currency, %, accounting negatives and lakh/crore."""
+    value_str = value_str.strip()
+    if not value_str:
+        return None
+
+    negative = value_str.startswith('(') and value_str.endswith(')')
+    cleaned = _CURRENCY_PREFIX.sub('', value_str.translate(_STRIP_TABLE).strip('()%'))
+    match = _NUMBER.search(cleaned)
+    if not match:
+        return None
+
+    sign, digits, suffix = match.groups()
+    number = float(digits)
+    if suffix:
+        number *= _MULTIPLIERS[suffix.lower()]
+    if sign or negative:
+        number = -number
+    return number
+
+
+def parse_numeric_value(value):
+    """Convert various numeric string formats into floats."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    return _parse_text(str(value))
+
+
+def _cell_value(match):
+    """Convert a _CELL match into a float (or None when the cell is not numeric)."""
+    paren, sign, digits, suffix = match.group(1, 2, 3, 4)
+    if digits is None:
+        line = match.group(0)
+        return _parse_text(line) if line else None
+    number = float(digits.replace(',', ''))
+    if suffix and suffix != '%':
+        number *= _MULTIPLIERS[suffix.lower()]
+    if paren or sign in ('-', '−'):
+        number = -number
+    return number
+
+
+def parse_numeric_column(values):
+    """
+    Parse a whole column of cells in one pass.
+
+    The column is joined into a single newline-separated string and scanned
+    with one multiline regex, so the cleaning happens in the regex engine
+    rather than per character in Python. Cells the strict pattern does not
+    recognise fall back to the loose single-cell parser.
+    """
+    cells = values if isinstance(values, list) else list(values)
+    try:
+        joined = '\n'.join(cells)
+    except TypeError:
+        # Mixed column (None, numbers); stringify cell by cell
+        cells = [
+            '' if value is None or isinstance(value, bool)
+            else (repr(float(value)) if math.isfinite(value) else '') if isinstance(value, (int, float))
+            else str(value)
+            for value in cells
+        ]
+        joined = '\n'.join(cells)
+    if joined.count('\n') != len(cells) - 1:
+        # A cell contains a newline; parse cell by cell instead
+        return [parse_numeric_value(value) for value in cells]
+    if not cells:
+        return []
+    return [_cell_value(match) for match in _CELL.finditer(joined)]
+
+
+def infer_column_types(header, body_rows, sample_size=200):
+    """
+    Classify each column of a table once: 'numeric', 'time' or 'label'.
+
+    Types are decided from the first `sample_size` non-empty cells of each
+    column, so wide tables are not fully parsed just to pick chart columns.
+    """
+    types = []
+    for col in range(len(header)):
+        sample = []
+        for row in body_rows:
+            cell = row[col] if row and len(row) > col else None
+            if cell not in (None, ''):
+                sample.append(cell)
+                if len(sample) >= sample_size:
+                    break
+        if not sample:
+            types.append('label')
+            continue
+
+        threshold = NUMERIC_COLUMN_RATIO * len(sample)
+        if sum(1 for cell in sample if _TIME_LABEL.match(str(cell).strip())) >= threshold:
+            types.append('time')
+        elif sum(1 for number in parse_numeric_column(sample) if number is not None) >= threshold:
+            types.append('numeric')
+        else:
+            types.append('label')
+    return types
+
+
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling over the point index."""
+    length = len(points)
+    if threshold >= length or threshold < 3:
+        return points
+
+    sampled = [points[0]]
+    bucket_size = (length - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket acts as the third triangle vertex
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, length)
+        next_span = next_end - next_start
+        avg_x = (next_start + next_end - 1) / 2.0
+        avg_y = sum(points[j]['value'] for j in range(next_start, next_end)) / next_span
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        point_a_y = points[a]['value']
+
+        max_area = -1.0
+        chosen = start
+        for j in range(start, end):
+            area = abs((a - avg_x) * (points[j]['value'] - point_a_y) - (a - j) * (avg_y - point_a_y))
+            if area > max_area:
+                max_area = area
+                chosen = j
+
+        sampled.append(points[chosen])
+        a = chosen
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def top_n_with_other(points, limit):
+    """Keep the largest `limit - 1` points (by magnitude, original order) and fold the rest into 'Other'."""
+    if len(points) <= limit:
+        return points
+
+    ranked = sorted(range(len(points)), key=lambda i: abs(points[i]['value']), reverse=True)
+    keep = set(ranked[:limit - 1])
+    kept = [point for i, point in enumerate(points) if i in keep]
+    other_total = sum(point['value'] for i, point in enumerate(points) if i not in keep)
+    kept.append({"label": "Other", "value": other_total})
+    return kept
+
+
+def downsample_points(points, chart_type, max_points=None):
+    """Cap a chart's data points while preserving its visual shape."""
+    max_points = max_points or CHART_MAX_POINTS
+    if len(points) <= max_points:
+        return points
+    if chart_type in LINE_CHART_TYPES:
+        return lttb(points, max_points)
+    return top_n_with_other(points, max_points)
+
+
+def _normalize_chart_points(chart):
+    """Ensure chart data only contains numeric values so the UI can render accurate visuals."""
+    data_points = chart.get('data_points', [])
+    values = parse_numeric_column([point.get('value') for point in data_points])
+    normalized_points = []
+    for idx, (point, numeric_value) in enumerate(zip(data_points, values)):
+        if numeric_value is None:
+            continue
+        label = str(point.get('label') or f"Item {idx + 1}").strip()
+        normalized_points.append({
+            "label": label,
+            "value": numeric_value
+        })
+    return normalized_points
+
+
+def _derive_charts_from_tables(tables):
+    """
+    Build deterministic chart data from extracted tables when AI-provided charts are missing or unreliable.
+    Column types are inferred once per table; each numeric column becomes a chart keyed by the label
+    column (a line chart when labels are time-like, a bar chart otherwise).
+    """
+    derived_charts = []
+    tables = tables or []
+
+    for table_index, table in enumerate(tables):
+        rows = table.get('data') or []
+        if len(rows) < 2:
+            continue
+
+        headers = rows[0]
+        body_rows = rows[1:]
+        if not headers or len(headers) < 2:
+            continue
+
+        caption = table.get('caption') or f"Table {table_index + 1}"
+        types = infer_column_types(headers, body_rows)
+
+        label_col = next((col for col, col_type in enumerate(types) if col_type != 'numeric'), 0)
+        label_header = headers[label_col] or "Category"
+        chart_type = 'line' if types[label_col] == 'time' else 'bar'
+        labels = [
+            str(row[label_col]).strip() if row and len(row) > label_col and row[label_col] not in (None, '')
+            else f"{label_header} {row_idx + 1}"
+            for row_idx, row in enumerate(body_rows)
+        ]
+
+        table_charts = 0
+        for col_idx, col_type in enumerate(types):
+            if col_type != 'numeric' or col_idx == label_col:
+                continue
+            if table_charts >= CHART_MAX_PER_TABLE:
+                break
+
+            column_header = headers[col_idx] or f"Column {col_idx + 1}"
+            values = parse_numeric_column([row[col_idx] if row and len(row) > col_idx else None for row in body_rows])
+            data_points = [
+                {"label": label, "value": value}
+                for label, value in zip(labels, values)
+                if label and value is not None
+            ]
+
+            if len(data_points) >= 2:
+                derived_charts.append({
+                    "title": f"{caption} - {column_header}",
+                    "description": f"Auto-generated from '{caption}' using '{column_header}' values.",
+                    "chart_type": chart_type,
+                    "data_points": downsample_points(data_points, chart_type),
+                    "total_points": len(data_points),
+                    "page_number": table.get('page_number')
+                })
+                table_charts += 1
+
+    return derived_charts
+
+
+def normalize_charts(processed_data):
+    """
+    Validate Gemini chart output and fall back to deterministic charts derived from tables if needed.
+    Returns a list (possibly empty) that only contains numeric-friendly data so the frontend renders correct charts.
+    """
+    charts = processed_data.get('charts') or []
+    valid_charts = []
+
+    for chart in charts:
+        normalized_points = _normalize_chart_points(chart)
+        if len(normalized_points) < 2:
+            continue
+
+        chart_type = chart.get('chart_type', 'bar')
+        valid_charts.append({
+            "title": chart.get('title') or "Document Chart",
+            "description": chart.get('description', ''),
+            "chart_type": chart_type,
+            "data_points": downsample_points(normalized_points, chart_type),
+            "total_points": len(normalized_points),
+            "page_number": chart.get('page_number')
+        })
+
+    if valid_charts:
+        return valid_charts
+
+    return _derive_charts_from_tables(processed_data.get('tables_data'))
@@ -0,0 +1,240 @@
+"""
+Large extracted content kept out of the hot `documents` collection.
+
+Every dashboard, list and counter query touches `documents`, so it only holds
+metadata. The extracted text and the structured extraction blobs live in
+`document_contents`, one row per document keyed by the document's _id:
+
+  {_id: <document ObjectId>, content: '<plain text>',
+   codec: 'zstd' | 'zlib' | 'none', blob: Binary(<encoded {tables_data, figures_data}>),
+   content_bytes, blob_bytes, stored_blob_bytes, updated_at}
+
+`content` stays plain text so it can still be matched server-side; the
+structured fields are JSON encoded and compressed with CONTENT_CODEC (zstd
+when the `zstandard` package is installed, zlib otherwise). When the codec is
+zstd the collection is also created with WiredTiger's zstd block compressor.
+
+Detail, download and indexing paths load content lazily with `load_content`
+/ `attach_content`; downloads stream the text with `iter_content_text`.
+"""
+import json
+import os
+import zlib
+from datetime import datetime
+
+from bson.binary import Binary
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CONTENT_COLLECTION = 'document_contents'
+TEXT_FIELD = 'content'
+BLOB_FIELDS = ['tables_data', 'figures_data']
+CONTENT_FIELDS = [TEXT_FIELD] + BLOB_FIELDS
+CODECS = ('zstd', 'zlib', 'none')
+CONTENT_CODEC = os.getenv('CONTENT_CODEC', 'zstd').lower()
+CONTENT_READ_CHUNK_CHARS = int(os.getenv('CONTENT_READ_CHUNK_CHARS', str(256 * 1024)))
+ZSTD_LEVEL = int(os.getenv('CONTENT_ZSTD_LEVEL', '6'))
+
+
+def resolve_codec(codec=CONTENT_CODEC):
+    """The codec actually used for writes (zstd falls back to zlib when zstandard is missing)."""
+    if codec not in CODECS:
+        raise ValueError(f"CONTENT_CODEC must be one of: {', '.join(CODECS)}")
+    if codec == 'zstd' and zstandard is None:
+        return 'zlib'
+    return codec
+
+
+def encode_blob(value, codec):
+    raw = json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+    if codec == 'zstd':
+        return raw, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    if codec == 'zlib':
+        return raw, zlib.compress(raw, 6)
+    return raw, raw
+
+
+def decode_blob(codec, data):
+    data = bytes(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Content was stored with zstd; install zstandard to read it')
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == 'zlib':
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+def ensure_content_collection(db, codec=CONTENT_CODEC):
+    """Create the content collection (zstd block compression when requested) and return it."""
+    if resolve_codec(codec) == 'zstd':
+        try:
+            db.create_collection(
+                CONTENT_COLLECTION,
+                storageEngine={'wiredTiger': {'configString': 'block_compressor=zstd'}}
+            )
+        except (CollectionInvalid, OperationFailure):
+            # Already exists, or the server does not support zstd block compression
+            pass
+    return db[CONTENT_COLLECTION]
+
+
+def split_content(doc):
+    """Remove the large fields from `doc` (in place) and return them."""
+    return {field: doc.pop(field) for field in CONTENT_FIELDS if field in doc}
+
+
+def content_row(doc_id, fields, codec=CONTENT_CODEC, extra=None):
+    codec = resolve_codec(codec)
+    text = fields.get(TEXT_FIELD) or ''
+    blob_value = {field: fields[field] for field in BLOB_FIELDS if field in fields}
+    raw, stored = encode_blob(blob_value, codec)
+    return {
+        **(extra or {}),
+        '_id': doc_id,
+        TEXT_FIELD: text,
+        'codec': codec,
+        'blob': Binary(stored),
+        'content_bytes': len(text.encode('utf-8')),
+        'blob_bytes': len(raw),
+        'stored_blob_bytes': len(stored),
+        'updated_at': datetime.now()
+    }
+
+
+def save_content(contents_collection, doc_id, fields, codec=CONTENT_CODEC, extra=None):
+    """Write a document's content row; `extra` adds fields such as search index entries."""
+    contents_collection.replace_one({'_id': doc_id}, content_row(doc_id, fields, codec, extra), upsert=True)
+
+
+def _decode_row(row, fields):
+    # Only what the row holds: a row with just search index entries (document not yet
+    # migrated) must not blank the content still stored inline on the document
+    loaded = {}
+    if TEXT_FIELD in fields and TEXT_FIELD in row:
+        loaded[TEXT_FIELD] = row[TEXT_FIELD] or ''
+    if any(field in fields for field in BLOB_FIELDS) and row.get('blob') is not None:
+        blob = decode_blob(row.get('codec', 'none'), row['blob'])
+        loaded.update({field: blob[field] for field in BLOB_FIELDS if field in fields and field in blob})
+    return loaded
+
+
+def _row_projection(fields):
+    projection = {'codec': 1}
+    if TEXT_FIELD in fields:
+        projection[TEXT_FIELD] = 1
+    if any(field in fields for field in BLOB_FIELDS):
+        projection['blob'] = 1
+    return projection
+
+
+def load_content(contents_collection, doc_id, fields=CONTENT_FIELDS):
+    """The requested content fields of one document ({} when it has none)."""
+    row = contents_collection.find_one({'_id': doc_id}, _row_projection(fields))
+    return _decode_row(row, fields) if row else {}
+
+
+def attach_content(contents_collection, docs, fields=CONTENT_FIELDS):
+    """Merge content fields into already-loaded documents with one query; returns `docs`."""
+    fields = [field for field in fields if field in CONTENT_FIELDS]
+    if not fields or not docs:
+        return docs
+    by_id = {doc['_id']: doc for doc in docs}
+    for row in contents_collection.find({'_id': {'$in': list(by_id)}}, _row_projection(fields)):
+        by_id[row['_id']].update(_decode_row(row, fields))
+    return docs
+
+
+async def attach_content_async(contents_collection, docs, fields=CONTENT_FIELDS):
+    """attach_content for an AsyncMongoClient collection."""
+    fields = [field for field in fields if field in CONTENT_FIELDS]
+    if not fields or not docs:
+        return docs
+    by_id = {doc['_id']: doc for doc in docs}
+    async for row in contents_collection.find({'_id': {'$in': list(by_id)}}, _row_projection(fields)):
+        by_id[row['_id']].update(_decode_row(row, fields))
+    return docs
+
+
+def iter_content_text(contents_collection, doc_id, chunk_chars=CONTENT_READ_CHUNK_CHARS):
+    """
+    Yield a document's text in slices of `chunk_chars` code points. Each slice
+    is cut server-side with $substrCP, so only one slice is in memory at a time.
+    """
+    offset = 0
+    while True:
+        rows = list(contents_collection.aggregate([
+            {'$match': {'_id': doc_id}},
+            {'$project': {'_id': 0, 'chunk': {'$substrCP': [{'$ifNull': [f'${TEXT_FIELD}', '']}, offset, chunk_chars]}}}
+        ]))
+        chunk = rows[0]['chunk'] if rows else ''
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_chars:
+            return
+        offset += chunk_chars
+
+
+def delete_content(contents_collection, doc_id):
+    contents_collection.delete_one({'_id': doc_id})
+
+
+def content_match_ids(contents_collection, pattern, limit=None):
+    """_ids of documents whose text matches a case-insensitive regex, newest first (at most `limit`)."""
+    cursor = contents_collection.find({TEXT_FIELD: {'$regex': pattern, '$options': 'i'}}, {'_id': 1}).sort('_id', -1)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    return [row['_id'] for row in cursor]
+
+
+def migrate_inline_content(documents_collection, contents_collection, batch_size=200, codec=CONTENT_CODEC):
+    """
+    Move content fields still stored on documents into the content collection.
+    Content rows are written (with their search index entries) before the fields are
+    unset, so the migration can be interrupted and re-run safely. Returns the number
+    of documents moved.
+    """
+    # text_search imports this module
+    from utils.text_search import FIELD_WEIGHTS, index_fields
+
+    moved = 0
+    pending = {'$or': [{field: {'$exists': True}} for field in CONTENT_FIELDS]}
+    projection = {field: 1 for field in CONTENT_FIELDS + list(FIELD_WEIGHTS)}
+    while True:
+        batch = list(documents_collection.find(pending, projection).limit(batch_size))
+        if not batch:
+            return moved
+        rows, unsets = [], []
+        for doc in batch:
+            fields = {field: doc[field] for field in CONTENT_FIELDS if field in doc}
+            row = content_row(doc['_id'], fields, codec, extra=index_fields(doc, fields.get(TEXT_FIELD)))
+            rows.append(ReplaceOne({'_id': doc['_id']}, row, upsert=True))
+            unsets.append(UpdateOne({'_id': doc['_id']}, {'$unset': {field: '' for field in CONTENT_FIELDS}}))
+        contents_collection.bulk_write(rows, ordered=False)
+        documents_collection.bulk_write(unsets, ordered=False)
+        moved += len(batch)
+        print(f"[CONTENT] Moved {moved} documents")
+
+
+if __name__ == '__main__':
+    # One-off migration of existing data: python -m utils.content_store [--batch-size N]
+    import argparse
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description='Move inline document content into the content collection')
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--codec', default=CONTENT_CODEC, choices=CODECS)
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))[os.getenv('DB_NAME', 'kmrl_docintel')]
+    contents = ensure_content_collection(db, args.codec)
+    total = migrate_inline_content(db['documents'], contents, args.batch_size, args.codec)
+    print(f"[CONTENT] Migration finished: {total} documents moved to '{CONTENT_COLLECTION}' ({resolve_codec(args.codec)})")
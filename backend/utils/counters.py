@@ -0,0 +1,352 @@
+"""
+Materialized dashboard counters.
+
+The `stats` collection holds pre-aggregated counts so dashboard endpoints read
+a couple of small documents instead of aggregating the whole corpus:
+
+  {_id: 'global', total, starred, status: {..}, department: {..}, type: {..},
+   language: {..}, department_status: {dept: {status: n}}}
+  {_id: 'day:YYYY-MM-DD', kind: 'day', key: 'YYYY-MM-DD', count}
+  {_id: 'tag:<tag>', kind: 'tag', key: '<tag>', count}
+
+Write paths compute the before/after difference of a document and apply it
+with `$inc` in a single unordered bulk write. Counter updates never fail the
+request that triggered them; `reconcile_counters` recomputes everything from
+the documents collection and fixes any drift.
+
+The global document is only incremented once it exists, never upserted. A
+write before the first reconcile would otherwise create a partial document
+(total=1, or negative counts after a delete) that readers would take as
+materialized. Until it exists, readers reconcile on first use, and the
+reconciler runs as soon as it starts when the counters are missing or stale.
+
+Every worker starts a reconciler thread, but a run first takes a lease (the
+`lease:reconcile` document, held for one interval), so the deployment does
+one full recompute per interval however many workers there are. The global
+correction is applied as an `$inc` of the difference to the stored counts,
+so increments from writes that land while it runs are kept.
+"""
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from utils.dashboard_stats import compute_dashboard_counts, start_of_today
+
+GLOBAL_ID = 'global'
+COUNTED_FIELDS = ['department', 'type', 'status', 'language']
+COUNTER_PROJECTION = {'department': 1, 'type': 1, 'status': 1, 'language': 1, 'tags': 1, 'starred': 1, 'date': 1}
+STATS_RECONCILE_INTERVAL = int(os.getenv('STATS_RECONCILE_INTERVAL', '3600'))
+RECONCILE_LEASE_ID = 'lease:reconcile'
+
+_KEY_ESCAPES = [('%', '%25'), ('.', '%2E'), ('$', '%24')]
+
+
+def encode_key(value):
+    """Make a value safe to use as a field name inside a counter map."""
+    key = 'Unknown' if value in (None, '') else str(value)
+    for raw, escaped in _KEY_ESCAPES:
+        key = key.replace(raw, escaped)
+    return key
+
+
+def decode_key(key):
+    for raw, escaped in reversed(_KEY_ESCAPES):
+        key = key.replace(escaped, raw)
+    return key
+
+
+def _day_key(date):
+    return date.strftime('%Y-%m-%d') if isinstance(date, datetime) else None
+
+
+def document_deltas(doc, sign=1):
+    """
+    Counter increments contributed by one document.
+
+    Returns a Counter keyed by (kind, key, path): kind 'global' uses `path`
+    as the `$inc` field path, 'day' and 'tag' increment `count` on the
+    document identified by `key`.
+    """
+    deltas = Counter()
+    if not doc:
+        return deltas
+
+    deltas[('global', GLOBAL_ID, 'total')] += sign
+    for field in COUNTED_FIELDS:
+        deltas[('global', GLOBAL_ID, f"{field}.{encode_key(doc.get(field))}")] += sign
+    deltas[('global', GLOBAL_ID, f"department_status.{encode_key(doc.get('department'))}.{encode_key(doc.get('status'))}")] += sign
+    if doc.get('starred'):
+        deltas[('global', GLOBAL_ID, 'starred')] += sign
+
+    day = _day_key(doc.get('date'))
+    if day:
+        deltas[('day', day, 'count')] += sign
+    for tag in set(doc.get('tags') or []):
+        deltas[('tag', str(tag), 'count')] += sign
+    return deltas
+
+
+def change_deltas(before, after):
+    """Net increments for a document going from `before` to `after` (either may be None)."""
+    deltas = document_deltas(after, 1)
+    deltas.update(document_deltas(before, -1))
+    return Counter({key: n for key, n in deltas.items() if n})
+
+
+def delta_operations(deltas):
+    """UpdateOne operations applying `deltas` (one per counter document)."""
+    deltas = {key: n for key, n in deltas.items() if n}
+    global_inc = {}
+    operations = []
+    for (kind, key, path), n in deltas.items():
+        if kind == 'global':
+            global_inc[path] = global_inc.get(path, 0) + n
+        else:
+            operations.append(UpdateOne(
+                {'_id': f"{kind}:{key}"},
+                {'$inc': {'count': n}, '$set': {'kind': kind, 'key': key}},
+                upsert=True
+            ))
+    if global_inc:
+        # No upsert: a missing global document is built by reconcile_counters, which counts this change too
+        operations.append(UpdateOne({'_id': GLOBAL_ID}, {'$inc': global_inc}))
+    return operations
+
+
+def change_operations(changes):
+    """Counter updates for many (before, after) pairs."""
+    deltas = Counter()
+    for before, after in changes:
+        deltas.update(change_deltas(before, after))
+    return delta_operations(deltas)
+
+
+def apply_deltas(stats_collection, deltas):
+    """Apply increments atomically per counter document in one round trip."""
+    operations = delta_operations(deltas)
+    if operations:
+        stats_collection.bulk_write(operations, ordered=False)
+
+
+def record_change(stats_collection, before, after):
+    """Update counters for an insert (before=None), delete (after=None) or update."""
+    record_changes(stats_collection, [(before, after)])
+
+
+def record_changes(stats_collection, changes):
+    """Update counters for many (before, after) pairs with a single bulk write."""
+    try:
+        operations = change_operations(changes)
+        if operations:
+            stats_collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"[STATS] Counter update failed, will be fixed on next reconcile: {str(e)}")
+
+
+def _decode_map(mapping):
+    return {decode_key(key): value for key, value in (mapping or {}).items() if value}
+
+
+def read_counters(stats_collection):
+    """
+    Read the global and today's counter documents (one round trip).
+    Returns None when counters have not been materialized yet.
+    """
+    today_id = f"day:{_day_key(start_of_today())}"
+    docs = {doc['_id']: doc for doc in stats_collection.find({'_id': {'$in': [GLOBAL_ID, today_id]}})}
+    global_doc = docs.get(GLOBAL_ID)
+    if global_doc is None:
+        return None
+
+    counts = {field: _decode_map(global_doc.get(field)) for field in COUNTED_FIELDS}
+    counts['department_status'] = {
+        decode_key(dept): _decode_map(by_status)
+        for dept, by_status in (global_doc.get('department_status') or {}).items()
+    }
+    counts['total'] = global_doc.get('total', 0)
+    counts['starred'] = global_doc.get('starred', 0)
+    counts['today'] = docs.get(today_id, {}).get('count', 0)
+    return counts
+
+
+def top_tags(stats_collection, limit=10):
+    """Most frequent tags from the maintained tag counters (served by the kind/count index)."""
+    cursor = stats_collection.find(
+        {'kind': 'tag', 'count': {'$gt': 0}},
+        {'key': 1, 'count': 1}
+    ).sort('count', -1).limit(limit)
+    return [{'tag': doc['key'], 'count': doc['count']} for doc in cursor]
+
+
+def tag_count_pipeline(match=None, limit=None):
+    """Per-tag document counts computed server-side; a tag counts once per document."""
+    pipeline = [{'$match': match}] if match else []
+    pipeline += [
+        {'$project': {'_id': 0, 'tags': {'$setUnion': [{'$ifNull': ['$tags', []]}, []]}}},
+        {'$unwind': '$tags'},
+        {'$group': {'_id': '$tags', 'count': {'$sum': 1}}}
+    ]
+    if limit:
+        pipeline += [{'$sort': {'count': -1, '_id': 1}}, {'$limit': limit}]
+    return pipeline
+
+
+def filtered_top_tags(documents_collection, match, limit=10):
+    """Most frequent tags among documents matching `match` (only the top `limit` rows leave the server)."""
+    return [
+        {'tag': row['_id'], 'count': row['count']}
+        for row in documents_collection.aggregate(tag_count_pipeline(match, limit))
+    ]
+
+
+def _group_counts(documents_collection, field):
+    pipeline = [{'$group': {'_id': f'${field}', 'count': {'$sum': 1}}}]
+    return {row['_id']: row['count'] for row in documents_collection.aggregate(pipeline)}
+
+
+def _encoded_counts(mapping):
+    encoded = {}
+    for value, n in mapping.items():
+        key = encode_key(value)
+        encoded[key] = encoded.get(key, 0) + n
+    return encoded
+
+
+def _counter_paths(doc, prefix=''):
+    """{dotted path: count} for the numeric leaves of a counter document."""
+    paths = {}
+    for key, value in (doc or {}).items():
+        if isinstance(value, dict):
+            paths.update(_counter_paths(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            paths[prefix + key] = value
+    return paths
+
+
+def reconcile_counters(documents_collection, stats_collection):
+    """
+    Recompute every counter from the documents collection. The global document is
+    corrected with an `$inc` of the difference; day and tag counters are overwritten.
+    """
+    started = time.perf_counter()
+    core = compute_dashboard_counts(documents_collection)
+
+    global_doc = {
+        '_id': GLOBAL_ID,
+        'total': core['total'],
+        'starred': core['starred'],
+        'status': _encoded_counts(core['status']),
+        'department_status': {},
+        'reconciled_at': datetime.now()
+    }
+    for dept, by_status in core['department_status'].items():
+        dept_map = global_doc['department_status'].setdefault(encode_key(dept), {})
+        for status, n in _encoded_counts(by_status).items():
+            dept_map[status] = dept_map.get(status, 0) + n
+    for field in ['department', 'type', 'language']:
+        global_doc[field] = _encoded_counts(_group_counts(documents_collection, field))
+
+    days = Counter()
+    for row in documents_collection.aggregate([
+        {'$match': {'date': {'$type': 'date'}}},
+        {'$group': {'_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$date'}}, 'count': {'$sum': 1}}}
+    ]):
+        days[row['_id']] += row['count']
+    tags = Counter()
+    for row in documents_collection.aggregate(tag_count_pipeline()):
+        tags[str(row['_id'])] += row['count']
+
+    # Read the stored counts as late as possible and correct them relatively, so concurrent $incs survive
+    stored = _counter_paths(stats_collection.find_one({'_id': GLOBAL_ID}, {'_id': 0, 'reconciled_at': 0}))
+    computed = _counter_paths({key: value for key, value in global_doc.items() if key != '_id'})
+    correction = {path: computed.get(path, 0) - stored.get(path, 0) for path in set(computed) | set(stored)}
+    correction = {path: n for path, n in correction.items() if n}
+    global_update = {'$set': {'reconciled_at': global_doc['reconciled_at']}}
+    if correction:
+        global_update['$inc'] = correction
+    operations = [UpdateOne({'_id': GLOBAL_ID}, global_update, upsert=True)]
+    for kind, counts in (('day', days), ('tag', tags)):
+        for key, n in counts.items():
+            operations.append(UpdateOne(
+                {'_id': f"{kind}:{key}"},
+                {'$set': {'kind': kind, 'key': key, 'count': n}},
+                upsert=True
+            ))
+    stats_collection.bulk_write(operations, ordered=False)
+    # Counters for days/tags that no longer exist
+    stats_collection.delete_many({'kind': 'day', 'key': {'$nin': list(days)}})
+    stats_collection.delete_many({'kind': 'tag', 'key': {'$nin': list(tags)}})
+
+    print(f"[STATS] Reconciled counters for {core['total']} documents in {time.perf_counter() - started:.2f}s")
+    return global_doc
+
+
+def seconds_since_reconcile(stats_collection):
+    """Age of the materialized counters, None when they do not exist or were never reconciled."""
+    global_doc = stats_collection.find_one({'_id': GLOBAL_ID}, {'reconciled_at': 1})
+    if not global_doc or not isinstance(global_doc.get('reconciled_at'), datetime):
+        return None
+    return (datetime.now() - global_doc['reconciled_at']).total_seconds()
+
+
+def acquire_lease(stats_collection, lease_id, owner, seconds):
+    """Take or renew a lease document for `seconds`; False while another owner holds an unexpired one."""
+    now = datetime.now()
+    try:
+        stats_collection.update_one(
+            {'_id': lease_id, '$or': [{'expires_at': {'$lte': now}}, {'owner': owner}]},
+            {'$set': {'owner': owner, 'expires_at': now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The upsert collided with a lease held by someone else
+        return False
+
+
+def start_reconciler(documents_collection, stats_collection, interval=None):
+    """
+    Run reconcile_counters periodically on a daemon thread (interval <= 0 disables it).
+    A run happens when the counters are missing or older than `interval` and this
+    process gets the reconcile lease, so only one process per deployment recomputes
+    them each interval. The first check is immediate, so a fresh or long-idle
+    deployment does not wait a full interval.
+    """
+    interval = STATS_RECONCILE_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def loop():
+        while True:
+            age = None
+            try:
+                age = seconds_since_reconcile(stats_collection)
+                if (age is None or age >= interval) and acquire_lease(stats_collection, RECONCILE_LEASE_ID,
+                                                                      owner, interval):
+                    reconcile_counters(documents_collection, stats_collection)
+                    age = 0
+            except Exception as e:
+                print(f"[STATS] Reconcile failed: {str(e)}")
+            # Next check when the counters are due again (a full interval if another process holds the lease)
+            time.sleep(interval - age if age is not None and age < interval else interval)
+
+    thread = threading.Thread(target=loop, name='stats-reconciler', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    # One-off reconcile, e.g. from cron: python -m utils.counters
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    db = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))[os.getenv('DB_NAME', 'kmrl_docintel')]
+    reconcile_counters(db['documents'], db['stats'])
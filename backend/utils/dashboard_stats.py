@@ -0,0 +1,108 @@
+"""
+Dashboard counters computed in a single aggregation.
+
+All dashboard widgets that only need counts (totals, per-status,
+per-department x status, starred, today) are answered by one `$facet`
+pipeline instead of one `count_documents` round trip per number. The pipeline
+projects only the counted fields first and is hinted onto the
+DASHBOARD_INDEX compound index so MongoDB can answer it from the index instead
+of reading full documents (which carry the large extracted text).
+"""
+from datetime import datetime
+
+from pymongo.errors import OperationFailure
+
+DEPARTMENTS = [
+    "Operations", "Engineering", "Safety", "Procurement",
+    "Human Resources", "Finance", "Environment"
+]
+STATUSES = ['urgent', 'review', 'approved']
+
+DASHBOARD_INDEX_NAME = 'dashboard_counts'
+DASHBOARD_INDEX = [('department', 1), ('status', 1), ('starred', 1), ('date', 1)]
+
+
+def start_of_today():
+    """Midnight (server local time) of the current day."""
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def dashboard_facet_pipeline(today_start):
+    """Build the single-pass `$facet` pipeline for every dashboard count."""
+    return [
+        {'$project': {'_id': 0, 'department': 1, 'status': 1, 'starred': 1, 'date': 1}},
+        {'$facet': {
+            'total': [{'$count': 'count'}],
+            'by_status': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+            'by_department_status': [{'$group': {
+                '_id': {'department': '$department', 'status': '$status'},
+                'count': {'$sum': 1}
+            }}],
+            'starred': [{'$match': {'starred': True}}, {'$count': 'count'}],
+            'today': [{'$match': {'date': {'$gte': today_start}}}, {'$count': 'count'}]
+        }}
+    ]
+
+
+def _first_count(rows):
+    return rows[0]['count'] if rows else 0
+
+
+def compute_dashboard_counts(collection):
+    """
+    Run the facet pipeline and reshape it into plain dicts:
+    {'total', 'status': {status: n}, 'department_status': {dept: {status: n}}, 'starred', 'today'}
+    """
+    pipeline = dashboard_facet_pipeline(start_of_today())
+    try:
+        result = next(collection.aggregate(pipeline, hint=DASHBOARD_INDEX_NAME), {})
+    except OperationFailure:
+        # Index not built yet (fresh database); fall back to a collection scan
+        result = next(collection.aggregate(pipeline), {})
+
+    status_counts = {row['_id']: row['count'] for row in result.get('by_status', [])}
+
+    department_status = {}
+    for row in result.get('by_department_status', []):
+        key = row['_id']
+        department = key.get('department')
+        department_status.setdefault(department, {})[key.get('status')] = row['count']
+
+    return {
+        'total': _first_count(result.get('total')),
+        'status': status_counts,
+        'department_status': department_status,
+        'starred': _first_count(result.get('starred')),
+        'today': _first_count(result.get('today'))
+    }
+
+
+def department_breakdown(counts):
+    """Per-department totals in the shape returned by /api/dashboard/departments."""
+    dept_stats = []
+    for dept in DEPARTMENTS:
+        by_status = counts['department_status'].get(dept, {})
+        total = sum(by_status.values())
+        urgent = by_status.get('urgent', 0)
+        approved = by_status.get('approved', 0)
+        dept_stats.append({
+            'name': dept,
+            'total_docs': total,
+            'urgent_items': urgent,
+            'approved_items': approved,
+            'pending_items': total - urgent - approved
+        })
+    return dept_stats
+
+
+def status_breakdown(counts):
+    """Status counts and percentages in the shape returned by /api/dashboard/status-distribution."""
+    status_data = [
+        {'status': status, 'count': counts['status'].get(status, 0), 'percentage': 0}
+        for status in STATUSES
+    ]
+    total = sum(item['count'] for item in status_data)
+    if total > 0:
+        for item in status_data:
+            item['percentage'] = round((item['count'] / total) * 100, 1)
+    return status_data
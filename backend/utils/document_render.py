@@ -0,0 +1,155 @@
+"""
+Streamed document downloads (text report, Markdown or JSON).
+
+The renderers are generators over the document metadata, its tables and an
+iterator of content slices (see content_store.iter_content_text). The report
+is never assembled as one string: metadata and tables are small and written
+first, then each content slice is passed through as it is read.
+
+  txt    the original plain-text report, byte for byte
+  md     the same sections as Markdown, tables as pipe tables
+  json   one JSON object; `content` is written as an escaped string in pieces
+"""
+import json
+import unicodedata
+from datetime import datetime
+from urllib.parse import quote
+
+from bson.objectid import ObjectId
+from werkzeug.http import dump_options_header
+
+DOWNLOAD_FORMATS = {
+    'txt': ('text/plain', 'txt'),
+    'md': ('text/markdown', 'md'),
+    'json': ('application/json', 'json'),
+}
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+METADATA_FIELDS = [('Department', 'department'), ('Type', 'type'), ('Date', 'date'),
+                   ('Status', 'status'), ('Source', 'source'), ('Language', 'language')]
+RULE = '=' * 80
+LINE = '-' * 80
+
+
+def _first_and_rest(chunks):
+    """Peek the first content slice so renderers know whether there is any content."""
+    chunks = iter(chunks)
+    first = next(chunks, '')
+    return first, chunks
+
+
+def render_text(doc, tables, chunks):
+    yield f"{RULE}\nDOCUMENT: {doc.get('title', 'Untitled')}\n{RULE}\n\n"
+
+    yield "METADATA:\n"
+    for label, field in METADATA_FIELDS:
+        yield f"  {label}: {doc.get(field, 'N/A')}\n"
+    yield f"  ID: {str(doc['_id'])}\n\n"
+
+    if doc.get('tags'):
+        yield f"Tags: {', '.join(doc.get('tags', []))}\n\n"
+    if doc.get('summary'):
+        yield f"SUMMARY:\n{doc.get('summary', '')}\n\n"
+
+    if tables:
+        yield f"\nTABLES:\n{LINE}\n"
+        for idx, table_obj in enumerate(tables, 1):
+            caption = table_obj.get('caption', f'Table {idx}')
+            yield f"\n{caption}:\n"
+            table_data = table_obj.get('data') or []
+            if table_data:
+                yield " | ".join(str(h) for h in table_data[0]) + "\n"
+                yield LINE + "\n"
+                for row in table_data[1:]:
+                    yield " | ".join(str(cell) for cell in row) + "\n"
+            yield "\n"
+
+    first, rest = _first_and_rest(chunks)
+    if first:
+        yield f"\nFULL CONTENT:\n{LINE}\n"
+        yield first
+        yield from rest
+        yield "\n"
+
+    yield f"\n{RULE}\nEnd of Document\n{RULE}"
+
+
+def _md_cell(value):
+    return str(value).replace('|', '\\|').replace('\n', ' ')
+
+
+def render_markdown(doc, tables, chunks):
+    yield f"# {doc.get('title', 'Untitled')}\n\n"
+    yield "| Field | Value |\n| --- | --- |\n"
+    for label, field in METADATA_FIELDS:
+        yield f"| {label} | {_md_cell(doc.get(field, 'N/A'))} |\n"
+    yield f"| ID | {str(doc['_id'])} |\n\n"
+
+    if doc.get('tags'):
+        yield "**Tags:** " + ', '.join(f"`{tag}`" for tag in doc['tags']) + "\n\n"
+    if doc.get('summary'):
+        yield f"## Summary\n\n{doc['summary']}\n\n"
+
+    if tables:
+        yield "## Tables\n\n"
+        for idx, table_obj in enumerate(tables, 1):
+            yield f"### {table_obj.get('caption', f'Table {idx}')}\n\n"
+            table_data = table_obj.get('data') or []
+            if table_data:
+                header = table_data[0]
+                yield "| " + " | ".join(_md_cell(h) for h in header) + " |\n"
+                yield "|" + " --- |" * len(header) + "\n"
+                for row in table_data[1:]:
+                    yield "| " + " | ".join(_md_cell(cell) for cell in row) + " |\n"
+            yield "\n"
+
+    first, rest = _first_and_rest(chunks)
+    if first:
+        yield "## Full content\n\n"
+        yield first
+        yield from rest
+        yield "\n"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return str(value)
+
+
+def render_json(doc, tables, chunks):
+    meta = {key: value for key, value in doc.items() if key != 'content'}
+    meta['_id'] = str(doc['_id'])
+    meta['tables_data'] = tables or []
+    head = json.dumps(meta, default=_json_default, ensure_ascii=False)
+    # Reopen the object and append content as a string built from escaped slices
+    yield head[:-1] + ', "content": "'
+    for chunk in chunks:
+        yield json.dumps(chunk, ensure_ascii=False)[1:-1]
+    yield '"}\n'
+
+
+def content_disposition(filename):
+    """Attachment header with an ASCII fallback name, quoted and escaped as send_file builds it."""
+    simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    if simple == filename:
+        return dump_options_header('attachment', {'filename': filename})
+    quoted = quote(filename, safe="!#$&+^`|~")
+    return dump_options_header('attachment', {'filename': simple, 'filename*': f"UTF-8''{quoted}"})
+
+
+RENDERERS = {'txt': render_text, 'md': render_markdown, 'json': render_json}
+
+
+def render_download(doc, tables, chunks, download_format='txt'):
+    """UTF-8 chunks of roughly DOWNLOAD_CHUNK_BYTES for the requested format."""
+    parts, size = [], 0
+    for piece in RENDERERS[download_format](doc, tables, chunks):
+        parts.append(piece)
+        size += len(piece)
+        if size >= DOWNLOAD_CHUNK_BYTES:
+            yield ''.join(parts).encode('utf-8')
+            parts, size = [], 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
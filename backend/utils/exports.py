@@ -0,0 +1,105 @@
+"""
+Streaming document exports.
+
+Rows are rendered straight from a projected Mongo cursor into small text
+chunks, so memory stays flat no matter how many documents are exported:
+nothing holds the full result set, the rendered file, or a copy of it.
+
+  csv_chunks / jsonl_chunks   cursor -> encoded chunks of ~EXPORT_CHUNK_BYTES
+  gzip_chunks                 optional gzip wrapper over any chunk stream
+"""
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+# Columns of the original CSV export
+EXPORT_COLUMNS = ['title', 'department', 'type', 'status', 'date', 'language']
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '500'))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return str(value)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (list, tuple)):
+        return '; '.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=_json_default)
+    return value
+
+
+def csv_chunks(rows, columns):
+    """Header plus one CSV line per row, yielded as UTF-8 chunks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_value(row.get(column)) for column in columns])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def jsonl_chunks(rows, columns):
+    """One JSON object per line with `_id` plus the selected columns."""
+    parts, size = [], 0
+    for row in rows:
+        record = {'_id': str(row.get('_id'))}
+        record.update({column: row.get(column) for column in columns})
+        line = json.dumps(record, default=_json_default, ensure_ascii=False) + '\n'
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield ''.join(parts).encode('utf-8')
+            parts, size = [], 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip-compress a chunk stream incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def batched(cursor, batch_size=EXPORT_BATCH_SIZE, prepare=None):
+    """Iterate a cursor, optionally passing each batch through `prepare` (e.g. to attach content)."""
+    batch = []
+    for row in cursor:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield from (prepare(batch) if prepare else batch)
+            batch = []
+    if batch:
+        yield from (prepare(batch) if prepare else batch)
+
+
+def export_stream(rows, export_format, columns, compress=False):
+    chunks = csv_chunks(rows, columns) if export_format == 'csv' else jsonl_chunks(rows, columns)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,70 @@
+"""
+Search results page and facet counts from one aggregation.
+
+Advanced search returns a page of matches together with per-department,
+type, status and tag counts over *all* matches. A single `$match` + `$facet`
+pipeline produces both, so the UI does not need follow-up count queries:
+
+  results   rows after the cursor, newest first, limit + 1 (to detect more)
+  total     number of matches
+  <field>   [{value, count}] per facet field, largest first
+"""
+from utils.pagination import KEYSET_SORT, encode_cursor, keyset_filter
+
+FACET_FIELDS = ['department', 'type', 'status']
+TAG_FACET_LIMIT = 20
+
+
+def _count_by(field):
+    return [
+        {'$group': {'_id': f'${field}', 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1, '_id': 1}}
+    ]
+
+
+def search_facet_pipeline(query_filter, cursor=None, limit=20, projection=None, include_results=True):
+    """Pipeline for one page (after `cursor`) plus facet counts over every match."""
+    facets = {
+        'total': [{'$count': 'count'}],
+        'tags': [
+            {'$project': {'_id': 0, 'tags': {'$setUnion': [{'$ifNull': ['$tags', []]}, []]}}},
+            {'$unwind': '$tags'},
+            *_count_by('tags'),
+            {'$limit': TAG_FACET_LIMIT}
+        ]
+    }
+    for field in FACET_FIELDS:
+        facets[field] = _count_by(field)
+
+    if include_results:
+        results = []
+        if cursor:
+            results.append({'$match': keyset_filter({}, cursor)})
+        results += [{'$sort': dict(KEYSET_SORT)}, {'$limit': limit + 1}]
+        if projection:
+            results.append({'$project': projection})
+        facets['results'] = results
+
+    return [{'$match': query_filter}, {'$facet': facets}]
+
+
+def run_search_facets(collection, query_filter, cursor=None, limit=20, projection=None, include_results=True):
+    """
+    Execute the pipeline and reshape it:
+    (rows, next cursor, total, {field: [{value, count}]})
+    """
+    pipeline = search_facet_pipeline(query_filter, cursor, limit, projection, include_results)
+    result = next(collection.aggregate(pipeline), {})
+
+    rows = result.get('results', [])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+
+    total_rows = result.get('total') or []
+    facets = {
+        field: [{'value': row['_id'], 'count': row['count']} for row in result.get(field, [])]
+        for field in FACET_FIELDS + ['tags']
+    }
+    return rows, next_cursor, total_rows[0]['count'] if total_rows else 0, facets
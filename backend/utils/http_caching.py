@@ -0,0 +1,110 @@
+"""
+Conditional requests and compression for JSON API responses.
+
+Polling clients revalidate instead of re-downloading:
+
+  collection views   weak ETag from the response cache generation, the TTL
+                     window and the request path (ResponseCache.cached), so a
+                     matching If-None-Match gets a 304 before the view runs
+  document detail    weak ETag `<_id>-v<version>`; `version` is $inc'd by
+                     every update, star and bulk status change
+
+Tags are weak because the body is compressed per request: the same entity
+may go out as identity, gzip or brotli bytes.
+
+`compress_response` runs after every request and compresses JSON and text
+bodies of at least COMPRESS_MIN_BYTES with the best encoding the client
+accepts (brotli when the `brotli` package is installed, else gzip).
+Streamed responses (exports, NDJSON, files) are left alone. Responses
+replayed from the response cache carry a dict of already-encoded bodies so a
+hit is not compressed again.
+"""
+import gzip
+import os
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+REVALIDATE = 'no-cache'
+
+
+def document_etag(doc):
+    return f"{doc['_id']}-v{doc.get('version', 0)}"
+
+
+def client_has(etag):
+    """True when If-None-Match already names this (weak) tag."""
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag, cache_control=REVALIDATE, response_class=Response):
+    response = response_class(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def tag_response(response, etag, cache_control=REVALIDATE):
+    response.set_etag(etag, weak=True)
+    if 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def negotiate_encoding(accepted=None):
+    """'br', 'gzip' or None, by the client's Accept-Encoding qualities (the current request's by default)."""
+    accepted = request.accept_encodings if accepted is None else accepted
+    choices = [('br', accepted.quality('br') if brotli is not None else 0), ('gzip', accepted.quality('gzip'))]
+    encoding, quality = max(choices, key=lambda choice: choice[1])
+    return encoding if quality > 0 else None
+
+
+def encode_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compressible(response):
+    return (response.status_code == 200 and 'Content-Encoding' not in response.headers
+            and (response.mimetype or '').startswith(COMPRESSIBLE_TYPES))
+
+
+def compress_response(response):
+    """after_request hook: compress eligible bodies for clients that accept it."""
+    if not compressible(response) or response.direct_passthrough or response.is_streamed:
+        return response
+    return apply_compression(response, response.get_data(), request.accept_encodings)
+
+
+def apply_compression(response, body, accepted):
+    """Replace `response`'s body (`body`) with its best accepted encoding; shared with the ASGI app."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(accepted)
+    if encoding is None:
+        return response
+
+    variants = getattr(response, 'encoded_variants', None)
+    encoded = variants.get(encoding) if variants is not None else None
+    if encoded is None:
+        encoded = encode_body(body, encoding)
+        if variants is not None:
+            variants[encoding] = encoded
+
+    response.set_data(encoded)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # A strong tag names exact bytes; the encoded body is only equivalent
+        response.set_etag(etag, weak=True)
+    return response
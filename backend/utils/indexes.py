@@ -0,0 +1,190 @@
+"""
+Every index the application relies on, declared in one place, and the
+one-time migration that applies them.
+
+INDEXES maps each collection to its IndexModels, one per query shape the
+routes run (the comments name the routes). When a query changes, change
+this list, bump INDEXES_VERSION, and check the plans with
+`python -m benchmarks.bench_query_plans`, which fails on a collection scan.
+
+`ensure_indexes` creates the content collection (zstd block compression when
+available) and any declared index whose key pattern is missing. Existing
+indexes are left alone, so it is idempotent. It then records INDEXES_VERSION
+in the `migrations` collection, so later calls cost a single find_one.
+
+Workers run it on a background thread (`start_index_builder`) that retries
+with backoff until Mongo answers. A slow or briefly unavailable database no
+longer blocks or fails startup; requests served before it finishes are
+simply unindexed. From a deploy step or by hand:
+
+    python -m utils.indexes           apply (no-op when this version is recorded)
+    python -m utils.indexes --check   list missing and undeclared indexes; exit 1 if any are missing
+    python -m utils.indexes --prune   also drop undeclared indexes (superseded ones from older versions)
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from pymongo import IndexModel
+
+from utils.blob_store import BLOB_COLLECTION
+from utils.content_store import CONTENT_COLLECTION, ensure_content_collection
+from utils.dashboard_stats import DASHBOARD_INDEX, DASHBOARD_INDEX_NAME
+from utils.pagination import DEPARTMENT_KEYSET_INDEX, KEYSET_INDEX
+from utils.text_search import TERMS_INDEX
+
+INDEXES_VERSION = 2
+MIGRATIONS_COLLECTION = 'migrations'
+INDEX_RETRY_MAX_SECONDS = int(os.getenv('INDEX_RETRY_MAX_SECONDS', '60'))
+
+# Filters combined with the listing sort (KEYSET_SORT), equality fields first
+STATUS_KEYSET_INDEX = [('status', 1), ('date', -1), ('_id', -1)]
+TYPE_KEYSET_INDEX = [('type', 1), ('date', -1), ('_id', -1)]
+DEPARTMENT_STATUS_KEYSET_INDEX = [('department', 1), ('status', 1), ('date', -1), ('_id', -1)]
+STARRED_INDEX = [('starred', 1), ('date', -1)]
+FILE_BLOB_INDEX = [('file_blob', 1)]
+
+INDEXES = {
+    'documents': [
+        # Listing, export, bundles and recent documents: newest first, keyset pages, date ranges
+        IndexModel(KEYSET_INDEX),
+        # ?department= listing and dashboard tag filters
+        IndexModel(DEPARTMENT_KEYSET_INDEX),
+        # Advanced search and export by department and status
+        IndexModel(DEPARTMENT_STATUS_KEYSET_INDEX),
+        # Advanced search, export and tag stats by status
+        IndexModel(STATUS_KEYSET_INDEX),
+        # ?type= listing and advanced search by type
+        IndexModel(TYPE_KEYSET_INDEX),
+        # Starred documents, newest first
+        IndexModel(STARRED_INDEX),
+        # Advanced search and export by tags ($in), multikey
+        IndexModel([('tags', 1)]),
+        # Documents by content hash: blob reference reconcile and lookups by original file
+        IndexModel(FILE_BLOB_INDEX),
+        # Dashboard $facet counts (hinted, covered)
+        IndexModel(DASHBOARD_INDEX, name=DASHBOARD_INDEX_NAME),
+    ],
+    'stats': [
+        # Top tags from the maintained counters
+        IndexModel([('kind', 1), ('count', -1)]),
+    ],
+    'rollups': [
+        # Ingest trends and processing efficiency over a date range
+        IndexModel([('granularity', 1), ('bucket', 1)]),
+    ],
+    BLOB_COLLECTION: [
+        # Sweeper: unreferenced blobs idle past the grace period, and interrupted deletes
+        IndexModel([('refs', 1), ('updated_at', 1)]),
+        IndexModel([('deleting', 1)], sparse=True),
+    ],
+    CONTENT_COLLECTION: [
+        # Search box (token index): terms, prefixes and phrases
+        IndexModel(TERMS_INDEX),
+    ],
+}
+
+
+def index_key(spec):
+    """Comparable key pattern of an IndexModel or an index_information() entry."""
+    key = spec.document['key'] if isinstance(spec, IndexModel) else spec['key']
+    items = key.items() if hasattr(key, 'items') else key
+    return tuple((field, direction if isinstance(direction, str) else int(direction)) for field, direction in items)
+
+
+def index_plan(db):
+    """{collection: (missing IndexModels, names of undeclared indexes)} against the live database."""
+    plan = {}
+    for name, models in INDEXES.items():
+        existing = db[name].index_information()
+        existing_keys = {index_key(info) for info in existing.values()}
+        declared_keys = {index_key(model) for model in models}
+        missing = [model for model in models if index_key(model) not in existing_keys]
+        undeclared = [index_name for index_name, info in existing.items()
+                      if index_name != '_id_' and index_key(info) not in declared_keys]
+        plan[name] = (missing, undeclared)
+    return plan
+
+
+def ensure_indexes(db, force=False):
+    """Create the content collection and any missing declared index unless this version is recorded; True when it ran."""
+    migrations = db[MIGRATIONS_COLLECTION]
+    if not force and migrations.find_one({'_id': 'indexes', 'version': INDEXES_VERSION}):
+        return False
+
+    ensure_content_collection(db)
+    for name, (missing, _) in index_plan(db).items():
+        if missing:
+            db[name].create_indexes(missing)
+
+    migrations.update_one(
+        {'_id': 'indexes'},
+        {'$set': {'version': INDEXES_VERSION, 'applied_at': datetime.now()}},
+        upsert=True
+    )
+    return True
+
+
+def prune_indexes(db):
+    """Drop indexes that are not declared in INDEXES (never _id_); returns the dropped names."""
+    dropped = []
+    for name, (_, undeclared) in index_plan(db).items():
+        for index_name in undeclared:
+            db[name].drop_index(index_name)
+            dropped.append(f"{name}.{index_name}")
+    return dropped
+
+
+def start_index_builder(db, max_delay=INDEX_RETRY_MAX_SECONDS):
+    """Run ensure_indexes on a daemon thread, retrying with exponential backoff until it succeeds."""
+
+    def run():
+        delay = 1
+        while True:
+            try:
+                if ensure_indexes(db):
+                    print(f"[INDEXES] Applied index version {INDEXES_VERSION}")
+                return
+            except Exception as e:
+                print(f"[INDEXES] Index setup failed, retrying in {delay}s: {str(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+    thread = threading.Thread(target=run, name='index-builder', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description='Create collections and indexes (one-time migration)')
+    parser.add_argument('--force', action='store_true', help='re-apply even if this version is recorded')
+    parser.add_argument('--check', action='store_true', help='only report missing and undeclared indexes')
+    parser.add_argument('--prune', action='store_true', help='drop indexes that are not declared')
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))[os.getenv('DB_NAME', 'kmrl_docintel')]
+    if args.check:
+        any_missing = False
+        for collection_name, (missing, undeclared) in index_plan(db).items():
+            for model in missing:
+                print(f"missing     {collection_name}.{model.document['name']}")
+            for index_name in undeclared:
+                print(f"undeclared  {collection_name}.{index_name}")
+            any_missing = any_missing or bool(missing)
+        sys.exit(1 if any_missing else 0)
+
+    if ensure_indexes(db, force=args.force or args.prune):
+        print(f"[INDEXES] Applied index version {INDEXES_VERSION}")
+    else:
+        print(f"[INDEXES] Index version {INDEXES_VERSION} already applied (use --force to re-apply)")
+    if args.prune:
+        for dropped in prune_indexes(db):
+            print(f"[INDEXES] Dropped {dropped}")
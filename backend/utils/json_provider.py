@@ -0,0 +1,143 @@
+"""
+Faster JSON responses.
+
+FastJSONProvider replaces Flask's default provider. It encodes with orjson
+when installed (stdlib json otherwise) and handles ObjectId, datetime, date,
+Decimal and UUID natively. Output matches the default provider: sorted keys,
+and datetimes as HTTP dates. Responses are built from bytes directly,
+without an intermediate str.
+
+EncodedDocumentCache keeps serialized documents as bytes, keyed by
+(_id, version, fields present). `version` is incremented by every write
+path, so an update simply produces a new key and the stale entry ages out of
+the LRU. Cached documents are returned as RawJSON and spliced into the
+response unchanged, so hot documents are not re-encoded on every listing.
+Documents without a `version` (never updated since it was introduced, or not
+projected) and ranked results (`_score` depends on the query) are encoded
+normally.
+"""
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson.objectid import ObjectId
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DOCUMENT_JSON_CACHE_MAX_BYTES = int(os.getenv('DOCUMENT_JSON_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+
+class RawJSON:
+    """Already-encoded JSON embedded as-is by FastJSONProvider."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumpb(obj):
+    """Encode `obj` to JSON bytes, splicing in any RawJSON values."""
+    raws = []
+    token = f"__raw_json_{uuid.uuid4().hex}_"
+
+    def default(value):
+        if isinstance(value, RawJSON):
+            raws.append(value.data)
+            return f"{token}{len(raws) - 1}"
+        return _default(value)
+
+    if orjson is not None:
+        data = orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+    else:
+        data = json.dumps(obj, default=default, sort_keys=True, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+    if raws:
+        data = re.sub(rb'"' + token.encode('ascii') + rb'(\d+)"', lambda match: raws[int(match.group(1))], data)
+    return data
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by `dumpb`."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Explicit options (indent etc.) keep the stdlib behaviour
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        return dumpb(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumpb(obj) + b'\n', mimetype=self.mimetype)
+
+
+class EncodedDocumentCache:
+    """LRU of encoded documents, bounded by total bytes (0 disables it)."""
+
+    def __init__(self, max_bytes=DOCUMENT_JSON_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, doc, serialize):
+        """`serialize(doc)` as RawJSON, reusing the bytes of an earlier call for the same version."""
+        if self.max_bytes <= 0 or 'version' not in doc or '_score' in doc:
+            return serialize(doc)
+        key = (doc['_id'], doc['version'], frozenset(doc))
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return RawJSON(data)
+            self.misses += 1
+
+        data = dumpb(serialize(doc))
+        if len(data) <= self.max_bytes // 8:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = data
+                    self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return RawJSON(data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None
+            }
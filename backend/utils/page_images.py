@@ -0,0 +1,206 @@
+"""
+Page images for PDFs and uploaded images, rendered once and served from disk.
+
+Viewing a scanned PDF used to mean downloading the whole original. Page
+images are rendered with PyMuPDF at a handful of fixed widths and kept in a
+disk cache:
+
+  <PAGE_CACHE_DIR>/<ab>/<source>/p<page>-w<width>.<webp|jpg>
+
+`source` is the document's blob key (or `doc-<id>` for legacy uploads), so a
+rendition never changes once written and can be served with a year-long
+immutable Cache-Control. Files are written to a temp name and renamed into
+place. Cache hits refresh the file's mtime; when the cache grows past
+PAGE_CACHE_MAX_BYTES the least recently used renditions are deleted until it
+is back under 90% of the budget.
+
+First-page thumbnails (THUMBNAIL_WIDTH) are rendered at ingest. PyMuPDF and
+Pillow are imported on first render, not when the app starts.
+"""
+import os
+import tempfile
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+
+PAGE_CACHE_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+# Requested widths are rounded up to one of these so the cache stays small
+PAGE_WIDTHS = [160, 320, 640, 1024, 1600]
+DEFAULT_PAGE_WIDTH = 1024
+THUMBNAIL_WIDTH = 320
+PAGE_IMAGE_FORMATS = {
+    'webp': ('image/webp', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('image/jpeg', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+PAGE_CACHE_MAX_AGE = 365 * 24 * 3600
+# Image originals Pillow can decode; others (SVG, HEIC, ...) have no page images
+RENDERABLE_IMAGE_TYPES = {
+    'image/jpeg', 'image/pjpeg', 'image/png', 'image/gif', 'image/bmp', 'image/x-ms-bmp', 'image/tiff', 'image/webp',
+}
+TOUCH_INTERVAL = 3600
+
+
+def page_source_kind(file_mime, file_name=''):
+    """'pdf', 'image' or None when the original cannot be rendered as pages."""
+    file_mime = (file_mime or '').lower()
+    file_name = (file_name or '').lower()
+    if file_mime == 'application/pdf' or file_name.endswith('.pdf'):
+        return 'pdf'
+    if file_mime in RENDERABLE_IMAGE_TYPES:
+        return 'image'
+    return None
+
+
+def snap_width(width):
+    """Smallest supported width >= `width` (the largest one beyond that)."""
+    for candidate in PAGE_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return PAGE_WIDTHS[-1]
+
+
+def negotiate_format(requested, accept_header):
+    """Explicit `format=` wins; otherwise WebP when the client accepts it."""
+    if requested:
+        requested = 'jpeg' if requested.lower() == 'jpg' else requested.lower()
+        if requested not in PAGE_IMAGE_FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(PAGE_IMAGE_FORMATS)}")
+        return requested
+    return 'webp' if 'image/webp' in (accept_header or '') else 'jpeg'
+
+
+def _encode(image, image_format, width):
+    from PIL import Image
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = BytesIO()
+    _, _, options = PAGE_IMAGE_FORMATS[image_format]
+    image.save(output, format=image_format.upper(), **options)
+    return output.getvalue()
+
+
+def render_page(source, kind, page_number, width, image_format):
+    """
+    Encoded image bytes for a 1-based page of `source` (a path or bytes).
+    Raises IndexError when the page does not exist.
+    """
+    from PIL import Image
+    if kind == 'image':
+        if page_number != 1:
+            raise IndexError('Images have a single page')
+        image = Image.open(source if not isinstance(source, bytes) else BytesIO(source))
+        image.load()
+        return _encode(image, image_format, width)
+
+    import fitz  # PyMuPDF
+    pdf = fitz.open(source) if not isinstance(source, bytes) else fitz.open(stream=source, filetype='pdf')
+    try:
+        if not 1 <= page_number <= pdf.page_count:
+            raise IndexError(f"Page {page_number} does not exist (document has {pdf.page_count})")
+        page = pdf[page_number - 1]
+        zoom = width / page.rect.width if page.rect.width else 1
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        image = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+        return _encode(image, image_format, width)
+    finally:
+        pdf.close()
+
+
+def page_count(source, kind):
+    if kind == 'image':
+        return 1
+    import fitz  # PyMuPDF
+    pdf = fitz.open(source) if not isinstance(source, bytes) else fitz.open(stream=source, filetype='pdf')
+    try:
+        return pdf.page_count
+    finally:
+        pdf.close()
+
+
+class PageImageCache:
+    """Size-bounded LRU of rendered page images on disk."""
+
+    def __init__(self, root, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, source_key, page_number, width, image_format):
+        extension = PAGE_IMAGE_FORMATS[image_format][1]
+        return self.root / source_key[:2] / source_key / f"p{page_number}-w{width}.{extension}"
+
+    def get(self, path):
+        """True when `path` is cached; refreshes its recency."""
+        try:
+            modified = path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if time.time() - modified > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def put(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        with os.fdopen(handle, 'wb') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict(keep=path)
+
+    def _entries(self):
+        for path in self.root.glob('*/*/*'):
+            if path.name.startswith('.tmp-'):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self, keep=None):
+        """Delete least recently used renditions down to 90% of the budget (never `keep`)."""
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._size = total
+
+    def stats(self):
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            return {'bytes': self._size, 'max_bytes': self.max_bytes}
+
+
+def cached_page(cache, source_key, load_source, kind, page_number, width, image_format):
+    """Path of the rendition, rendering it first on a miss (`load_source()` is only called then)."""
+    path = cache.path(source_key, page_number, width, image_format)
+    if not cache.get(path):
+        cache.put(path, render_page(load_source(), kind, page_number, width, image_format))
+    return path
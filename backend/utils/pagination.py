@@ -0,0 +1,163 @@
+"""
+Keyset (cursor) pagination for document listings.
+
+Listings are ordered newest first on (date, _id). Instead of `skip(n)`, which
+walks and discards n index entries on every deep page, each page returns an
+opaque `next` token holding the (date, _id) of its last row; the following page
+resumes strictly after it, so every page costs the same index seek on
+[('date', -1), ('_id', -1)] (or the department-prefixed variant).
+
+Search results ordered by relevance page through the ranked ids with an
+offset token instead (`ranked_page`).
+
+Totals are optional: `exact` runs count_documents, `estimate` answers from
+collection metadata or the materialized counters where possible and otherwise
+from a short-lived count cache, and `none` skips counting.
+"""
+import base64
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+KEYSET_SORT = [('date', -1), ('_id', -1)]
+KEYSET_INDEX = [('date', -1), ('_id', -1)]
+DEPARTMENT_KEYSET_INDEX = [('department', 1), ('date', -1), ('_id', -1)]
+MAX_PAGE_SIZE = 100
+TOTAL_MODES = ('exact', 'estimate', 'none')
+LISTING_COUNT_TTL = int(os.getenv('LISTING_COUNT_TTL', '300'))
+
+# Single-field filters whose totals the stats counters already hold
+COUNTER_FILTER_FIELDS = ('department', 'type', 'status', 'language')
+
+
+def _encode_token(payload):
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_token(token):
+    return json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+
+
+def encode_cursor(doc):
+    """Opaque token for the position just after `doc`."""
+    date = doc.get('date')
+    return _encode_token({'d': date.isoformat() if isinstance(date, datetime) else None, 'i': str(doc['_id'])})
+
+
+def decode_cursor(token):
+    """Return (date, ObjectId); raises ValueError for anything that is not one of our tokens."""
+    try:
+        payload = _decode_token(token)
+        date = datetime.fromisoformat(payload['d']) if payload['d'] else None
+        return date, ObjectId(payload['i'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def decode_offset_cursor(token):
+    try:
+        offset = int(_decode_token(token)['o'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if offset < 0:
+        raise ValueError('Invalid cursor')
+    return offset
+
+
+def keyset_filter(query_filter, cursor):
+    """`query_filter` restricted to rows after the cursor position in KEYSET_SORT order."""
+    if not cursor:
+        return query_filter
+    date, oid = decode_cursor(cursor)
+    if date is None:
+        # Undated rows sort last; only the _id tie-breaker remains
+        after = {'date': None, '_id': {'$lt': oid}}
+    else:
+        after = {'$or': [
+            {'date': {'$lt': date}},
+            {'date': date, '_id': {'$lt': oid}},
+            {'date': None}
+        ]}
+    return {'$and': [query_filter, after]} if query_filter else after
+
+
+def keyset_page(collection, query_filter, cursor, limit, projection=None):
+    """One page of documents plus the token for the next page (None on the last page)."""
+    rows = list(
+        collection.find(keyset_filter(query_filter, cursor), projection)
+        .sort(KEYSET_SORT)
+        .limit(limit + 1)
+    )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def ranked_page(collection, query_filter, ranked_ids, cursor, limit, projection=None):
+    """
+    One page of documents in a precomputed order (e.g. search relevance).
+    `query_filter` narrows the ranked ids; the cursor is an offset into what remains.
+    Returns (rows, next token, total).
+    """
+    allowed = {row['_id'] for row in collection.find(query_filter, {'_id': 1})}
+    ranked_ids = [doc_id for doc_id in ranked_ids if doc_id in allowed]
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    page_ids = ranked_ids[offset:offset + limit]
+    by_id = {row['_id']: row for row in collection.find({'_id': {'$in': page_ids}}, projection)}
+    rows = [by_id[doc_id] for doc_id in page_ids if doc_id in by_id]
+    next_offset = offset + limit
+    next_cursor = _encode_token({'o': next_offset}) if next_offset < len(ranked_ids) else None
+    return rows, next_cursor, len(ranked_ids)
+
+
+class CountCache:
+    """count_documents results per (generation, filter), kept for LISTING_COUNT_TTL seconds."""
+
+    def __init__(self, ttl=LISTING_COUNT_TTL, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def count(self, collection, query_filter, generation):
+        key = (generation, json.dumps(query_filter, sort_keys=True, default=str))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+
+        total = collection.count_documents(query_filter)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop the entry closest to expiry
+                self._entries.pop(min(self._entries, key=lambda k: self._entries[k][1]))
+            self._entries[key] = (total, now + self.ttl)
+        return total
+
+
+def page_total(collection, query_filter, mode, counts_loader=None, count_cache=None, generation=None):
+    """
+    Total matching documents for a listing: (total, is_estimate).
+    `counts_loader` returns the materialized dashboard counters when called.
+    """
+    if mode == 'none':
+        return None, False
+    if mode == 'exact':
+        return collection.count_documents(query_filter), False
+
+    if not query_filter:
+        return collection.estimated_document_count(), True
+    if counts_loader and len(query_filter) == 1:
+        field, value = next(iter(query_filter.items()))
+        if field in COUNTER_FILTER_FIELDS and isinstance(value, str):
+            return counts_loader()[field].get(value, 0), True
+    if count_cache is not None:
+        return count_cache.count(collection, query_filter, generation), False
+    return collection.count_documents(query_filter), False
@@ -0,0 +1,43 @@
+"""
+Field projections for document listings.
+
+List views only render title, summary and badges, but full documents carry the
+extracted `content`, tables, figures and charts (often MBs for OCR'd reports).
+Listing endpoints project LIST_FIELDS by default; `fields=` selects a sparse
+fieldset from DOCUMENT_FIELDS instead. Full detail comes from
+GET /api/documents/<id>.
+"""
+
+# Small fields shown on cards and rows; file_blob/file_path and page_count build file_url/thumbnail_url,
+# version keys the encoded-document cache
+LIST_FIELDS = [
+    'title', 'summary', 'tags', 'department', 'type', 'status', 'language',
+    'date', 'starred', 'source', 'file_name', 'file_mime', 'file_path', 'file_blob', 'file_size',
+    'page_count', 'version'
+]
+# Large fields only the detail view needs
+DETAIL_FIELDS = ['content', 'tables_data', 'figures_data', 'charts', 'processing', 'table_extraction']
+DOCUMENT_FIELDS = LIST_FIELDS + DETAIL_FIELDS
+
+LIST_PROJECTION = {field: 1 for field in LIST_FIELDS}
+
+
+def parse_fields(fields_arg):
+    """Projection for a `fields=` value (comma separated or a list); the list projection when empty."""
+    if not fields_arg:
+        return dict(LIST_PROJECTION)
+    if isinstance(fields_arg, str):
+        fields_arg = fields_arg.split(',')
+    fields = [field.strip() for field in fields_arg if field and field.strip()]
+    unknown = sorted(set(fields) - set(DOCUMENT_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return {field: 1 for field in fields} or dict(LIST_PROJECTION)
+
+
+def with_fields(projection, *fields):
+    """`projection` plus extra fields a route needs internally (e.g. for scoring)."""
+    extended = dict(projection)
+    for field in fields:
+        extended[field] = 1
+    return extended
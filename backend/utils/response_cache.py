@@ -0,0 +1,359 @@
+"""
+Response cache for read-heavy GET endpoints.
+
+Dashboard and listing endpoints are polled by every open tab but the data
+only changes on upload, update, star or delete. Responses are cached per
+route + normalized query string in an in-process LRU (and, when REDIS_URL is
+set and `redis` is installed, a shared tier so gunicorn workers and
+replicas reuse each other's work).
+
+Invalidation is generation based: every write path calls `invalidate()`,
+which `$inc`s a counter in the `stats` collection. The generation is part of
+every cache key, so a bump orphans all earlier entries at once (they age out
+of the LRU / expire in Redis). Other processes see a bump within
+CACHE_GENERATION_MEMO_SECONDS; entries also expire after RESPONSE_CACHE_TTL
+as a backstop for changes made outside the API (e.g. a counters reconcile).
+
+Concurrent misses for the same key are collapsed: one request renders the
+view, the others wait for its result.
+
+Every response carries a weak ETag built from the generation, the current
+TTL window and the request, so clients that poll with If-None-Match get a
+304 without a cache lookup or a render (see utils/http_caching.py).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import Response, current_app, request
+from pymongo import ReturnDocument
+
+from utils.http_caching import client_has, not_modified, tag_response
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '60'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '512'))
+CACHE_GENERATION_MEMO_SECONDS = float(os.getenv('CACHE_GENERATION_MEMO_SECONDS', '1'))
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+GENERATION_ID = 'generation'
+# Only these headers are replayed from the cache; CORS headers are added per request
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Cache-Control', 'Last-Modified')
+
+
+class Generation:
+    """Data generation stored in the stats collection, memoized briefly per process."""
+
+    def __init__(self, stats_collection, memo_seconds=CACHE_GENERATION_MEMO_SECONDS):
+        self.stats_collection = stats_collection
+        self.memo_seconds = memo_seconds
+        self._lock = threading.Lock()
+        self._value = None
+        self._read_at = 0.0
+
+    def current(self):
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._read_at < self.memo_seconds:
+                return self._value
+        doc = self.stats_collection.find_one({'_id': GENERATION_ID}, {'value': 1})
+        return self._remember(doc.get('value', 0) if doc else 0)
+
+    def bump(self):
+        doc = self.stats_collection.find_one_and_update(
+            {'_id': GENERATION_ID},
+            {'$inc': {'value': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return self._remember(doc['value'])
+
+    def _remember(self, value):
+        with self._lock:
+            self._value = value
+            self._read_at = time.monotonic()
+        return value
+
+
+class CachedResponse:
+    """The parts of a rendered response needed to replay it."""
+
+    __slots__ = ('body', 'status', 'headers', 'expires_at', 'variants')
+
+    def __init__(self, body, status, headers, expires_at):
+        self.body = body
+        self.status = status
+        self.headers = headers
+        self.expires_at = expires_at
+        # Compressed bodies by Content-Encoding, filled in by compress_response
+        self.variants = {}
+
+    @property
+    def cacheable(self):
+        return self.status == 200
+
+    def to_response(self):
+        response = Response(self.body, status=self.status, headers=self.headers)
+        response.encoded_variants = self.variants
+        return response
+
+    def dumps(self):
+        meta = json.dumps({'status': self.status, 'headers': self.headers, 'expires_at': self.expires_at})
+        return meta.encode('utf-8') + b'\n' + self.body
+
+    @classmethod
+    def loads(cls, blob):
+        meta, body = blob.split(b'\n', 1)
+        meta = json.loads(meta)
+        return cls(body, meta['status'], [tuple(header) for header in meta['headers']], meta['expires_at'])
+
+
+class LRUCache:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution."""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Return (result, shared); `shared` is True when another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class ResponseCache:
+    def __init__(self, stats_collection, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                 redis_url=REDIS_URL):
+        self.ttl = ttl
+        self.generation = Generation(stats_collection)
+        self.local = LRUCache(max_entries)
+        self.flight = SingleFlight()
+        self.shared = None
+        if redis_url:
+            if redis is None:
+                print("[CACHE] REDIS_URL is set but the redis package is not installed; using the local cache only")
+            else:
+                self.shared = redis.Redis.from_url(redis_url)
+
+        self._stats_lock = threading.Lock()
+        self._outcomes = {outcome: {'count': 0, 'seconds': 0.0}
+                          for outcome in ('not_modified', 'local_hit', 'shared_hit', 'collapsed', 'miss',
+                                          'uncacheable')}
+
+    # --- keys and tiers ---
+
+    @staticmethod
+    def _request_digest():
+        args = sorted(request.args.items(multi=True))
+        raw = f"{request.path}?{urlencode(args)}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _key(self, generation, digest):
+        return f"resp:{generation}:{digest}"
+
+    @staticmethod
+    def _etag(generation, digest, ttl):
+        # The TTL window changes the tag too, matching the expiry backstop for out-of-band changes
+        window = int(time.time() // ttl) if ttl > 0 else 0
+        return f"g{generation}-{window}-{digest[:16]}"
+
+    def _shared_get(self, key):
+        try:
+            blob = self.shared.get(key)
+            return CachedResponse.loads(blob) if blob else None
+        except Exception as e:
+            print(f"[CACHE] Shared tier read failed: {str(e)}")
+            return None
+
+    def _shared_set(self, key, entry, ttl):
+        try:
+            self.shared.setex(key, ttl, entry.dumps())
+        except Exception as e:
+            print(f"[CACHE] Shared tier write failed: {str(e)}")
+
+    def _render(self, view, args, kwargs, ttl):
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.is_streamed:
+            return response
+        headers = [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers]
+        return CachedResponse(response.get_data(), response.status_code, headers, time.time() + ttl)
+
+    def _record(self, outcome, started):
+        with self._stats_lock:
+            self._outcomes[outcome]['count'] += 1
+            self._outcomes[outcome]['seconds'] += time.perf_counter() - started
+
+    # --- public API ---
+
+    def cached(self, ttl=None):
+        """
+        Decorator for GET views. Only 200 responses are stored; a request whose
+        If-None-Match names the current weak ETag is answered with 304 first.
+        """
+        ttl = self.ttl if ttl is None else ttl
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                started = time.perf_counter()
+                generation = self.generation.current()
+                digest = self._request_digest()
+                etag = self._etag(generation, digest, ttl)
+                if client_has(etag):
+                    self._record('not_modified', started)
+                    return not_modified(etag)
+
+                if ttl <= 0:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code == 200 and not response.is_streamed:
+                        tag_response(response, etag)
+                    return response
+
+                key = self._key(generation, digest)
+                entry = self.local.get(key)
+                outcome = 'local_hit'
+                if entry is None and self.shared is not None:
+                    entry = self._shared_get(key)
+                    outcome = 'shared_hit'
+                    if entry is not None:
+                        self.local.set(key, entry)
+
+                if entry is None:
+                    def render():
+                        rendered = self._render(view, args, kwargs, ttl)
+                        if isinstance(rendered, CachedResponse) and rendered.cacheable:
+                            self.local.set(key, rendered)
+                            if self.shared is not None:
+                                self._shared_set(key, rendered, ttl)
+                        return rendered
+
+                    entry, shared = self.flight.do(key, render)
+                    outcome = 'collapsed' if shared else 'miss'
+                    if isinstance(entry, Response):
+                        # Streamed responses cannot be replayed or shared
+                        if shared:
+                            entry = self._render(view, args, kwargs, ttl)
+                        else:
+                            self._record('uncacheable', started)
+                            return entry
+                    if not entry.cacheable:
+                        outcome = 'uncacheable'
+                        if shared:
+                            # Errors are not shared; let this request try for itself
+                            entry = self._render(view, args, kwargs, ttl)
+                            if isinstance(entry, Response):
+                                self._record(outcome, started)
+                                return entry
+
+                response = entry.to_response()
+                response.headers['X-Cache'] = 'HIT' if outcome.endswith('hit') or outcome == 'collapsed' else 'MISS'
+                if entry.cacheable:
+                    tag_response(response, etag)
+                self._record(outcome, started)
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self):
+        """Called by write paths: start a new generation so every cached response is stale."""
+        try:
+            return self.generation.bump()
+        except Exception as e:
+            # Entries still expire after the TTL
+            print(f"[CACHE] Failed to bump cache generation: {str(e)}")
+            return None
+
+    def stats(self):
+        with self._stats_lock:
+            outcomes = {name: dict(data) for name, data in self._outcomes.items()}
+        hits = sum(outcomes[name]['count'] for name in ('not_modified', 'local_hit', 'shared_hit', 'collapsed'))
+        lookups = hits + outcomes['miss']['count'] + outcomes['uncacheable']['count']
+        return {
+            'generation': self.generation.current(),
+            'ttl_seconds': self.ttl,
+            'entries': len(self.local),
+            'max_entries': self.local.max_entries,
+            'shared_tier': self.shared is not None,
+            'requests': lookups,
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+            'outcomes': {
+                name: {
+                    'count': data['count'],
+                    'avg_ms': round(data['seconds'] / data['count'] * 1000, 3) if data['count'] else None
+                }
+                for name, data in outcomes.items()
+            }
+        }
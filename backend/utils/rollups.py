@@ -0,0 +1,261 @@
+"""
+Pre-bucketed time rollups written at ingest.
+
+Every upload increments one hourly and one daily document in the `rollups`
+collection:
+
+  {_id: 'day:2026-10-19', granularity: 'day', bucket: datetime, count,
+   auto_processed, department: {..}, type: {..},
+   stages: {stage: {count, sum, buckets: {'le_<ms>': n, 'le_inf': n}}}}
+
+Trend and processing-efficiency queries then read one row per bucket (at
+most a few hundred for a year of daily data) instead of scanning documents.
+Rollups describe ingest activity, so deleting a document does not change them.
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from utils.counters import decode_key, encode_key
+
+# Histogram upper bounds in milliseconds; anything slower lands in le_inf
+HISTOGRAM_BOUNDS_MS = [100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000]
+GRANULARITY_FORMATS = {'hour': '%Y-%m-%dT%H', 'day': '%Y-%m-%d'}
+MAX_HOURLY_RANGE = timedelta(days=31)
+
+
+@contextmanager
+def stage_timer(timings, stage):
+    """Record the wall time of a block (in seconds) under timings[stage]."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - started)
+
+
+def bucket_start(when, granularity):
+    if granularity == 'hour':
+        return when.replace(minute=0, second=0, microsecond=0)
+    return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _histogram_key(seconds):
+    millis = seconds * 1000
+    for bound in HISTOGRAM_BOUNDS_MS:
+        if millis <= bound:
+            return f"le_{bound}"
+    return "le_inf"
+
+
+def rollup_increments(doc, timings, auto_processed):
+    """The `$inc` document one ingest contributes to each of its buckets."""
+    inc = {
+        'count': 1,
+        'auto_processed': 1 if auto_processed else 0,
+        f"department.{encode_key(doc.get('department'))}": 1,
+        f"type.{encode_key(doc.get('type'))}": 1,
+    }
+    for stage, seconds in timings.items():
+        inc[f"stages.{stage}.count"] = 1
+        inc[f"stages.{stage}.sum"] = seconds
+        inc[f"stages.{stage}.buckets.{_histogram_key(seconds)}"] = 1
+    return inc
+
+
+def ingest_operations(doc, timings, auto_processed):
+    """UpdateOne operations adding one ingest to its hourly and daily rollups."""
+    when = doc.get('date') or datetime.now()
+    inc = rollup_increments(doc, timings, auto_processed)
+    operations = []
+    for granularity, fmt in GRANULARITY_FORMATS.items():
+        start = bucket_start(when, granularity)
+        operations.append(UpdateOne(
+            {'_id': f"{granularity}:{start.strftime(fmt)}"},
+            {'$inc': inc, '$set': {'granularity': granularity, 'bucket': start}},
+            upsert=True
+        ))
+    return operations
+
+
+def record_ingest(rollups_collection, doc, timings, auto_processed):
+    """Add one ingest to its hourly and daily rollups (single round trip)."""
+    record_ingests(rollups_collection, [(doc, timings, auto_processed)])
+
+
+def record_ingests(rollups_collection, ingests):
+    """Add many (doc, timings, auto_processed) ingests to their rollups with a single bulk write."""
+    try:
+        operations = [operation for ingest in ingests for operation in ingest_operations(*ingest)]
+        if operations:
+            rollups_collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"[ROLLUPS] Failed to record ingest rollup: {str(e)}")
+
+
+def parse_range(args, default_days=30):
+    """
+    Read `from`/`to` (YYYY-MM-DD) or `days` from request args.
+    Returns (start, end) with end exclusive.
+    """
+    end = datetime.now()
+    if args.get('to'):
+        end = datetime.strptime(args['to'], '%Y-%m-%d') + timedelta(days=1)
+    if args.get('from'):
+        start = datetime.strptime(args['from'], '%Y-%m-%d')
+    else:
+        start = bucket_start(end, 'day') - timedelta(days=int(args.get('days', default_days)) - 1)
+    return start, end
+
+
+def load_rollups(rollups_collection, granularity, start, end):
+    """Rollup rows for [start, end) in bucket order (served by the granularity/bucket index)."""
+    return list(rollups_collection.find({
+        'granularity': granularity,
+        'bucket': {'$gte': bucket_start(start, granularity), '$lt': end}
+    }).sort('bucket', 1))
+
+
+def _bucket_sequence(start, end, granularity):
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+    current = bucket_start(start, granularity)
+    while current < end:
+        yield current
+        current += step
+
+
+def upload_trends(rollups_collection, granularity, start, end):
+    """Upload counts per bucket with empty buckets filled in; 'month' is folded from daily rows."""
+    if granularity == 'hour' and end - start > MAX_HOURLY_RANGE:
+        raise ValueError('hourly trends are limited to 31 days; use granularity=day')
+
+    source = 'hour' if granularity == 'hour' else 'day'
+    counts = {row['bucket']: row.get('count', 0) for row in load_rollups(rollups_collection, source, start, end)}
+    series = [(bucket, counts.get(bucket, 0)) for bucket in _bucket_sequence(start, end, source)]
+
+    if granularity == 'month':
+        months = {}
+        for bucket, count in series:
+            key = bucket.strftime('%Y-%m')
+            months[key] = months.get(key, 0) + count
+        labels, values = list(months), list(months.values())
+    else:
+        fmt = '%Y-%m-%d %H:00' if granularity == 'hour' else '%Y-%m-%d'
+        labels = [bucket.strftime(fmt) for bucket, _ in series]
+        values = [count for _, count in series]
+
+    return {'granularity': granularity, 'labels': labels, 'values': values, 'total': sum(values)}
+
+
+def distribution(rollups_collection, field, start, end):
+    """Ingest counts per department/type over a date range, largest first."""
+    totals = {}
+    for row in load_rollups(rollups_collection, 'day', start, end):
+        for key, count in (row.get(field) or {}).items():
+            label = decode_key(key)
+            totals[label] = totals.get(label, 0) + count
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return {'labels': [label for label, _ in ranked], 'values': [count for _, count in ranked]}
+
+
+def summarize_histogram(stage):
+    """Count, mean and approximate p50/p95 (bucket upper bounds) for a stage histogram."""
+    count = stage.get('count', 0)
+    if not count:
+        return {'count': 0, 'avg_seconds': None, 'p50_seconds': None, 'p95_seconds': None}
+
+    buckets = stage.get('buckets', {})
+    bounds = [(f"le_{bound}", bound / 1000) for bound in HISTOGRAM_BOUNDS_MS] + [('le_inf', None)]
+
+    def quantile(q):
+        target = q * count
+        seen = 0
+        for key, upper in bounds:
+            seen += buckets.get(key, 0)
+            if seen >= target:
+                return upper
+        return None
+
+    return {
+        'count': count,
+        'avg_seconds': round(stage.get('sum', 0) / count, 3),
+        'p50_seconds': quantile(0.5),
+        'p95_seconds': quantile(0.95)
+    }
+
+
+def _merge_stages(rows):
+    merged = {}
+    for row in rows:
+        for stage, data in (row.get('stages') or {}).items():
+            target = merged.setdefault(stage, {'count': 0, 'sum': 0.0, 'buckets': {}})
+            target['count'] += data.get('count', 0)
+            target['sum'] += data.get('sum', 0.0)
+            for key, n in (data.get('buckets') or {}).items():
+                target['buckets'][key] = target['buckets'].get(key, 0) + n
+    return merged
+
+
+def _totals(rows):
+    count = sum(row.get('count', 0) for row in rows)
+    auto = sum(row.get('auto_processed', 0) for row in rows)
+    stages = _merge_stages(rows)
+    total_stage = stages.get('total', {})
+    avg_seconds = total_stage['sum'] / total_stage['count'] if total_stage.get('count') else None
+    auto_rate = round(auto / count * 100, 1) if count else None
+    return count, auto_rate, avg_seconds, stages
+
+
+def summarize_range(rollups_collection, start, end):
+    """Document count, auto-processed rate and mean end-to-end seconds for a range."""
+    count, auto_rate, avg_seconds, _ = _totals(load_rollups(rollups_collection, 'day', start, end))
+    return {
+        'documents_processed': count,
+        'auto_processed_rate': auto_rate,
+        'avg_processing_seconds': round(avg_seconds, 3) if avg_seconds is not None else None
+    }
+
+
+def _trend(current, previous, unit, lower_is_better=False):
+    if current is None or previous is None:
+        return None
+    delta = current - previous
+    if abs(delta) < 1e-9:
+        return "→ no change vs previous period"
+    arrow = '↗' if delta > 0 else '↘'
+    if unit == 's':
+        word = ('slower' if delta > 0 else 'faster') if lower_is_better else ('higher' if delta > 0 else 'lower')
+        return f"{arrow} {abs(delta):.1f}s {word}"
+    return f"{arrow} {abs(delta):.1f}{unit} vs previous period"
+
+
+def processing_efficiency(rollups_collection, start, end):
+    """Processing-time series, stage latency summaries and auto-processed rate for a range."""
+    rows = load_rollups(rollups_collection, 'day', start, end)
+    by_bucket = {row['bucket']: row for row in rows}
+
+    labels, values = [], []
+    for bucket in _bucket_sequence(start, end, 'day'):
+        total_stage = ((by_bucket.get(bucket) or {}).get('stages') or {}).get('total') or {}
+        labels.append(bucket.strftime('%Y-%m-%d'))
+        values.append(round(total_stage['sum'] / total_stage['count'], 3) if total_stage.get('count') else 0)
+
+    count, auto_rate, avg_seconds, stages = _totals(rows)
+
+    # Same-length window immediately before the requested range, for trend labels
+    previous_rows = load_rollups(rollups_collection, 'day', start - (end - start), start)
+    _, previous_auto_rate, previous_avg, _ = _totals(previous_rows)
+
+    return {
+        'documents_processed': count,
+        'processingTime': {'labels': labels, 'values': values},
+        'avgProcessingTime': f"{avg_seconds:.1f}s" if avg_seconds is not None else None,
+        'avg_processing_seconds': round(avg_seconds, 3) if avg_seconds is not None else None,
+        'processingTimeTrend': _trend(avg_seconds, previous_avg, 's', lower_is_better=True),
+        'autoProcessedRate': f"{auto_rate}%" if auto_rate is not None else None,
+        'auto_processed_rate': auto_rate,
+        'autoProcessedTrend': _trend(auto_rate, previous_auto_rate, '%'),
+        'stages': {stage: summarize_histogram(data) for stage, data in stages.items()}
+    }
@@ -0,0 +1,185 @@
+"""
+Local table detection for text-layer PDFs.
+
+Uses PyMuPDF's table finder so that tables on digital PDFs no longer need a
+Gemini round trip. Pages without a usable text layer (scans) or pages that look
+tabular but where no table could be recovered are reported back as `ai_pages`
+so only those are left for Gemini.
+"""
+import re
+import time
+
+# A page with fewer extracted characters than this is treated as scanned
+MIN_TEXT_CHARS = 30
+# Maximum vertical gap (in points) between a table and the text block used as its caption
+CAPTION_MAX_GAP = 40
+NUMERIC_TOKEN = re.compile(r'[-+(]?[₹$€£]?\d[\d,]*(?:\.\d+)?%?\)?')
+
+
+def _clean_cell(cell):
+    """Normalize a raw table cell into a single-line string."""
+    if cell is None:
+        return ""
+    return " ".join(str(cell).split())
+
+
+def _clean_rows(rows):
+    """Drop empty rows/columns and make every row the same width."""
+    rows = [[_clean_cell(cell) for cell in row] for row in rows or []]
+    rows = [row for row in rows if any(row)]
+    if not rows:
+        return []
+
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    keep = [col for col in range(width) if any(row[col] for row in rows)]
+    return [[row[col] for col in keep] for row in rows]
+
+
+def _looks_tabular(text):
+    """Heuristic: several lines carrying two or more numeric tokens suggest a table."""
+    numeric_lines = 0
+    for line in text.splitlines():
+        if len(NUMERIC_TOKEN.findall(line)) >= 2:
+            numeric_lines += 1
+            if numeric_lines >= 3:
+                return True
+    return False
+
+
+def _find_caption(blocks, bbox):
+    """Return the text block sitting just above the table, preferring 'Table ...' lines."""
+    best = None
+    best_gap = None
+    for block in blocks:
+        x0, y0, x1, y1, block_text = block[:5]
+        gap = bbox.y0 - y1
+        if gap < 0 or gap > CAPTION_MAX_GAP:
+            continue
+        if x1 < bbox.x0 or x0 > bbox.x1:
+            continue
+        caption = " ".join(block_text.split())
+        if not caption:
+            continue
+        if caption.lower().startswith('table'):
+            return caption
+        if best_gap is None or gap < best_gap:
+            best, best_gap = caption, gap
+    return best
+
+
+def _table_rows(table):
+    """Extract rows from a PyMuPDF table, prepending a header that sits outside the bbox."""
+    rows = table.extract()
+    header = getattr(table, 'header', None)
+    if header is not None and getattr(header, 'external', False) and header.names:
+        rows = [list(header.names)] + rows
+    return _clean_rows(rows)
+
+
+def _find_page_tables(page, strategy=None):
+    """Run the table finder with the given strategy and keep tables with at least 2x2 cells."""
+    kwargs = {'strategy': strategy} if strategy else {}
+    try:
+        finder = page.find_tables(**kwargs)
+    except Exception as e:
+        print(f"[TABLES] Table finder failed on page {page.number + 1}: {str(e)}")
+        return []
+
+    found = []
+    for table in finder.tables:
+        rows = _table_rows(table)
+        if len(rows) >= 2 and len(rows[0]) >= 2:
+            found.append((table, rows))
+    return found
+
+
+def extract_pdf_tables(pdf_bytes):
+    """
+    Detect tables on every page of a PDF.
+
+    Returns a dict with:
+      - tables: list of {caption, data, page_number} (same shape Gemini returns)
+      - pages: per-page {page_number, seconds, tables, status} where status is
+        'local' (text layer handled locally), 'scanned' or 'ambiguous'
+      - ai_pages: 1-indexed page numbers that still need Gemini
+      - seconds: total wall time spent on table detection
+    """
+    import fitz  # PyMuPDF, imported on first use to keep it out of app startup
+
+    started = time.perf_counter()
+    tables = []
+    pages = []
+    ai_pages = []
+
+    pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        for page in pdf_document:
+            page_started = time.perf_counter()
+            page_number = page.number + 1
+            page_text = page.get_text("text")
+
+            if len(page_text.strip()) < MIN_TEXT_CHARS:
+                status = 'scanned'
+                found = []
+            else:
+                found = _find_page_tables(page)
+                if not found and _looks_tabular(page_text):
+                    # No ruling lines; fall back to whitespace alignment
+                    found = _find_page_tables(page, strategy='text')
+                    status = 'local' if found else 'ambiguous'
+                else:
+                    status = 'local'
+
+            if found:
+                blocks = page.get_text("blocks")
+                for table, rows in found:
+                    caption = _find_caption(blocks, fitz.Rect(table.bbox))
+                    tables.append({
+                        "caption": caption or f"Table {len(tables) + 1} (page {page_number})",
+                        "data": rows,
+                        "page_number": page_number
+                    })
+
+            if status != 'local':
+                ai_pages.append(page_number)
+
+            pages.append({
+                "page_number": page_number,
+                "seconds": round(time.perf_counter() - page_started, 4),
+                "tables": len(found),
+                "status": status
+            })
+    finally:
+        pdf_document.close()
+
+    return {
+        "engine": "pymupdf",
+        "tables": tables,
+        "pages": pages,
+        "ai_pages": ai_pages,
+        "seconds": round(time.perf_counter() - started, 4)
+    }
+
+
+def merge_tables(table_scan, ai_tables):
+    """
+    Combine locally detected tables with Gemini's output.
+
+    Gemini tables are only kept for pages the local pass could not handle
+    (scanned or ambiguous). Gemini tables without a page number are kept
+    whenever any page was left to Gemini.
+    """
+    if table_scan is None:
+        return ai_tables or []
+
+    ai_pages = set(table_scan['ai_pages'])
+    merged = list(table_scan['tables'])
+    if ai_pages:
+        for table in ai_tables or []:
+            page_number = table.get('page_number')
+            if page_number is None or page_number in ai_pages:
+                merged.append(table)
+
+    merged.sort(key=lambda t: t.get('page_number') or 0)
+    return merged
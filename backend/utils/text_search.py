@@ -0,0 +1,304 @@
+"""
+Token index for the search box.
+
+Each `document_contents` row carries the normalized tokens of its document's
+title, summary, tags and extracted text:
+
+  {terms: ['brake', 'inspection', ...],       # multikey index
+   weights: {'brake': 7.61, ...}}             # field-weighted term scores
+
+Queries are tokenized the same way and matched through the `terms` index, so
+the input is never used as a pattern:
+
+  brake inspection     every term must appear
+  "brake pad"          phrase: tokens via the index, then an adjacency check on the candidates
+  insp*                prefix: anchored, escaped regex on `terms` (an index range scan)
+
+Tokens are runs of letters, digits and combining marks (NFC-normalized and
+casefolded), so Malayalam vowel signs, virama and the zero-width joiners of
+chillu forms stay inside their word. `\w` alone would split them apart.
+Rows record the TOKENIZER_VERSION they were built with.
+`python -m utils.text_search` rebuilds rows built with an older version.
+
+Results are ranked by sum(weight * idf) over the query terms. The matches
+become an `_id $in` filter on documents, so they are capped at
+SEARCH_MAX_RESULTS and `truncated` says when more were dropped: the best
+scoring ones for `sort=relevance`, otherwise the newest (by _id, which follows
+upload order) so date-ordered pages start complete. `regex_conditions`
+keeps the old substring behaviour (with the input escaped) as a fallback, and
+is also used for input that has no tokens, such as a single character. Its
+text matches are capped the same way.
+"""
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+
+from pymongo import UpdateOne
+
+from utils.content_store import content_match_ids
+
+SEARCH_MODES = ('index', 'regex')
+TERMS_INDEX = [('terms', 1)]
+FIELD_WEIGHTS = {'title': 5.0, 'tags': 3.0, 'summary': 2.0}
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 40
+MAX_TERMS_PER_DOCUMENT = int(os.getenv('SEARCH_MAX_TERMS_PER_DOCUMENT', '20000'))
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '5000'))
+# Prefix clauses match many index terms; each match scores a flat amount
+PREFIX_SCORE = 1.0
+# Bump when tokenize changes; rows built with another version are rebuilt by reindex_documents
+TOKENIZER_VERSION = 2
+
+# Characters \w does not match: separators, except combining marks and ZWNJ/ZWJ
+_NON_WORD = re.compile(r'[^\w\s]')
+_JOINERS = ('\u200c', '\u200d')
+_QUERY_PART = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        text = ' '.join(str(item) for item in text)
+    text = unicodedata.normalize('NFC', str(text)).casefold()
+    text = _NON_WORD.sub(_separator, text)
+    return [token for token in text.split()
+            if MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH]
+
+
+def _separator(match):
+    char = match.group()
+    if char in _JOINERS or unicodedata.category(char).startswith('M'):
+        return char
+    return ' '
+
+
+def document_terms(doc, text):
+    """(terms, weights) for a document's metadata and extracted text."""
+    weights = {}
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for token in set(tokenize(doc.get(field))):
+            weights[token] = weights.get(token, 0.0) + field_weight
+    for token, count in Counter(tokenize(text)).items():
+        weights[token] = weights.get(token, 0.0) + 1.0 + math.log(count)
+
+    if len(weights) > MAX_TERMS_PER_DOCUMENT:
+        # Very long documents: keep the most significant terms
+        kept = sorted(weights.items(), key=lambda item: item[1], reverse=True)[:MAX_TERMS_PER_DOCUMENT]
+        weights = dict(kept)
+    weights = {token: round(weight, 3) for token, weight in weights.items()}
+    return sorted(weights), weights
+
+
+def index_fields(doc, text):
+    """Fields to store on the document's content row."""
+    terms, weights = document_terms(doc, text)
+    return {'terms': terms, 'weights': weights, 'tokenizer': TOKENIZER_VERSION}
+
+
+def index_document(contents_collection, doc, text=None):
+    """
+    (Re)build the index entry for one document. Without `text`, uses the stored text,
+    or the document's inline `content` when it has not been migrated yet.
+    """
+    if text is None:
+        row = contents_collection.find_one({'_id': doc['_id']}, {'content': 1}) or {}
+        text = (row['content'] if 'content' in row else doc.get('content')) or ''
+    contents_collection.update_one({'_id': doc['_id']}, {'$set': index_fields(doc, text)}, upsert=True)
+
+
+def parse_query(query):
+    """
+    Split search box input into clauses:
+    ('term', token), ('prefix', token) or ('phrase', tokens).
+    """
+    clauses = []
+    for quoted, word in _QUERY_PART.findall(query or ''):
+        literal = (quoted if quoted else word).strip()
+        is_prefix = not quoted and literal.endswith('*')
+        tokens = tokenize(literal)
+        if not tokens:
+            continue
+        if len(tokens) > 1:
+            # Quoted text or a hyphenated/punctuated word: the tokens must be adjacent
+            clauses.append(('phrase', tokens))
+        elif is_prefix:
+            clauses.append(('prefix', tokens[0]))
+        else:
+            clauses.append(('term', tokens[0]))
+    return clauses
+
+
+def _clause_filter(clause):
+    if clause[0] == 'term':
+        return {'terms': clause[1]}
+    if clause[0] == 'prefix':
+        return {'terms': {'$regex': '^' + re.escape(clause[1])}}
+    return {'terms': {'$all': clause[1]}}
+
+
+def literal_pattern(text):
+    """Escaped, whitespace-tolerant regex for a literal phrase (no user-controlled syntax)."""
+    return r'\s+'.join(re.escape(part) for part in text.split())
+
+
+def phrase_pattern(tokens):
+    """Adjacent tokens separated by any non-word characters ("brake pad" matches "brake-pad")."""
+    return r'\W+'.join(re.escape(token) for token in tokens)
+
+
+def _phrase_matches(contents_collection, documents_collection, ids, tokens):
+    pattern = {'$regex': phrase_pattern(tokens), '$options': 'i'}
+    matched = {row['_id'] for row in contents_collection.find({'_id': {'$in': ids}, 'content': pattern}, {'_id': 1})}
+    remaining = [doc_id for doc_id in ids if doc_id not in matched]
+    if remaining:
+        matched.update(row['_id'] for row in documents_collection.find(
+            {'_id': {'$in': remaining}, '$or': [{'title': pattern}, {'summary': pattern}, {'tags': pattern}]},
+            {'_id': 1}
+        ))
+    return matched
+
+
+class SearchResult:
+    """
+    Matching document ids in relevance order, with their scores. Regex fallback results
+    are not `scored` and only say whether matches were `truncated`.
+    """
+
+    def __init__(self, ranked=None, truncated=False, scored=True):
+        self.ranked = ranked or []
+        self.truncated = truncated
+        self.scored = scored
+
+    @property
+    def ids(self):
+        return [doc_id for doc_id, _ in self.ranked]
+
+    @property
+    def scores(self):
+        return dict(self.ranked)
+
+
+def search_documents(contents_collection, documents_collection, query, limit=SEARCH_MAX_RESULTS, newest=False):
+    """
+    Ranked ids of documents matching every clause of `query`, at most `limit`: the best
+    scoring ones, or with `newest` the most recently added ones (read straight off the index).
+    """
+    clauses = parse_query(query)
+    if not clauses:
+        return SearchResult()
+
+    exact_terms = set()
+    for clause in clauses:
+        if clause[0] == 'term':
+            exact_terms.add(clause[1])
+        elif clause[0] == 'phrase':
+            exact_terms.update(clause[1])
+    exact_terms = sorted(exact_terms)
+    projection = {f"weights.{term}": 1 for term in exact_terms} or {'_id': 1}
+    cursor = contents_collection.find({'$and': [_clause_filter(clause) for clause in clauses]}, projection)
+    truncated = False
+    if newest:
+        rows = list(cursor.sort('_id', -1).limit(limit + 1))
+        truncated = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        rows = list(cursor)
+
+    for clause in clauses:
+        if clause[0] == 'phrase' and rows:
+            matched = _phrase_matches(contents_collection, documents_collection, [row['_id'] for row in rows], clause[1])
+            rows = [row for row in rows if row['_id'] in matched]
+    if not rows:
+        return SearchResult(truncated=truncated)
+
+    total = max(contents_collection.estimated_document_count(), 1)
+    idf = {term: math.log(1 + total / max(contents_collection.count_documents({'terms': term}), 1))
+           for term in exact_terms}
+    prefix_bonus = PREFIX_SCORE * sum(1 for clause in clauses if clause[0] == 'prefix')
+
+    ranked = []
+    for row in rows:
+        weights = row.get('weights') or {}
+        score = sum(weights.get(term, 0.0) * idf[term] for term in exact_terms) + prefix_bonus
+        ranked.append((row['_id'], round(score, 4)))
+    ranked.sort(key=lambda item: (item[1], item[0]), reverse=True)
+    return SearchResult(ranked[:limit], truncated=truncated or len(ranked) > limit)
+
+
+def regex_conditions(contents_collection, query, limit=SEARCH_MAX_RESULTS):
+    """
+    Fallback `$or` branches: case-insensitive substring match of the literal
+    input (escaped) on title, summary, tags and the extracted text. Returns
+    (branches, truncated); at most `limit` (None for all) of the newest text matches are kept.
+    """
+    pattern = literal_pattern(query)
+    text_ids = content_match_ids(contents_collection, pattern, None if limit is None else limit + 1)
+    truncated = limit is not None and len(text_ids) > limit
+    return [
+        {'title': {'$regex': pattern, '$options': 'i'}},
+        {'summary': {'$regex': pattern, '$options': 'i'}},
+        {'tags': {'$regex': pattern, '$options': 'i'}},
+        {'_id': {'$in': text_ids[:limit]}}
+    ], truncated
+
+
+def reindex_documents(documents_collection, contents_collection, batch_size=200, only_missing=True):
+    """
+    Build index entries for documents (only those missing or built by an older tokenizer, unless
+    `only_missing` is False). Documents not yet migrated are indexed from their inline `content`.
+    """
+    indexed = 0
+    if only_missing:
+        already_indexed = {row['_id'] for row in contents_collection.find({'tokenizer': TOKENIZER_VERSION}, {'_id': 1})}
+    projection = {'title': 1, 'summary': 1, 'tags': 1, 'content': 1}
+    cursor = documents_collection.find({}, projection).batch_size(batch_size)
+    batch = []
+
+    def flush():
+        texts = {row['_id']: row['content']
+                 for row in contents_collection.find({'_id': {'$in': [doc['_id'] for doc in batch]}}, {'content': 1})
+                 if 'content' in row}
+        contents_collection.bulk_write([
+            UpdateOne({'_id': doc['_id']},
+                      {'$set': index_fields(doc, texts.get(doc['_id'], doc.get('content')) or '')}, upsert=True)
+            for doc in batch
+        ], ordered=False)
+
+    for doc in cursor:
+        if only_missing and doc['_id'] in already_indexed:
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush()
+            indexed += len(batch)
+            print(f"[SEARCH] Indexed {indexed} documents")
+            batch = []
+    if batch:
+        flush()
+        indexed += len(batch)
+    return indexed
+
+
+if __name__ == '__main__':
+    # Build the token index for existing documents: python -m utils.text_search [--all]
+    import argparse
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    from utils.content_store import ensure_content_collection
+
+    parser = argparse.ArgumentParser(description='Build search index entries for existing documents')
+    parser.add_argument('--all', action='store_true', help='rebuild every entry, not only missing or outdated ones')
+    parser.add_argument('--batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))[os.getenv('DB_NAME', 'kmrl_docintel')]
+    contents = ensure_content_collection(db)
+    contents.create_index(TERMS_INDEX)
+    total = reindex_documents(db['documents'], contents, args.batch_size, only_missing=not args.all)
+    print(f"[SEARCH] Indexed {total} documents")
@@ -0,0 +1,54 @@
+"""
+Per-process resources for pre-fork servers.
+
+MongoClient is not fork-safe, and background threads (counter reconciler,
+blob sweeper) do not survive a fork. With gunicorn's `preload_app` the
+application is imported once in the master and forked into the workers, so
+nothing that opens sockets or starts threads may be created at import time.
+
+WorkerResources builds them on first use in each process and rebuilds them
+when it notices a new PID, so a forked worker never touches the client it
+inherited from its parent. `proxy(name)` returns a LocalProxy to one
+attribute of the built resources; app.py binds its module-level names
+(`documents_collection`, `blob_store`, ...) to these proxies, so route code
+uses them unchanged. gunicorn.conf.py calls `get()` from `post_worker_init` to warm
+each worker before it accepts requests.
+"""
+import os
+import threading
+
+from werkzeug.local import LocalProxy
+
+
+class WorkerResources:
+    def __init__(self, build):
+        self._build = build
+        self._config = None
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """Settings (a mapping, e.g. app.config) passed to `build`; drops resources built with older ones."""
+        with self._lock:
+            self._config = config
+            self._value = None
+            self._pid = None
+
+    @property
+    def configured(self):
+        return self._config is not None
+
+    def get(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    if self._config is None:
+                        raise RuntimeError('Resources used before create_app() configured them')
+                    self._value = self._build(self._config)
+                    self._pid = pid
+        return self._value
+
+    def proxy(self, name):
+        return LocalProxy(lambda: getattr(self.get(), name))
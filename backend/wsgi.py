@@ -0,0 +1,12 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Uses ProductionConfig unless APP_ENV says otherwise.
+"""
+import os
+
+from app import create_app
+
+app = create_app(os.getenv('APP_ENV', 'production'))
@@ -23,6 +23,7 @@ import {
   Mail,
   MessageSquare,
   Archive,
+  ChevronLeft,
   ChevronRight,
   ChevronDown,
   Star,
@@ -173,51 +174,18 @@ const App = () => {
   const fetchDashboardStats = useCallback(async () => {
     setStatsLoading(true);
     try {
-      const [
-        statsRes,
-        deptRes,
-        tagsRes,
-        typesRes,
-        statusRes,
-        langRes,
-        recentRes,
-      ] = await Promise.all([
-        fetch("http://localhost:5000/api/dashboard/stats"),
-        fetch("http://localhost:5000/api/dashboard/departments"),
-        fetch("http://localhost:5000/api/dashboard/tags"),
-        fetch("http://localhost:5000/api/dashboard/document-types"),
-        fetch("http://localhost:5000/api/dashboard/status-distribution"),
-        fetch("http://localhost:5000/api/dashboard/language-distribution"),
-        fetch("http://localhost:5000/api/dashboard/recent-documents"),
-      ]);
-
-      if (statsRes.ok) {
-        const statsData = await statsRes.json();
-        setDashboardStats(statsData);
-      }
-      if (deptRes.ok) {
-        const deptData = await deptRes.json();
-        setDepartmentStats(deptData.departments || []);
-      }
-      if (tagsRes.ok) {
-        const tagsData = await tagsRes.json();
-        setTagsStats(tagsData.tags || []);
-      }
-      if (typesRes.ok) {
-        const typesData = await typesRes.json();
-        setDocTypesStats(typesData.document_types || []);
-      }
-      if (statusRes.ok) {
-        const statusData = await statusRes.json();
-        setStatusDistribution(statusData.status_distribution || []);
-      }
-      if (langRes.ok) {
-        const langData = await langRes.json();
-        setLanguageDistribution(langData.language_distribution || []);
-      }
-      if (recentRes.ok) {
-        const recentData = await recentRes.json();
-        setRecentDocuments(recentData.recent_documents || []);
+      // One request for every widget; the browser revalidates it with the
+      // ETag, so unchanged polls come back as a bodiless 304
+      const response = await fetch("http://localhost:5000/api/dashboard/summary");
+      if (response.ok) {
+        const summary = await response.json();
+        setDashboardStats(summary.stats);
+        setDepartmentStats(summary.departments || []);
+        setTagsStats(summary.tags || []);
+        setDocTypesStats(summary.document_types || []);
+        setStatusDistribution(summary.status_distribution || []);
+        setLanguageDistribution(summary.language_distribution || []);
+        setRecentDocuments(summary.recent_documents || []);
       }
     } catch (err) {
       console.error("Error fetching dashboard stats:", err);
@@ -347,8 +315,23 @@ const App = () => {
     }
   };
 
-  const handleViewDocument = (doc) => {
-    setViewingDocument(doc); // Open the modal by setting the document
+  const handleViewDocument = async (doc) => {
+    setViewingDocument(doc); // Open the modal right away with the list fields
+    // Listings only carry summary fields; content, tables and charts come from the detail endpoint
+    try {
+      const response = await fetch(
+        `http://localhost:5000/api/documents/${doc._id}`
+      );
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const detail = await response.json();
+      setViewingDocument((current) =>
+        current && current._id === doc._id ? detail : current
+      );
+    } catch (err) {
+      console.error("Error fetching document details:", err);
+    }
   };
 
   const handleDownloadDocument = async (doc) => {
@@ -551,7 +534,7 @@ const App = () => {
             <Clock className="h-6 w-6 text-orange-500" />
           </div>
           <p className="text-3xl font-bold text-orange-600">
-            {dashboardStats?.avg_processing_time || 0}h
+            {dashboardStats?.avg_processing_time || 0}s
           </p>
           <p className="text-sm text-gray-500 mt-2">
             Average document processing
@@ -1507,7 +1490,7 @@ const App = () => {
 
                 <div className="text-center p-6 bg-gradient-to-br from-blue-50 to-cyan-100 rounded-xl border-2 border-blue-300">
                   <div className="text-4xl font-bold text-blue-600 mb-2">
-                    {dashboardStats?.avg_processing_time || 2.3}h
+                    {dashboardStats?.avg_processing_time || 0}s
                   </div>
                   <div className="text-sm text-gray-700 font-medium">
                     Avg Processing Time
@@ -2018,15 +2001,43 @@ const DocumentViewModal = ({ doc, onClose, getStatusColor }) => {
                   )}
                 </div>
               </div>
-              <div className="flex-1 overflow-hidden bg-gray-100">
-                <iframe
-                  ref={pdfIframeRef}
-                  title="Document preview"
-                  src={`${viewerUrl}${isPdfFile && currentPdfPage > 0 ? `#page=${currentPdfPage}` : '#toolbar=0&navpanes=0'}`}
-                  className="w-full h-full bg-white"
-                  style={{ border: 'none' }}
-                />
-              </div>
+              {doc.page_count ? (
+                // Rendered page images: only the visible page is downloaded, not the whole PDF
+                <div className="flex-1 overflow-auto bg-gray-100 flex flex-col items-center gap-3 p-4">
+                  <img
+                    src={`${API_BASE_URL}/api/documents/${doc._id}/pages/${currentPdfPage}?width=1024`}
+                    alt={`Page ${currentPdfPage}`}
+                    className="max-w-full bg-white shadow"
+                  />
+                  <div className="flex items-center gap-3 text-sm">
+                    <button
+                      onClick={() => setCurrentPdfPage((page) => Math.max(1, page - 1))}
+                      disabled={currentPdfPage <= 1}
+                      className="p-1 rounded hover:bg-gray-200 disabled:opacity-40">
+                      <ChevronLeft className="h-5 w-5" />
+                    </button>
+                    <span className="text-gray-600">
+                      {currentPdfPage} / {doc.page_count}
+                    </span>
+                    <button
+                      onClick={() => setCurrentPdfPage((page) => Math.min(doc.page_count, page + 1))}
+                      disabled={currentPdfPage >= doc.page_count}
+                      className="p-1 rounded hover:bg-gray-200 disabled:opacity-40">
+                      <ChevronRight className="h-5 w-5" />
+                    </button>
+                  </div>
+                </div>
+              ) : (
+                <div className="flex-1 overflow-hidden bg-gray-100">
+                  <iframe
+                    ref={pdfIframeRef}
+                    title="Document preview"
+                    src={`${viewerUrl}${isPdfFile && currentPdfPage > 0 ? `#page=${currentPdfPage}` : '#toolbar=0&navpanes=0'}`}
+                    className="w-full h-full bg-white"
+                    style={{ border: 'none' }}
+                  />
+                </div>
+              )}
               {viewerUrl && (
                 <div className="bg-white border-t border-gray-300 p-3 flex flex-wrap gap-2 flex-shrink-0">
                   <a